@@ -0,0 +1,232 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Minimal Prometheus-compatible metrics (text exposition format 0.0.4), kept
+# in-process so the server needs no extra dependency. Served at GET /metrics.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_label_str(zip(self.labelnames, key))} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., sum, count]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _render_series(self, key, state):
+        pairs = list(zip(self.labelnames, key))
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, state):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_label_str(pairs + [('le', bound)])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_label_str(pairs + [('le', '+Inf')])} {state[-1]}")
+        lines.append(f"{self.name}_sum{_label_str(pairs)} {round(state[-2], 6)}")
+        lines.append(f"{self.name}_count{_label_str(pairs)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- MEMORYOS METRICS ---
+TURNS = REGISTRY.register(Counter("memoryos_turns_total", "Chat turns handled, by outcome.", ["status"]))
+STAGE_SECONDS = REGISTRY.register(Histogram("memoryos_stage_seconds", "Latency of each turn stage.", ["stage"]))
+TOOL_SECONDS = REGISTRY.register(Histogram("memoryos_tool_seconds", "Latency of each tool execution.", ["tool"]))
+TOOL_CALLS = REGISTRY.register(Counter("memoryos_tool_calls_total", "Tool calls executed.", ["tool", "status"]))
+TOOL_CALLS_PER_TURN = REGISTRY.register(Histogram("memoryos_tool_calls_per_turn", "Tool calls made in one turn.",
+                                                  buckets=(0, 1, 2, 3, 4, 6, 8, 12)))
+LLM_RETRIES = REGISTRY.register(Counter("memoryos_llm_retries_total", "LLM attempts discarded and retried.", ["reason"]))
+LLM_TOKENS = REGISTRY.register(Counter("memoryos_llm_tokens_total", "Tokens reported by the LLM API.", ["kind"]))
+RETRIEVAL_DEGRADED = REGISTRY.register(Counter("memoryos_retrieval_degraded_total",
+                                               "Retrieval sources dropped from a turn.", ["source", "reason"]))
+EMBEDDER = REGISTRY.register(Gauge("memoryos_embedder", "Embedder and embedding-cache counters.", ["counter"]))
+MEMORY_TIERS = REGISTRY.register(Gauge("memoryos_memory_tiers", "Hot/cold memory tier counters.", ["counter"]))
+ARCHIVE_QUEUE_DEPTH = REGISTRY.register(Gauge("memoryos_archive_queue_depth", "Archive writes waiting in the queue."))
+ARCHIVE_WRITE_LAG_SECONDS = REGISTRY.register(Histogram("memoryos_archive_write_lag_seconds",
+                                                        "Time from enqueue to commit of an archive write."))
+ARCHIVE_BATCH_SIZE = REGISTRY.register(Histogram("memoryos_archive_batch_size", "Records per archive batch write.",
+                                                 buckets=(1, 2, 4, 8, 16, 32, 64, 128)))
+PROMPT_CONTEXT_TOKENS = REGISTRY.register(Histogram("memoryos_prompt_context_tokens",
+                                                   "Estimated tokens per [MEMORY CONTEXT] section.", ["section"],
+                                                   buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096)))
+ARCHIVE_WRITES = REGISTRY.register(Counter("memoryos_archive_writes_total", "Archive records written, by outcome.", ["status"]))
+
+
+def render():
+    return REGISTRY.render()
+
+
+@contextmanager
+def stage_span(stage):
+    """Time a stage that belongs to no turn (e.g. a background archive batch)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=stage)
+
+
+class TurnTrace:
+    """Timing breakdown and counters for one turn. Every span also feeds the
+    process-wide histograms, so /metrics and the per-turn debug view agree."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.timings = {}      # stage -> ms, summed when a stage runs more than once
+        self.timed_out = []
+        self.context_tokens = {}   # [MEMORY CONTEXT] section -> estimated tokens
+        self.counts = {"llm_calls": 0, "tool_calls": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        with self._lock:
+            self.timings[stage] = round(self.timings.get(stage, 0) + seconds * 1000, 2)
+
+    @contextmanager
+    def span(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def timed(self, stage, fn, *args, **kwargs):
+        with self.span(stage):
+            return fn(*args, **kwargs)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def retry(self, reason):
+        LLM_RETRIES.inc(reason=reason)
+        self.count("retries")
+
+    def usage(self, usage):
+        # `usage` from a completion (or Groq's final stream chunk); absent on some endpoints
+        if usage is None:
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            tokens = getattr(usage, kind, None) or 0
+            if tokens:
+                LLM_TOKENS.inc(tokens, kind=kind.split("_")[0])
+                self.count(kind, tokens)
+
+    def prompt_sections(self, counts):
+        for section, tokens in counts.items():
+            if section != "dropped":
+                PROMPT_CONTEXT_TOKENS.observe(tokens, section=section)
+        with self._lock:
+            self.context_tokens = dict(counts)
+
+    def degraded(self, source, reason, timeout_ms=None):
+        RETRIEVAL_DEGRADED.inc(source=source, reason=reason)
+        if reason == "timeout":
+            self.timed_out.append(source)
+            with self._lock:
+                self.timings[source] = timeout_ms
+
+    def finish(self, status="ok"):
+        """Close the turn: record its total latency and outcome, return the breakdown."""
+        self.record("turn", time.perf_counter() - self.t0)
+        TURNS.inc(status=status)
+        TOOL_CALLS_PER_TURN.observe(self.counts["tool_calls"])
+        with self._lock:
+            return {"timings_ms": dict(self.timings), "timed_out": list(self.timed_out),
+                    "context_tokens": dict(self.context_tokens), **self.counts}
+
+
+def set_embedder_stats(stats):
+    for name in ("calls", "texts", "model_calls", "model_texts"):
+        EMBEDDER.set(stats[name], counter=name)
+    for name, value in stats.get("cache", {}).items():
+        EMBEDDER.set(value, counter=f"cache_{name}")
+
+
+def set_tier_stats(stats):
+    for name, value in stats.items():
+        MEMORY_TIERS.set(value, counter=name)
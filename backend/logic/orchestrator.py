@@ -1,21 +1,47 @@
 import json
-from groq import Groq, BadRequestError, RateLimitError
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from groq import Groq, AsyncGroq, BadRequestError, RateLimitError
 import config
-from backend.logic.prompts import SYSTEM_PROMPT_TEMPLATE
-from backend.managers.core_manager import CoreMemoryManager
-from backend.managers.archival_manager import ArchivalMemoryManager
-from backend.managers.buffer_manager import BufferManager
-import threading
-import re
+from backend.logic import metrics
+from backend.logic.prompts import SYSTEM_PROMPT_TEMPLATE, SUMMARY_PROMPT_TEMPLATE
+from backend.logic.sessions import SessionManager
+from backend.logic.write_queue import ArchiveWriteQueue
+from backend.managers.embeddings import QueryEmbeddings, get_embedder
+from backend.managers import memory_tiers
+from backend.managers.prompt_builder import count_tokens
 
-client = Groq(api_key=config.GROQ_API_KEY)
+client = Groq(api_key=config.GROQ_API_KEY, base_url=config.GROQ_BASE_URL)
+async_client = AsyncGroq(api_key=config.GROQ_API_KEY, base_url=config.GROQ_BASE_URL)
 
 class Orchestrator:
     def __init__(self):
-        self.core = CoreMemoryManager()
-        self.archive = ArchivalMemoryManager()
-        self.buffer = BufferManager(max_turns=10)
-        
+        # Folds turns leaving a session's buffer into its rolling summary, off the request path
+        self.summary_pool = None
+        if config.BUFFER_SUMMARY:
+            self.summary_pool = ThreadPoolExecutor(max_workers=config.BUFFER_SUMMARY_WORKERS, thread_name_prefix="memoryos-summary")
+        # Per-session core shard, archive scope and buffer; created on first use
+        self.sessions = SessionManager(summarize=self._summarize_turns, executor=self.summary_pool)
+        # Embedder usage, per-stage timings (ms) and counters of the most recent turn (any session)
+        self.last_turn_stats = {}
+        # Bounded pool for blocking work on the request path (Chroma queries, state writes)
+        self.executor = ThreadPoolExecutor(max_workers=config.IO_WORKERS, thread_name_prefix="memoryos-io")
+        # Separate pool for the retrieval fan-out (sync and async) so it can never starve behind background work.
+        # Sized for IO_WORKERS concurrent turns, each running every source at once: a source's
+        # timeout starts at submit, so one queued behind another turn's sources would time out.
+        self.retrieval_pool = ThreadPoolExecutor(max_workers=config.IO_WORKERS * len(config.RETRIEVAL_TIMEOUTS_S),
+                                                 thread_name_prefix="memoryos-retrieval")
+        # Replies are archived through a bounded, spooled queue drained by a fixed writer pool
+        self.write_queue = ArchiveWriteQueue()
+        # Model load (and int8 conversion) happens here instead of inside the first turn
+        if config.EMBEDDING_WARMUP:
+            try:
+                get_embedder().warmup()
+            except Exception as e:
+                print(f"[SYSTEM] Embedding warm-up failed, the first turn will load the model: {e}")
+
         # Tools Schema
         self.tools_schema = [
             {"type": "function", "function": {"name": "core_memory_update", "description": "Save PERMANENT user traits.", "parameters": {"type": "object", "properties": {"key": {"type": "string"}, "value": {"type": "string"}}, "required": ["key", "value"]}}},
@@ -26,109 +52,426 @@ class Orchestrator:
             {"type": "function", "function": {"name": "archival_memory_search", "description": "Search history.", "parameters": {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]}}}
         ]
 
-    def process_message(self, user_message):
-        try:
-            current_turn = self.core.increment_turn()
-            self.buffer.add_turn("user", user_message)
-            
-            # --- PROACTIVE SEARCH ---
-            recent_history = [msg["content"] for msg in self.buffer.get_messages()[-2:]]
-            recent_history.append(user_message)
-            search_query = " ".join(recent_history)
-
-            # 1. Search ChromaDB
-            archival_results = self.archive.search_memory(user_message, n_results=3)
-            
-            # 2. Get Context from Core
-            core_context = self.core.get_core_prompt(
-                recent_history_text=search_query, 
-                archival_context=archival_results
+    # The default session, for single-user callers (demo scripts, Streamlit)
+    @property
+    def core(self):
+        return self.sessions.get().core
+
+    @property
+    def archive(self):
+        return self.sessions.get().archive
+
+    @property
+    def buffer(self):
+        return self.sessions.get().buffer
+
+    # --- TURN STAGES (shared by the sync and async pipelines) ---
+    def _begin_turn(self, session, user_message, trace):
+        # Separate spans: the turn counter is a state write, the query embedding is model time
+        current_turn = trace.timed("turn_increment", session.core.increment_turn)
+        session.buffer.add_turn("user", user_message)
+
+        # --- PROACTIVE SEARCH ---
+        recent_history = [msg["content"] for msg in session.buffer.get_messages()[-2:]]
+        recent_history.append(user_message)
+        search_query = " ".join(recent_history)
+
+        # Embed both query strings in one batch; every collection reuses these vectors
+        query_ctx = trace.timed("embed", QueryEmbeddings, [user_message, search_query])
+        return current_turn, search_query, query_ctx
+
+    def _retrieval_sources(self, session, user_message, search_query, query_ctx, current_turn):
+        # Independent lookups for the proactive-retrieval stage: name -> (fn, args, kwargs)
+        query_vector = query_ctx.get(search_query)
+        return {
+            "archive": (session.archive.search_memory, (user_message,), {"n_results": 3, "query_embedding": query_ctx.get(user_message), "turn_number": current_turn}),
+            "entities": (session.core.search_entities, (search_query, query_vector), {}),
+            "events": (session.core.search_events, (search_query, query_vector), {"period_text": user_message})
+        }
+
+    @staticmethod
+    def _degrade(name, trace, error=None):
+        # A slow or failing source costs the turn its results, not the turn itself
+        if error is None:
+            trace.degraded(name, "timeout", timeout_ms=config.RETRIEVAL_TIMEOUTS_S[name] * 1000)
+            print(f"[SYSTEM] Retrieval '{name}' exceeded {config.RETRIEVAL_TIMEOUTS_S[name]}s, continuing without it")
+        else:
+            trace.degraded(name, "error")
+            print(f"[SYSTEM] Retrieval '{name}' failed: {error}")
+        return []
+
+    def _fan_out_retrieval(self, sources, trace):
+        t0 = time.perf_counter()
+        futures = {
+            name: self.retrieval_pool.submit(trace.timed, name, fn, *args, **kwargs)
+            for name, (fn, args, kwargs) in sources.items()
+        }
+        results = {}
+        for name, future in futures.items():
+            remaining = config.RETRIEVAL_TIMEOUTS_S[name] - (time.perf_counter() - t0)
+            try:
+                results[name] = future.result(timeout=max(0, remaining))
+            except FutureTimeout:
+                results[name] = self._degrade(name, trace)
+            except Exception as e:
+                results[name] = self._degrade(name, trace, error=e)
+        trace.record("retrieval", time.perf_counter() - t0)
+        return results
+
+    async def _afan_out_retrieval(self, sources, trace):
+        loop = asyncio.get_running_loop()
+
+        async def one(name, fn, args, kwargs):
+            try:
+                # On the retrieval pool, not self.executor: queued behind other turns' state
+                # writes, a source would use up its timeout before it even started
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self.retrieval_pool, functools.partial(trace.timed, name, fn, *args, **kwargs)),
+                    timeout=config.RETRIEVAL_TIMEOUTS_S[name]
+                )
+            except asyncio.TimeoutError:
+                return self._degrade(name, trace)
+            except Exception as e:
+                return self._degrade(name, trace, error=e)
+
+        t0 = time.perf_counter()
+        values = await asyncio.gather(*(one(name, *spec) for name, spec in sources.items()))
+        trace.record("retrieval", time.perf_counter() - t0)
+        return dict(zip(sources, values))
+
+    def _render_context(self, session, results, trace):
+        core_context, context_tokens = session.core.render_core_prompt(
+            results["entities"], results["events"], results["archive"]
+        )
+        # Rolling summary of the turns that have left the buffer
+        summary = session.buffer.summary
+        if summary:
+            summary_block = f"EARLIER IN THIS CONVERSATION:\n{summary}"
+            core_context = f"{core_context}\n{summary_block}\n"
+            context_tokens["summary"] = count_tokens(summary_block)
+            context_tokens["total"] = count_tokens(core_context)
+        trace.prompt_sections(context_tokens)
+        return core_context
+
+    def _summarize_turns(self, summary, messages):
+        # Runs on the summary pool; a failure leaves the messages queued for the next fold
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = SUMMARY_PROMPT_TEMPLATE.format(
+            summary=summary or "(empty)", transcript=transcript,
+            max_words=config.BUFFER_SUMMARY_MAX_TOKENS * 3 // 4
+        )
+        with metrics.stage_span("buffer_summary"):
+            completion = client.chat.completions.create(
+                model=config.LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=config.BUFFER_SUMMARY_MAX_TOKENS
             )
-            
-            # 3. GENERATE FULL SYSTEM PROMPT
-            system_instruction = SYSTEM_PROMPT_TEMPLATE.format(core_memory_block=core_context)
-            
-            messages = [{"role": "system", "content": system_instruction}]
-            for msg in self.buffer.get_messages():
-                if msg["content"] != user_message:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            messages.append({"role": "user", "content": user_message})
-
-            active_memories = archival_results
-            final_response_text = ""
-
-            for _ in range(3):
-                try:
-                    completion = client.chat.completions.create(
-                        model=config.LLM_MODEL,
-                        messages=messages,
-                        tools=self.tools_schema,
-                        tool_choice="auto",
-                        parallel_tool_calls=True, 
-                        max_tokens=1024
-                    )
-                except RateLimitError:
-                    return "System Limit Reached: Please wait a moment.", [], "" # <--- Fixed: Return 3 values
-                except BadRequestError as e:
-                    if "tool_use_failed" in str(e):
-                        messages.append({"role": "user", "content": "SYSTEM ERROR: Invalid tool format."})
-                        continue
-                    else:
-                        raise e
-                
-                response_message = completion.choices[0].message
-                
-                if response_message.tool_calls:
-                    messages.append(response_message)
-                    for tool_call in response_message.tool_calls:
-                        fname = tool_call.function.name
-                        try:
-                            args = json.loads(tool_call.function.arguments)
-                        except:
-                            args = {}
-                        
-                        result = "Success"
-                        try:
-                            if fname == "core_memory_update": result = self.core.update_profile(args["key"], args["value"])
-                            elif fname == "delete_core_memory": result = self.core.remove_from_profile(args["key"], args["value_to_remove"])
-                            elif fname == "update_entity_memory": result = self.core.update_entity(args["name"], args.get("relationship"), args["attributes"])
-                            elif fname == "log_event": result = self.core.log_event(args["description"])
-                            elif fname == "save_knowledge": result = self.core.add_general_knowledge(args["topic"], args["content"])
-                            elif fname == "archival_memory_search":
-                                search_res = self.archive.search_memory(args["query"])
-                                active_memories.extend(search_res)
-                                result = json.dumps(search_res)
-                        except Exception as e:
-                            result = f"Error: {str(e)}"
-
-                        messages.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": fname,
-                            "content": str(result)
-                        })
-                else:
-                    content = response_message.content if response_message.content else ""
-                    if "<function" in content or ("{" in content and "type" in content and "function" in content):
-                        messages.append({"role": "user", "content": "SYSTEM ERROR: Raw code detected."})
-                        continue
-                    final_response_text = content
-                    break
-            
-            if not final_response_text:
-                final_response_text = "I'm having trouble retrieving that information right now."
-            
-            if final_response_text:
-                self.buffer.add_turn("assistant", final_response_text)
-                def background_save():
-                    self.archive.add_memory(f"Bot: {final_response_text}", "assistant", current_turn)
-                save_thread = threading.Thread(target=background_save)
-                save_thread.start()
+        return (completion.choices[0].message.content or "").strip()
 
-            # --- RETURN 3 VALUES (FIXED) ---
-            return final_response_text, active_memories, system_instruction
+    def _build_messages(self, session, core_context, user_message):
+        # 3. GENERATE FULL SYSTEM PROMPT
+        system_instruction = SYSTEM_PROMPT_TEMPLATE.format(core_memory_block=core_context)
+
+        messages = [{"role": "system", "content": system_instruction}]
+        for msg in session.buffer.get_messages():
+            if msg["content"] != user_message:
+                messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": user_message})
+        return system_instruction, messages
+
+    def _completion_kwargs(self, messages):
+        return dict(
+            model=config.LLM_MODEL,
+            messages=messages,
+            tools=self.tools_schema,
+            tool_choice="auto",
+            parallel_tool_calls=True,
+            max_tokens=1024
+        )
 
+    def _execute_tool(self, session, fname, raw_arguments, query_ctx, active_memories, trace):
+        try:
+            args = json.loads(raw_arguments)
+        except:
+            args = {}
+
+        result = "Success"
+        status = "ok"
+        t0 = time.perf_counter()
+        try:
+            if fname == "core_memory_update": result = session.core.update_profile(args["key"], args["value"])
+            elif fname == "delete_core_memory": result = session.core.remove_from_profile(args["key"], args["value_to_remove"])
+            elif fname == "update_entity_memory": result = session.core.update_entity(args["name"], args.get("relationship"), args["attributes"])
+            elif fname == "log_event": result = session.core.log_event(args["description"])
+            elif fname == "save_knowledge": result = session.core.add_general_knowledge(args["topic"], args["content"])
+            elif fname == "archival_memory_search":
+                # Exact-term queries are answered from the lexical index, without embedding
+                search_res = session.archive.search_memory(args["query"], query_ctx=query_ctx, include_logs=True,
+                                                          turn_number=session.core.store.turn())
+                active_memories.extend(search_res)
+                result = json.dumps(search_res)
+        except Exception as e:
+            result = f"Error: {str(e)}"
+            status = "error"
+        metrics.TOOL_SECONDS.observe(time.perf_counter() - t0, tool=fname)
+        metrics.TOOL_CALLS.inc(tool=fname, status=status)
+        trace.count("tool_calls")
+        return str(result)
+
+    @staticmethod
+    def _tool_call_dicts(tool_calls):
+        # SDK tool-call objects -> the plain dicts the chat API accepts back in `messages`
+        return [
+            {"id": tc.id, "type": "function", "function": {"name": tc.function.name, "arguments": tc.function.arguments}}
+            for tc in tool_calls
+        ]
+
+    def _execute_tool_calls(self, session, tool_calls, query_ctx, active_memories, trace):
+        # Sequential on purpose: the model may emit delete-then-update on the same key
+        return [
+            {
+                "tool_call_id": tool_call["id"],
+                "role": "tool",
+                "name": tool_call["function"]["name"],
+                "content": self._execute_tool(session, tool_call["function"]["name"], tool_call["function"]["arguments"], query_ctx, active_memories, trace)
+            }
+            for tool_call in tool_calls
+        ]
+
+    @staticmethod
+    def _looks_like_raw_tool_call(content):
+        return "<function" in content or ("{" in content and "type" in content and "function" in content)
+
+    def _finish_turn(self, session, final_response_text, current_turn, query_ctx, trace):
+        session.last_turn_stats = {"session_id": session.session_id, "turn": current_turn,
+                                   **query_ctx.stats(), **trace.finish()}
+        self.last_turn_stats = session.last_turn_stats
+        metrics.set_embedder_stats(query_ctx.embedder.stats())
+        metrics.set_tier_stats(memory_tiers.stats())
+        # Re-tier the session in the background as of this turn
+        memory_tiers.note_turn(session.session_id, current_turn)
+
+        if not final_response_text:
+            final_response_text = "I'm having trouble retrieving that information right now."
+
+        if final_response_text:
+            session.buffer.add_turn("assistant", final_response_text)
+            # Blocks while the write queue is full (back-pressure), so call it off the event loop
+            self.write_queue.put(session.archive.memory_record(f"Bot: {final_response_text}", "assistant", current_turn))
+        # Usage bumps collected by this turn's retrievals go out as one batched update
+        self.write_queue.put_many(session.archive.usage_records())
+        return final_response_text
+
+    # --- SYNC PIPELINE ---
+    def process_message(self, user_message, session_id=None):
+        try:
+            with self.sessions.checkout(session_id) as session, session.lock:
+                return self._process_turn(session, user_message)
         except Exception as e:
             print(f"--- ORCHESTRATOR CRASHED --- \n{str(e)}")
+            metrics.TURNS.inc(status="error")
             # --- RETURN 3 VALUES (FIXED) ---
-            return f"System Error: {str(e)}", [], ""
\ No newline at end of file
+            return f"System Error: {str(e)}", [], ""
+
+    def _process_turn(self, session, user_message):
+        trace = metrics.TurnTrace()
+        current_turn, search_query, query_ctx = self._begin_turn(session, user_message, trace)
+
+        # 1 + 2. Archive, entity and event searches fan out in parallel
+        results = self._fan_out_retrieval(self._retrieval_sources(session, user_message, search_query, query_ctx, current_turn), trace)
+        archival_results = results["archive"]
+        core_context = trace.timed("prompt_build", self._render_context, session, results, trace)
+
+        system_instruction, messages = self._build_messages(session, core_context, user_message)
+
+        active_memories = archival_results
+        final_response_text = ""
+
+        for _ in range(3):
+            try:
+                trace.count("llm_calls")
+                with trace.span("llm"):
+                    completion = client.chat.completions.create(**self._completion_kwargs(messages))
+                trace.usage(completion.usage)
+            except RateLimitError:
+                trace.finish("rate_limited")
+                return "System Limit Reached: Please wait a moment.", [], "" # <--- Fixed: Return 3 values
+            except BadRequestError as e:
+                if "tool_use_failed" in str(e):
+                    trace.retry("tool_use_failed")
+                    messages.append({"role": "user", "content": "SYSTEM ERROR: Invalid tool format."})
+                    continue
+                else:
+                    raise e
+
+            response_message = completion.choices[0].message
+
+            if response_message.tool_calls:
+                tool_calls = self._tool_call_dicts(response_message.tool_calls)
+                messages.append({"role": "assistant", "content": response_message.content, "tool_calls": tool_calls})
+                messages.extend(trace.timed("tools", self._execute_tool_calls,
+                                            session, tool_calls, query_ctx, active_memories, trace))
+            else:
+                content = response_message.content if response_message.content else ""
+                if self._looks_like_raw_tool_call(content):
+                    trace.retry("raw_tool_call")
+                    messages.append({"role": "user", "content": "SYSTEM ERROR: Raw code detected."})
+                    continue
+                final_response_text = content
+                break
+
+        final_response_text = self._finish_turn(session, final_response_text, current_turn, query_ctx, trace)
+
+        # --- RETURN 3 VALUES (FIXED) ---
+        return final_response_text, active_memories, system_instruction
+
+    # --- ASYNC PIPELINE (used by the FastAPI server) ---
+    async def _run_blocking(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def aprocess_message(self, user_message, session_id=None):
+        """Same contract as process_message, but never blocks the event loop:
+        Groq goes through the async client, Chroma/JSON work runs on the bounded
+        executor, and the archive and core retrievals run concurrently."""
+        done = await self.arun_turn(user_message, session_id=session_id)
+        return done["response"], done["active_memories"], done["debug_prompt"]
+
+    async def arun_turn(self, user_message, session_id=None):
+        """Run one non-streamed turn and return its `done` frame (response, memories, prompt, stats)."""
+        async for event in self.astream_message(user_message, stream=False, session_id=session_id):
+            if event["type"] == "done":
+                return event
+        return {"type": "done", "response": "System Error: turn ended without a response", "active_memories": [], "debug_prompt": ""}
+
+    async def _acomplete(self, messages, stream, trace):
+        """One LLM round trip as events: `token` frames, then a final `completion`
+        frame carrying the full content and any tool calls (deltas reassembled)."""
+        trace.count("llm_calls")
+        t0 = time.perf_counter()
+        if not stream:
+            completion = await async_client.chat.completions.create(**self._completion_kwargs(messages))
+            trace.record("llm", time.perf_counter() - t0)
+            trace.usage(completion.usage)
+            message = completion.choices[0].message
+            tool_calls = self._tool_call_dicts(message.tool_calls) if message.tool_calls else []
+            yield {"type": "completion", "content": message.content or "", "tool_calls": tool_calls}
+            return
+
+        response = await async_client.chat.completions.create(**self._completion_kwargs(messages), stream=True)
+        content_parts, calls = [], {}
+        async for chunk in response:
+            # Groq reports usage on the last chunk under `x_groq`; OpenAI-style servers use `usage`
+            trace.usage(getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                if "llm_first_token" not in trace.timings:
+                    trace.record("llm_first_token", time.perf_counter() - t0)
+                content_parts.append(delta.content)
+                yield {"type": "token", "content": delta.content}
+            for tc in delta.tool_calls or []:
+                entry = calls.setdefault(tc.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+                if tc.id:
+                    entry["id"] = tc.id
+                if tc.function and tc.function.name:
+                    entry["function"]["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    entry["function"]["arguments"] += tc.function.arguments
+        trace.record("llm", time.perf_counter() - t0)
+        yield {"type": "completion", "content": "".join(content_parts), "tool_calls": [calls[i] for i in sorted(calls)]}
+
+    async def astream_message(self, user_message, stream=True, session_id=None):
+        """Run one turn as a sequence of event dicts:
+        retrieval -> (token | tool_call | tool_result | reset)* -> done.
+        `reset` tells a client to discard tokens already shown (a discarded attempt).
+        The final `done` frame carries the same payload as /chat."""
+        try:
+            async with self.sessions.acheckout(session_id, self.executor) as session, session.lock:
+                async for event in self._astream_turn(session, user_message, stream):
+                    yield event
+        except Exception as e:
+            print(f"--- ORCHESTRATOR CRASHED --- \n{str(e)}")
+            metrics.TURNS.inc(status="error")
+            yield {"type": "done", "response": f"System Error: {str(e)}", "active_memories": [], "debug_prompt": ""}
+
+    async def _astream_turn(self, session, user_message, stream):
+        trace = metrics.TurnTrace()
+        current_turn, search_query, query_ctx = await self._run_blocking(self._begin_turn, session, user_message, trace)
+
+        # 1 + 2. Archive search and core (entity/event) search are independent
+        results = await self._afan_out_retrieval(
+            self._retrieval_sources(session, user_message, search_query, query_ctx, current_turn), trace
+        )
+        archival_results = results["archive"]
+        core_context = trace.timed("prompt_build", self._render_context, session, results, trace)
+        yield {"type": "retrieval", "active_memories": archival_results,
+               "entities": len(results["entities"]), "events": len(results["events"]), "timed_out": list(trace.timed_out)}
+
+        system_instruction, messages = self._build_messages(session, core_context, user_message)
+
+        active_memories = archival_results
+        final_response_text = ""
+
+        for _ in range(3):
+            completion = None
+            try:
+                async for event in self._acomplete(messages, stream, trace):
+                    if event["type"] == "completion":
+                        completion = event
+                    else:
+                        yield event
+            except RateLimitError:
+                yield {"type": "done", "response": "System Limit Reached: Please wait a moment.", "active_memories": [], "debug_prompt": "",
+                       "stats": trace.finish("rate_limited")}
+                return
+            except BadRequestError as e:
+                if "tool_use_failed" in str(e):
+                    trace.retry("tool_use_failed")
+                    yield {"type": "reset"}
+                    messages.append({"role": "user", "content": "SYSTEM ERROR: Invalid tool format."})
+                    continue
+                else:
+                    raise e
+
+            if completion["tool_calls"]:
+                if completion["content"]:
+                    yield {"type": "reset"}
+                tool_calls = completion["tool_calls"]
+                for tool_call in tool_calls:
+                    yield {"type": "tool_call", "name": tool_call["function"]["name"], "arguments": tool_call["function"]["arguments"]}
+                messages.append({"role": "assistant", "content": completion["content"] or None, "tool_calls": tool_calls})
+                tool_messages = await self._run_blocking(
+                    trace.timed, "tools", self._execute_tool_calls,
+                    session, tool_calls, query_ctx, active_memories, trace
+                )
+                messages.extend(tool_messages)
+                for tool_message in tool_messages:
+                    yield {"type": "tool_result", "name": tool_message["name"], "content": tool_message["content"]}
+            else:
+                content = completion["content"]
+                if self._looks_like_raw_tool_call(content):
+                    trace.retry("raw_tool_call")
+                    if stream:
+                        yield {"type": "reset"}
+                    messages.append({"role": "user", "content": "SYSTEM ERROR: Raw code detected."})
+                    continue
+                final_response_text = content
+                break
+
+        final_response_text = await self._run_blocking(
+            self._finish_turn, session, final_response_text, current_turn, query_ctx, trace
+        )
+        yield {"type": "done", "response": final_response_text, "active_memories": active_memories, "debug_prompt": system_instruction,
+               "stats": session.last_turn_stats}
+
+    def shutdown(self):
+        """Drain queued archive writes and persist every session's core memory."""
+        self.retrieval_pool.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        if self.summary_pool:
+            # Summaries live in memory only, so pending folds are not worth waiting for
+            self.summary_pool.shutdown(wait=False, cancel_futures=True)
+        self.write_queue.close()
+        self.sessions.close_all()
@@ -25,4 +25,14 @@ SYSTEM_PROMPT_TEMPLATE = """Role: MemoryOS. Goal: Maintain an accurate User Worl
 [RESPONSE BEHAVIOR]
 - Answer naturally and concisely.
 - **MANDATORY:** If you execute a Tool, you MUST generate a text response in the same turn or the next turn confirming the action. Never leave the response empty.
-"""
\ No newline at end of file
+"""
+SUMMARY_PROMPT_TEMPLATE = """You maintain a running summary of a conversation between a user and an assistant.
+Fold the new messages into the summary. Keep names, dates, decisions, open questions and anything the user asked to be remembered; drop small talk.
+Reply with the updated summary only, as short bullet points, at most {max_words} words.
+
+[CURRENT SUMMARY]
+{summary}
+
+[NEW MESSAGES]
+{transcript}
+"""
@@ -0,0 +1,207 @@
+import re
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+import config
+from backend.managers.core_manager import CoreMemoryManager
+from backend.managers.archival_manager import ArchivalMemoryManager
+from backend.managers.buffer_manager import BufferManager
+from backend.managers import exact_search, lexical_index, memory_tiers
+
+# Session ids become file names and Chroma id prefixes, so keep them plain
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class TurnLock:
+    """FIFO lock usable from threads (`with`) and coroutines (`async with`) alike.
+
+    Callers take numbered tickets and enter in ticket order. Threads wait on a
+    condition; coroutines poll, so a waiting turn holds no worker thread and a
+    cancelled waiter just gives its ticket up.
+    """
+
+    def __init__(self, poll_s=0.002):
+        self.poll_s = poll_s
+        self._cond = threading.Condition()
+        self._next = 0          # next ticket to hand out
+        self._serving = 0       # ticket allowed in
+        self._abandoned = set()
+
+    def _take(self):
+        with self._cond:
+            ticket = self._next
+            self._next += 1
+            return ticket
+
+    def _advance(self):
+        # Under _cond: let the next ticket still waiting in
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.remove(self._serving)
+            self._serving += 1
+        self._cond.notify_all()
+
+    def __enter__(self):
+        ticket = self._take()
+        with self._cond:
+            self._cond.wait_for(lambda: self._serving == ticket)
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._advance()
+
+    async def __aenter__(self):
+        ticket = self._take()
+        try:
+            while True:
+                with self._cond:
+                    if self._serving == ticket:
+                        return
+                await asyncio.sleep(self.poll_s)
+        except BaseException:
+            with self._cond:
+                if self._serving == ticket:
+                    self._advance()
+                else:
+                    self._abandoned.add(ticket)
+            raise
+
+    async def __aexit__(self, *exc):
+        self.__exit__()
+
+
+class Session:
+    """Everything one conversation owns: its core-memory shard, a session-scoped
+    view of the shared archive, the short-term buffer and the last turn's stats."""
+
+    def __init__(self, session_id, summarize=None, executor=None):
+        self.session_id = session_id
+        self.core = CoreMemoryManager(session_id)
+        self.archive = ArchivalMemoryManager(session_id)
+        self.buffer = BufferManager(max_turns=config.BUFFER_MAX_TURNS, max_tokens=config.BUFFER_MAX_TOKENS,
+                                    summarize=summarize, executor=executor,
+                                    fold_tokens=config.BUFFER_SUMMARY_BATCH_TOKENS)
+        self.last_turn_stats = {}
+        # Turns of one session run one at a time, in arrival order, whether they come
+        # from sync (`with`) or async (`async with`) callers; sessions never wait on each other.
+        self.lock = TurnLock()
+        # Checked-out turns (running or waiting on the lock); such a session is never evicted
+        self.active_turns = 0
+
+    def in_use(self):
+        return self.active_turns > 0
+
+    def close(self):
+        self.archive.flush_usage()
+        self.core.close()
+        memory_tiers.drop_session(self.session_id)
+        exact_search.drop_session(self.session_id)
+        lexical_index.drop_session(self.session_id)
+
+
+class SessionManager:
+    """Resident sessions keyed by id, created on first use and evicted
+    least-recently-used (idle ones only) beyond `max_sessions`.
+    `summarize` / `executor` are handed to every session's buffer (rolling summary)."""
+
+    def __init__(self, max_sessions=None, summarize=None, executor=None):
+        self.max_sessions = max_sessions or config.MAX_ACTIVE_SESSIONS
+        self.summarize = summarize
+        self.executor = executor
+        self._sessions = OrderedDict()
+        self._opening = {}      # session id -> Event set once its session is built (or failed to)
+        self._closing = {}      # session id -> Event set once its evicted session has closed
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate(session_id):
+        session_id = session_id or config.DEFAULT_SESSION_ID
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session_id: {session_id!r}")
+        return session_id
+
+    def get(self, session_id=None):
+        return self._get(session_id, pin=False)
+
+    @contextmanager
+    def checkout(self, session_id=None):
+        """Pin a session for the duration of a turn so eviction cannot close it underneath."""
+        session = self._get(session_id, pin=True)
+        try:
+            yield session
+        finally:
+            with self._lock:
+                session.active_turns -= 1
+
+    @asynccontextmanager
+    async def acheckout(self, session_id=None, executor=None):
+        """checkout() for async callers: opening a session and closing the ones it
+        evicts is disk work, so it runs on `executor` instead of the event loop."""
+        loop = asyncio.get_running_loop()
+        session = await loop.run_in_executor(executor, self._get, session_id, True)
+        try:
+            yield session
+        finally:
+            with self._lock:
+                session.active_turns -= 1
+
+    def _get(self, session_id, pin):
+        session_id = self.validate(session_id)
+        session = None
+        while True:
+            with self._lock:
+                if session is not None:
+                    # Built outside the lock (below); callers waiting on the id find it in place
+                    self._sessions[session_id] = session
+                    self._opening.pop(session_id).set()
+                pending = self._closing.get(session_id) or self._opening.get(session_id)
+                if pending is None:
+                    session = self._sessions.get(session_id)
+                    if session is not None:
+                        self._sessions.move_to_end(session_id)
+                        if pin:
+                            session.active_turns += 1
+                        evicted = self._evict()
+                        break
+                    self._opening[session_id] = threading.Event()
+            if pending is not None:
+                # Reopening before the evicted copy has flushed would read stale state,
+                # and a second open of the same id would load it twice
+                pending.wait()
+                continue
+            # Opening reads the state shard from disk; other sessions check out meanwhile
+            try:
+                session = Session(session_id, self.summarize, self.executor)
+            except BaseException:
+                with self._lock:
+                    self._opening.pop(session_id).set()
+                raise
+        for old in evicted:
+            try:
+                old.close()
+            finally:
+                with self._lock:
+                    self._closing.pop(old.session_id).set()
+        return session
+
+    def _evict(self):
+        evicted = []
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            session = self._sessions[session_id]
+            if session.session_id != config.DEFAULT_SESSION_ID and not session.in_use():
+                evicted.append(self._sessions.pop(session_id))
+                self._closing[session_id] = threading.Event()
+        return evicted
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
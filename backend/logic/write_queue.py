@@ -0,0 +1,209 @@
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+import config
+from backend.logic import metrics
+from backend.managers import chroma_store, exact_search, lexical_index
+from backend.managers.embeddings import embed_documents
+
+
+class ArchiveWriteQueue:
+    """Bounded queue of background archive writes, drained by a fixed pool of
+    worker threads that commit in batches (one `add` / `update` per collection
+    per batch).
+
+    Every record is appended to a spool segment on disk before it is queued.
+    A segment is deleted once all its records are committed, so whatever is
+    left at startup was in flight during a crash and is replayed with `upsert`
+    (ids are assigned at enqueue time, so a replay never duplicates).
+    `put()` blocks while the queue is full, which pushes back on the caller.
+    """
+
+    def __init__(self, spool_dir=None, workers=None, max_pending=None, batch_max=None):
+        self.spool_dir = Path(spool_dir or config.ARCHIVE_SPOOL_DIR)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_max = batch_max or config.ARCHIVE_BATCH_MAX
+        self.queue = queue.Queue(maxsize=max_pending or config.ARCHIVE_QUEUE_MAX)
+        self._lock = threading.Lock()
+        self._outstanding = {}     # spool segment -> records not yet committed
+        self._segment = None
+        self._segment_records = 0
+        self._spool = None
+        self._closed = False
+
+        self.recover()
+        self._open_segment()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"archive-writer-{i}", daemon=True)
+            for i in range(workers or config.ARCHIVE_WRITE_WORKERS)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # --- SPOOL ---
+    def _segments(self):
+        return sorted(self.spool_dir.glob("*.jsonl"), key=lambda p: int(p.stem))
+
+    def _open_segment(self):
+        segments = self._segments()
+        self._segment = int(segments[-1].stem) + 1 if segments else 1
+        self._segment_records = 0
+        self._outstanding[self._segment] = 0
+        self._spool = open(self.spool_dir / f"{self._segment:06d}.jsonl", "a")
+
+    def _release(self, segment, count):
+        # Called with the lock held once `count` records of `segment` are committed
+        self._outstanding[segment] -= count
+        if self._outstanding[segment] == 0 and segment != self._segment:
+            del self._outstanding[segment]
+            (self.spool_dir / f"{segment:06d}.jsonl").unlink(missing_ok=True)
+
+    def recover(self):
+        """Replay spool segments left behind by a previous process."""
+        segments = self._segments()
+        records = []
+        for path in segments:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # torn tail from a crash mid-append
+        try:
+            for i in range(0, len(records), self.batch_max):
+                self._commit(records[i:i + self.batch_max], upsert=True)
+        except Exception as e:
+            # Keep the segments; new ones are numbered after them, so the next start retries
+            print(f"[SYSTEM] Archive spool recovery failed, will retry on next start: {e}")
+            return 0
+        for path in segments:
+            path.unlink()
+        if records:
+            print(f"[SYSTEM] Recovered {len(records)} unsaved archive writes")
+        return len(records)
+
+    # --- PRODUCER ---
+    def put(self, record):
+        """Spool and enqueue one record: {"collection", "id", "document", "metadata"} for an add,
+        or {"op": "update", "collection", "id", "metadata"} to merge metadata keys."""
+        self.put_many([record])
+
+    def put_many(self, records):
+        """Spool and enqueue records as one queue item, so they are committed in the same batch."""
+        if not records:
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Archive write queue is closed")
+            self._spool.write("".join(json.dumps(record) + "\n" for record in records))
+            self._spool.flush()
+            if config.ARCHIVE_SPOOL_FSYNC:
+                os.fsync(self._spool.fileno())
+            segment = self._segment
+            self._outstanding[segment] += len(records)
+            self._segment_records += len(records)
+            if self._segment_records >= config.ARCHIVE_SPOOL_ROTATE:
+                self._spool.close()
+                self._open_segment()
+                if self._outstanding[segment] == 0:
+                    self._release(segment, 0)
+        self.queue.put((segment, time.perf_counter(), records))
+        metrics.ARCHIVE_QUEUE_DEPTH.set(self.queue.qsize())
+
+    # --- WORKERS ---
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch, stop = [item], False
+            size = len(item[2])
+            while size < self.batch_max:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                size += len(item[2])
+            metrics.ARCHIVE_QUEUE_DEPTH.set(self.queue.qsize())
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        records = [record for _, _, item_records in batch for record in item_records]
+        for attempt in range(config.ARCHIVE_WRITE_RETRIES + 1):
+            try:
+                with metrics.stage_span("background_save"):
+                    self._commit(records)
+                break
+            except Exception as e:
+                if attempt == config.ARCHIVE_WRITE_RETRIES:
+                    # Left in the spool: the next start replays them
+                    metrics.ARCHIVE_WRITES.inc(len(records), status="failed")
+                    print(f"[SYSTEM] Archive write of {len(records)} records failed, kept in spool: {e}")
+                    return
+                time.sleep(0.1 * 2 ** attempt)
+
+        now = time.perf_counter()
+        committed = {}
+        for segment, enqueued_at, item_records in batch:
+            metrics.ARCHIVE_WRITE_LAG_SECONDS.observe(now - enqueued_at)
+            committed[segment] = committed.get(segment, 0) + len(item_records)
+        metrics.ARCHIVE_WRITES.inc(len(records), status="ok")
+        metrics.ARCHIVE_BATCH_SIZE.observe(len(records))
+        with self._lock:
+            for segment, count in committed.items():
+                self._release(segment, count)
+
+    @staticmethod
+    def _commit(records, upsert=False):
+        groups = {}
+        for record in records:
+            groups.setdefault((record["collection"], record.get("op", "add")), []).append(record)
+        for (name, op), group in groups.items():
+            collection = chroma_store.get_collection(name)
+            if op == "update":
+                # Metadata-only; repeated ids in one batch merge (later wins), missing ids are ignored
+                merged = {}
+                for r in group:
+                    merged.setdefault(r["id"], {}).update(r["metadata"])
+                collection.update(ids=list(merged), metadatas=list(merged.values()))
+                exact_search.update_metadatas(name, list(merged), list(merged.values()))
+                continue
+            write = collection.upsert if upsert else collection.add
+            ids = [r["id"] for r in group]
+            documents = [r["document"] for r in group]
+            metadatas = [r["metadata"] for r in group]
+            embeddings = embed_documents(documents)
+            write(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+            exact_search.index_vectors(name, ids, embeddings, documents, metadatas)
+            lexical_index.index_documents(name, ids, documents, metadatas)
+
+    def stats(self):
+        with self._lock:
+            spooled = sum(self._outstanding.values())
+        return {"depth": self.queue.qsize(), "pending": spooled}
+
+    def close(self):
+        """Stop accepting writes, let the workers drain the queue, then drop the spool."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        metrics.ARCHIVE_QUEUE_DEPTH.set(0)
+        with self._lock:
+            self._spool.close()
+            if self._outstanding.get(self._segment) == 0:
+                del self._outstanding[self._segment]
+                (self.spool_dir / f"{self._segment:06d}.jsonl").unlink(missing_ok=True)
@@ -1,41 +1,113 @@
-import chromadb
 import uuid
+import threading
+import numpy as np
 import config # Import the new config
+from backend.managers import chroma_store, exact_search, lexical_index, memory_tiers
+from backend.managers.embeddings import embed_query, embed_documents
+
+# A new fact at least this similar (cosine) to a stored one is merged into it
+FACT_DEDUP_SIMILARITY = 0.85
 
 class ArchivalMemoryManager:
-    def __init__(self):
-        # FIX: Use the absolute path from config
-        print(f"[SYSTEM] Connecting to ChromaDB at: {config.CHROMA_DB_DIR}")
-        self.client = chromadb.PersistentClient(path=str(config.CHROMA_DB_DIR))
-        
-        self.semantic = self.client.get_or_create_collection(
-            name="semantic_memory",
-            metadata={"hnsw:space": "cosine"}
-        )
-        self.episodic = self.client.get_or_create_collection(
-            name="conversation_logs",
-            metadata={"hnsw:space": "cosine"}
-        )
+    def __init__(self, session_id=None):
+        # Shared process-wide client; collections are looked up in the store's registry
+        self.client = chroma_store.get_client()
+        # Records are tagged with, and queries filtered by, the owning session
+        self.session_id = session_id or config.DEFAULT_SESSION_ID
+        self.where, self.id_prefix = chroma_store.session_scope(self.session_id)
+        # last_used_turn bumps from retrievals, written later in one batch (reads stay reads)
+        self._usage = {}
+        self._usage_lock = threading.Lock()
 
-    def add_memory(self, content, role, turn_number):
-        memory_id = f"mem_{uuid.uuid4().hex[:8]}"
-        self.episodic.add(
-            documents=[content],
-            metadatas=[{
+    @property
+    def semantic(self):
+        return chroma_store.get_collection("semantic_memory")
+
+    @property
+    def episodic(self):
+        return chroma_store.get_collection("conversation_logs")
+
+    def memory_record(self, content, role, turn_number):
+        """A conversation-log write as plain data, for the background write queue."""
+        return {
+            "collection": "conversation_logs",
+            "id": f"{self.id_prefix}mem_{uuid.uuid4().hex[:8]}",
+            "document": content,
+            "metadata": {
                 "role": role,
                 "turn_number": turn_number,
-                "origin_turn": turn_number
-            }],
-            ids=[memory_id]
-        )
-        return memory_id
+                "origin_turn": turn_number,
+                "session_id": self.session_id
+            }
+        }
 
-    def search_memory(self, query, n_results=3):
-        results = self.semantic.query(
-            query_texts=[query],
-            n_results=n_results
+    def add_memory(self, content, role, turn_number):
+        record = self.memory_record(content, role, turn_number)
+        self.episodic.add(
+            documents=[record["document"]],
+            embeddings=embed_documents([record["document"]]),
+            metadatas=[record["metadata"]],
+            ids=[record["id"]]
         )
-        memories = []
+        lexical_index.index_documents("conversation_logs", [record["id"]], [record["document"]], [record["metadata"]])
+        return record["id"]
+
+    def search_memory(self, query, n_results=3, query_embedding=None, query_ctx=None, include_logs=False, turn_number=None):
+        """Archive search. With config.HYBRID_RETRIEVAL, vector and BM25 rankings are
+        fused (RRF), and short queries with a selective exact match (a rare term or the
+        whole phrase) are answered from the lexical index without embedding, unless
+        `query_embedding` is given. `include_logs` also searches conversation logs (lexically, or
+        by vector when ARCHIVE_LOG_BACKEND = "mmap" keeps them out of the lexical index).
+        The query is embedded from `query_ctx` only if the vector search runs.
+        With `turn_number`, the facts returned are marked used at that turn."""
+        hits = self._search(query, n_results, query_embedding, query_ctx, include_logs)
+        if turn_number is not None:
+            used = [mem for name, mem in hits if name == "semantic_memory"]
+            for mem in used:
+                mem["last_used_turn"] = turn_number
+            if used:
+                self._note_usage([mem["memory_id"] for mem in used], turn_number)
+        return [mem for _, mem in hits]
+
+    def _search(self, query, n_results, query_embedding, query_ctx, include_logs):
+        # (source collection, memory) pairs, best first
+        sources = ["semantic_memory"] + (["conversation_logs"] if include_logs else [])
+        # With the query already embedded (the proactive path) skipping the vector search saves nothing
+        if config.HYBRID_RETRIEVAL and query_embedding is None:
+            exact = self._exact_matches(query, sources, n_results)
+            if exact:
+                return exact
+        if query_embedding is None and query_ctx is not None:
+            query_embedding = query_ctx.get(query)
+
+        # Hot tier first; the whole archive only when it has no good match
+        query_vector = embed_query(query, query_embedding)
+        memories = self._vector_memories("semantic_memory", memory_tiers.query(self.session_id, query_vector, self.where, n_results))
+        if not config.HYBRID_RETRIEVAL:
+            return [("semantic_memory", mem) for mem in memories.values()]
+
+        # Lexical rankings per source, fused with the vector ranking
+        rankings, found_in = [list(memories)], dict.fromkeys(memories, "semantic_memory")
+        for name in sources:
+            if lexical_index.indexed(name):
+                hits = [doc_id for doc_id, _ in lexical_index.get_index(name, self.session_id).search(query, n_results=n_results)]
+            else:
+                # Kept out of RAM (the mmap log store), so ranked by vector instead
+                logs = self._vector_memories(name, chroma_store.get_collection(name).query(
+                    query_embeddings=[query_vector], where=self.where, n_results=n_results))
+                memories.update((doc_id, mem) for doc_id, mem in logs.items() if doc_id not in memories)
+                hits = list(logs)
+            rankings.append(hits)
+            for doc_id in hits:
+                found_in.setdefault(doc_id, name)
+        return [
+            (found_in[doc_id], {**(memories.get(doc_id) or self._lexical_memory(found_in[doc_id], doc_id)), "score": score})
+            for doc_id, score in lexical_index.rrf(*rankings)[:n_results]
+        ]
+
+    @staticmethod
+    def _vector_memories(name, results):
+        memories = {}
         if results['ids'] and results['ids'][0]:
             for i, doc in enumerate(results['documents'][0]):
                 meta = results['metadatas'][0][i]
@@ -45,77 +117,232 @@ class ArchivalMemoryManager:
                     "content": doc,
                     "origin_turn": meta.get("origin_turn", 0),
                     "last_used_turn": meta.get("last_used_turn", 0),
-                    "distance": results['distances'][0][i]
+                    "distance": results['distances'][0][i],
+                    "score": chroma_store.similarity(name, results['distances'][0][i])
                 }
-                memories.append(mem_obj)
+                memories[mem_id] = mem_obj
         return memories
 
+    def _exact_matches(self, query, sources, n_results):
+        # Names, codes and years: a document holding every term is as good as it gets, but only
+        # when the match is selective. A query term rare enough (in no more documents than are
+        # asked for) or the query as an exact phrase qualifies; containment of common terms does not.
+        tokens = lexical_index.tokenize(query)
+        if not tokens or len(tokens) > config.LEXICAL_EXACT_MAX_TOKENS:
+            return []
+        hits = []
+        for name in sources:
+            index = lexical_index.get_index(name, self.session_id)
+            rare = any(index.doc_freq(token) <= n_results for token in tokens)
+            for doc_id, score in index.search(query, n_results=n_results, require_all=True):
+                if rare or (len(tokens) > 1 and lexical_index.contains_phrase(index.get(doc_id)[0], tokens)):
+                    hits.append((score, name, doc_id))
+        hits.sort(reverse=True)
+        return [(name, {**self._lexical_memory(name, doc_id), "score": 1.0}) for _, name, doc_id in hits[:n_results]]
+
+    def _lexical_memory(self, name, doc_id):
+        # A hit known only to the lexical index (so no vector distance)
+        document, meta = lexical_index.get_index(name, self.session_id).get(doc_id)
+        return {
+            "memory_id": doc_id,
+            "content": document,
+            "origin_turn": meta.get("origin_turn", 0),
+            "last_used_turn": meta.get("last_used_turn", 0)
+        }
+
     # (Keep add_fact, add_episode, retrieve_relevant_context as they were...)
     # [Insert previous code for those methods here if needed, or leave them if you didn't delete them]
 
     # --- KEEPING YOUR ORIGINAL METHODS (To prevent breaking other logic) ---
     def add_fact(self, content, turn_number, confidence=1.0):
-        # 1. Check Redundancy
-        results = self.semantic.query(
-            query_texts=[content],
+        # 1. Check Redundancy (the same vector is reused for the insert below)
+        vector = embed_query(content)
+        results = exact_search.query(
+            "semantic_memory", self.session_id,
+            query_embeddings=[vector],
+            where=self.where,
             n_results=1
         )
         
-        if results['ids'] and results['ids'][0] and results['distances'][0][0] < 0.15:
+        if results['ids'] and results['ids'][0] and chroma_store.similarity("semantic_memory", results['distances'][0][0]) > FACT_DEDUP_SIMILARITY:
             existing_id = results['ids'][0][0]
             current_meta = results['metadatas'][0][0]
             current_meta['last_used_turn'] = turn_number
             current_meta['count'] = current_meta.get('count', 1) + 1
             
             self.semantic.update(ids=[existing_id], metadatas=[current_meta])
+            exact_search.update_metadatas("semantic_memory", [existing_id], [current_meta])
+            memory_tiers.note_turn(self.session_id, turn_number)
             return existing_id, f"Memory Refreshed (Merged with {existing_id})"
 
-        memory_id = f"fact_{uuid.uuid4().hex[:8]}"
+        memory_id = f"{self.id_prefix}fact_{uuid.uuid4().hex[:8]}"
+        metadata = {
+            "type": "fact",
+            "origin_turn": turn_number,
+            "last_used_turn": turn_number,
+            "count": 1,
+            "confidence": confidence,
+            "session_id": self.session_id
+        }
         self.semantic.add(
             documents=[content],
-            metadatas=[{
-                "type": "fact",
-                "origin_turn": turn_number,
-                "last_used_turn": turn_number,
-                "count": 1,
-                "confidence": confidence
-            }],
+            embeddings=[vector],
+            metadatas=[metadata],
             ids=[memory_id]
         )
+        exact_search.index_vectors("semantic_memory", [memory_id], [vector], [content], [metadata])
+        lexical_index.index_documents("semantic_memory", [memory_id], [content], [metadata])
+        memory_tiers.note_turn(self.session_id, turn_number)
         return memory_id, "New Memory Stored"
 
+    def add_facts(self, contents, turn_number, confidence=1.0):
+        """Bulk add_fact: same dedup rule, batched.
+
+        1. Embed every fact in one call.
+        2. Dedup within the batch (pairwise cosine, first occurrence wins).
+        3. One multi-query finds stored near-duplicates of the survivors.
+        4. One `add` for new facts, one `update` for refreshed ones
+           (split only where Chroma's max batch size requires it).
+
+        Returns [(memory_id, status)] aligned with `contents`.
+        """
+        if not contents:
+            return []
+        vectors = np.asarray(embed_documents(contents), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = vectors / np.where(norms == 0, 1, norms)
+
+        # 2. In-batch dedup: owner[i] is the index of the first fact i duplicates (or i itself)
+        owner, reps = self._dedup_batch(unit, FACT_DEDUP_SIMILARITY)
+
+        # 3. Stored near-duplicates of the batch representatives, one multi-query
+        matched = {}
+        for start in range(0, len(reps), 512):
+            chunk = reps[start:start + 512]
+            results = exact_search.query(
+                "semantic_memory", self.session_id,
+                query_embeddings=vectors[chunk],
+                where=self.where,
+                n_results=1,
+                include=["distances", "metadatas"]
+            )
+            for rep_index, ids, dists, metas in zip(chunk, results['ids'], results['distances'], results['metadatas']):
+                if ids and chroma_store.similarity("semantic_memory", dists[0]) > FACT_DEDUP_SIMILARITY:
+                    matched[rep_index] = (ids[0], metas[0])
+
+        merges = {}
+        for i in range(len(contents)):
+            merges[owner[i]] = merges.get(owner[i], 0) + 1
+
+        # 4. Assign ids, then write
+        outcome = {}
+        new_ids, new_docs, new_vectors, new_metas = [], [], [], []
+        refreshed = {}
+        for rep_index in reps:
+            if rep_index in matched:
+                existing_id, meta = matched[rep_index]
+                entry = refreshed.setdefault(existing_id, {"count": meta.get('count', 1), "last_used_turn": turn_number})
+                entry["count"] += merges[rep_index]
+                outcome[rep_index] = (existing_id, f"Memory Refreshed (Merged with {existing_id})")
+            else:
+                memory_id = f"{self.id_prefix}fact_{uuid.uuid4().hex[:8]}"
+                new_ids.append(memory_id)
+                new_docs.append(contents[rep_index])
+                new_vectors.append(vectors[rep_index].tolist())
+                new_metas.append({
+                    "type": "fact",
+                    "origin_turn": turn_number,
+                    "last_used_turn": turn_number,
+                    "count": merges[rep_index],
+                    "confidence": confidence,
+                    "session_id": self.session_id
+                })
+                outcome[rep_index] = (memory_id, "New Memory Stored")
+
+        step = self.client.get_max_batch_size()
+        for start in range(0, len(new_ids), step):
+            end = start + step
+            self.semantic.add(ids=new_ids[start:end], documents=new_docs[start:end],
+                              embeddings=new_vectors[start:end], metadatas=new_metas[start:end])
+        exact_search.index_vectors("semantic_memory", new_ids, new_vectors, new_docs, new_metas)
+        lexical_index.index_documents("semantic_memory", new_ids, new_docs, new_metas)
+        refreshed_ids = list(refreshed)
+        for start in range(0, len(refreshed_ids), step):
+            ids = refreshed_ids[start:start + step]
+            self.semantic.update(ids=ids, metadatas=[refreshed[i] for i in ids])
+        exact_search.update_metadatas("semantic_memory", refreshed_ids, [refreshed[i] for i in refreshed_ids])
+        memory_tiers.note_turn(self.session_id, turn_number)
+
+        return [
+            outcome[i] if owner[i] == i else (outcome[owner[i]][0], f"Memory Refreshed (Merged with {outcome[owner[i]][0]})")
+            for i in range(len(contents))
+        ]
+
+    @staticmethod
+    def _dedup_batch(unit, min_similarity, block=512):
+        """Greedy in-order dedup on unit vectors: a fact joins the most similar earlier
+        representative above `min_similarity`, otherwise it becomes one."""
+        n = len(unit)
+        owner = np.arange(n)
+        reps = []
+        for start in range(0, n, block):
+            blk = unit[start:start + block]
+            prev = blk @ unit[reps].T if reps else None
+            inner = blk @ blk.T
+            in_block = []
+            for b in range(len(blk)):
+                best_sim, best = -1.0, None
+                if prev is not None:
+                    j = int(np.argmax(prev[b]))
+                    best_sim, best = prev[b, j], reps[j]
+                if in_block:
+                    sims = inner[b, in_block]
+                    j = int(np.argmax(sims))
+                    if sims[j] > best_sim:
+                        best_sim, best = sims[j], start + in_block[j]
+                if best is not None and best_sim > min_similarity:
+                    owner[start + b] = best
+                else:
+                    in_block.append(b)
+            reps.extend(start + b for b in in_block)
+        return owner.tolist(), reps
+
     def add_episode(self, user_msg, bot_msg, turn_number):
         """Standard logging of the conversation"""
-        memory_id = f"ep_{uuid.uuid4().hex[:8]}"
+        memory_id = f"{self.id_prefix}ep_{uuid.uuid4().hex[:8]}"
         content = f"User: {user_msg}\nAssistant: {bot_msg}"
         self.episodic.add(
             documents=[content],
-            metadatas=[{"turn": turn_number}],
+            embeddings=embed_documents([content]),
+            metadatas=[{"turn": turn_number, "session_id": self.session_id}],
             ids=[memory_id]
         )
+        lexical_index.index_documents("conversation_logs", [memory_id], [content], [{"turn": turn_number, "session_id": self.session_id}])
 
-    def retrieve_relevant_context(self, query, turn_number, n_results=3):
-        results = self.semantic.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        
-        memories = []
-        if results['ids'] and results['ids'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                meta = results['metadatas'][0][i]
-                mem_id = results['ids'][0][i]
-                
-                mem_obj = {
-                    "memory_id": mem_id,
-                    "content": doc,
-                    "origin_turn": meta.get("origin_turn", 0),
-                    "last_used_turn": turn_number,
-                    "distance": results['distances'][0][i]
-                }
-                memories.append(mem_obj)
-                
-                meta['last_used_turn'] = turn_number
-                self.semantic.update(ids=[mem_id], metadatas=[meta])
+    def retrieve_relevant_context(self, query, turn_number, n_results=3, query_embedding=None):
+        memories = self.search_memory(query, n_results=n_results, query_embedding=query_embedding, turn_number=turn_number)
+        memory_tiers.note_turn(self.session_id, turn_number)
+        return memories
+
+    # --- USAGE TRACKING ---
+    def _note_usage(self, memory_ids, turn_number):
+        with self._usage_lock:
+            for mem_id in memory_ids:
+                self._usage[mem_id] = max(self._usage.get(mem_id, 0), turn_number)
+
+    def usage_records(self):
+        """Drain pending last_used_turn bumps as metadata-update records for the write queue."""
+        with self._usage_lock:
+            usage, self._usage = self._usage, {}
+        return [
+            {"op": "update", "collection": "semantic_memory", "id": mem_id, "metadata": {"last_used_turn": turn}}
+            for mem_id, turn in usage.items()
+        ]
 
-        return memories
\ No newline at end of file
+    def flush_usage(self):
+        """Write pending bumps now, as one update (Chroma merges the metadata keys)."""
+        records = self.usage_records()
+        if records:
+            self.semantic.update(ids=[r["id"] for r in records], metadatas=[r["metadata"] for r in records])
+            exact_search.update_metadatas("semantic_memory", [r["id"] for r in records], [r["metadata"] for r in records])
+        return len(records)
\ No newline at end of file
@@ -0,0 +1,323 @@
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import config
+
+# Per-row metadata columns: what scans filter on without touching the heap
+COLUMNS = np.dtype([("session", "<u4"), ("turn", "<i4"), ("offset", "<u8"), ("length", "<u4")])
+SCAN_ROWS = 65536
+IMPORT_MARKER = ".imported"
+
+
+class MmapLogStore:
+    """Append-only conversation-log store with a Chroma-like collection API
+    (add / upsert / update / get / query / count).
+
+    Files in `path`:
+      meta.json      vector dim, dtype and space
+      vectors.bin    one fixed-width row per record: float16, or int8 with a
+                     float32 scale per row in scales.bin
+      ids.txt        the id -> offset table: line i is the id of row i, whose
+                     vector starts at i * row_bytes; written last, so it is the commit point
+      columns.bin    COLUMNS per row (session code, turn, heap offset and length)
+      heap.jsonl     id, document and metadata per record, addressed by columns.bin
+      sessions.txt   line i is the session id with code i
+
+    Only the id map and the session list are held in memory; vectors and
+    columns are read through memory maps, so the OS page cache keeps the hot set.
+    """
+
+    def __init__(self, path, dtype="float16", space="cosine"):
+        self.name = "conversation_logs"
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self._open(dtype, space)
+
+    def _open(self, dtype, space):
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_file = self.path / "meta.json"
+        if meta_file.exists():
+            with open(meta_file) as f:
+                meta = json.load(f)
+            # The files keep the format they were created with
+            self.dim, self.dtype, self.space = meta["dim"], meta["dtype"], meta["space"]
+        else:
+            if dtype not in ("float16", "int8"):
+                raise ValueError(f"Unsupported archive vector dtype: {dtype}")
+            self.dim, self.dtype, self.space = None, dtype, space
+        self._fds = {name: os.open(self.path / name, os.O_RDWR | os.O_CREAT, 0o644)
+                     for name in ("vectors.bin", "scales.bin", "ids.txt", "columns.bin", "heap.jsonl", "sessions.txt")}
+
+        self.rows = {}
+        with open(self.path / "ids.txt") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # torn write
+                self.rows[line[:-1]] = len(self.rows)
+        self.n = len(self.rows)
+        with open(self.path / "sessions.txt") as f:
+            self.sessions = [line[:-1] for line in f if line.endswith("\n")]
+        self.session_codes = {session_id: code for code, session_id in enumerate(self.sessions)}
+
+        # Drop anything past the last committed row (a write interrupted mid-way)
+        self._truncate("ids.txt", sum(len(doc_id.encode("utf-8")) + 1 for doc_id in self.rows))
+        self._truncate("columns.bin", self.n * COLUMNS.itemsize)
+        if self.dim:
+            self._truncate("vectors.bin", self.n * self.row_bytes)
+            self._truncate("scales.bin", self.n * 4 if self.dtype == "int8" else 0)
+        self.heap_end = os.fstat(self._fds["heap.jsonl"]).st_size
+        self._maps = (0, None, None, None)
+
+    def _truncate(self, name, size):
+        if os.fstat(self._fds[name]).st_size > size:
+            os.ftruncate(self._fds[name], size)
+
+    @property
+    def row_bytes(self):
+        return self.dim * (2 if self.dtype == "float16" else 1)
+
+    def count(self):
+        return self.n
+
+    # --- WRITES ---
+    def _encode(self, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.space == "cosine":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        return np.round(vectors / scales[:, np.newaxis]).astype(np.int8), scales.astype(np.float32)
+
+    def _session_code(self, session_id):
+        code = self.session_codes.get(session_id)
+        if code is None:
+            code = self.session_codes[session_id] = len(self.sessions)
+            self.sessions.append(session_id)
+            self._append("sessions.txt", f"{session_id}\n".encode("utf-8"))
+        return code
+
+    def _append(self, name, data):
+        os.pwrite(self._fds[name], data, os.fstat(self._fds[name]).st_size)
+
+    def _sync(self, *names):
+        # Data reaches the disk before the commit point that refers to it does
+        if config.ARCHIVE_MMAP_FSYNC:
+            for name in names:
+                os.fsync(self._fds[name])
+
+    def _heap_record(self, doc_id, document, metadata):
+        data = (json.dumps({"id": doc_id, "document": document, "metadata": metadata}) + "\n").encode("utf-8")
+        offset = self.heap_end
+        os.pwrite(self._fds["heap.jsonl"], data, offset)
+        self.heap_end += len(data)
+        metadata = metadata or {}
+        session = self._session_code(metadata.get("session_id", config.DEFAULT_SESSION_ID))
+        turn = metadata.get("turn_number", metadata.get("turn", 0))
+        return np.array([(session, turn, offset, len(data))], dtype=COLUMNS)
+
+    def _write(self, ids, documents, embeddings, metadatas, replace):
+        from backend.managers.embeddings import embed_documents
+        if not ids:
+            return
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        if embeddings is None:
+            embeddings = embed_documents(documents)
+        with self.lock:
+            if self.dim is None:
+                self.dim = len(embeddings[0])
+                with open(self.path / "meta.json", "w") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype, "space": self.space}, f)
+            vectors, scales = self._encode(embeddings)
+            new_rows = {}
+            for i, doc_id in enumerate(ids):
+                row = self.rows.get(doc_id, new_rows.get(doc_id))
+                if row is not None and not replace:
+                    continue  # like Chroma's add(): an existing id is left alone
+                column = self._heap_record(doc_id, documents[i], metadatas[i])
+                if row is None:
+                    row = new_rows[doc_id] = self.n + len(new_rows)
+                os.pwrite(self._fds["vectors.bin"], vectors[i].tobytes(), row * self.row_bytes)
+                if scales is not None:
+                    os.pwrite(self._fds["scales.bin"], scales[i].tobytes(), row * 4)
+                os.pwrite(self._fds["columns.bin"], column.tobytes(), row * COLUMNS.itemsize)
+            if new_rows:
+                self._sync("vectors.bin", "scales.bin", "columns.bin", "heap.jsonl", "sessions.txt")
+                self._append("ids.txt", "".join(f"{doc_id}\n" for doc_id in new_rows).encode("utf-8"))
+                self._sync("ids.txt")
+                self.rows.update(new_rows)
+                self.n += len(new_rows)
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._write(ids, documents, embeddings, metadatas, replace=False)
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        self._write(ids, documents, embeddings, metadatas, replace=True)
+
+    def update(self, ids, metadatas):
+        """Merge metadata into existing records (a new heap entry; the column row is rewritten)."""
+        with self.lock:
+            columns = []
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self.rows.get(doc_id)
+                if row is None:
+                    continue
+                record = self._read(row)
+                columns.append((row, self._heap_record(doc_id, record["document"], {**(record["metadata"] or {}), **metadata})))
+            # The old heap entry stays valid until its column row is rewritten
+            self._sync("heap.jsonl", "sessions.txt")
+            for row, column in columns:
+                os.pwrite(self._fds["columns.bin"], column.tobytes(), row * COLUMNS.itemsize)
+
+    # --- READS ---
+    def _read(self, row, columns=None):
+        entry = (self._mapped()[1] if columns is None else columns)[row]
+        return json.loads(os.pread(self._fds["heap.jsonl"], int(entry["length"]), int(entry["offset"])))
+
+    def _mapped(self):
+        """(rows, columns, vectors, scales) maps covering every committed row; remapped after growth."""
+        with self.lock:
+            n = self.n
+            if self._maps[0] != n:
+                if n == 0:
+                    self._maps = (0, None, None, None)
+                else:
+                    columns = np.memmap(self.path / "columns.bin", dtype=COLUMNS, mode="r", shape=(n,))
+                    vectors = np.memmap(self.path / "vectors.bin", dtype=self.dtype, mode="r", shape=(n, self.dim))
+                    scales = np.memmap(self.path / "scales.bin", dtype=np.float32, mode="r", shape=(n,)) if self.dtype == "int8" else None
+                    self._maps = (n, columns, vectors, scales)
+            return self._maps
+
+    def _session_rows(self, where, columns, start, stop):
+        """Rows in [start, stop) matching `where` (session_id equality is the only supported filter)."""
+        session_id = None
+        for clause in (where or {}).get("$and", [where] if where else []):
+            for key, value in clause.items():
+                if key != "session_id":
+                    raise ValueError(f"The mmap archive filters on session_id only, not {key}")
+                session_id = value
+        if session_id is None:
+            return np.arange(start, stop)
+        code = self.session_codes.get(session_id)
+        if code is None:
+            return np.arange(0)
+        return start + np.flatnonzero(columns["session"][start:stop] == code)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        n, columns, vectors, scales = self._mapped()
+        if ids is not None:
+            rows = [self.rows[doc_id] for doc_id in ids if doc_id in self.rows]
+        elif n:
+            rows = self._session_rows(where, columns, 0, n)
+            rows = rows[offset or 0:][:limit] if limit is not None else rows[offset or 0:]
+        else:
+            rows = []
+        records = [self._read(row, columns) for row in rows]
+        result = {"ids": [record["id"] for record in records]}
+        if "documents" in include:
+            result["documents"] = [record["document"] for record in records]
+        if "metadatas" in include:
+            result["metadatas"] = [record["metadata"] for record in records]
+        if "embeddings" in include:
+            result["embeddings"] = self._decode(vectors, scales, np.asarray(rows, dtype=np.int64)) if len(rows) else np.zeros((0, self.dim or 0))
+        return result
+
+    @staticmethod
+    def _decode(vectors, scales, rows):
+        block = vectors[rows].astype(np.float32)
+        if scales is not None:
+            block *= scales[rows][:, np.newaxis]
+        return block
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        """Exact top-k by a chunked scan of the mapped vectors, restricted to `where`'s session."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        n, columns, vectors, scales = self._mapped()
+        best = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        for start in range(0, n, SCAN_ROWS):
+            rows = self._session_rows(where, columns, start, min(n, start + SCAN_ROWS))
+            if not len(rows):
+                continue
+            block = self._decode(vectors, scales, rows)
+            dots = queries @ block.T
+            if self.space == "l2":
+                distances = (queries * queries).sum(axis=1)[:, np.newaxis] + (block * block).sum(axis=1)[np.newaxis, :] - 2 * dots
+            elif self.space == "cosine":
+                distances = 1 - dots / np.maximum(np.linalg.norm(queries, axis=1)[:, np.newaxis], 1e-12)
+            else:
+                distances = 1 - dots
+            for q in range(len(queries)):
+                candidates = np.concatenate([best[q][0], rows])
+                candidate_distances = np.concatenate([best[q][1], distances[q]])
+                if len(candidates) > n_results:
+                    keep = np.argpartition(candidate_distances, n_results - 1)[:n_results]
+                    candidates, candidate_distances = candidates[keep], candidate_distances[keep]
+                best[q] = (candidates, candidate_distances)
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for rows, distances in best:
+            order = np.argsort(distances)
+            records = [self._read(row, columns) for row in rows[order]]
+            result["ids"].append([record["id"] for record in records])
+            result["documents"].append([record["document"] for record in records])
+            result["metadatas"].append([record["metadata"] for record in records])
+            result["distances"].append([float(d) for d in distances[order]])
+        return result
+
+    def close(self):
+        with self.lock:
+            self._maps = (0, None, None, None)
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds = {}
+
+    def reset(self):
+        """Delete every record (used by migrations)."""
+        with self.lock:
+            self.close()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._open(config.ARCHIVE_MMAP_DTYPE, config.HNSW_PARAMS["conversation_logs"]["space"])
+            (self.path / IMPORT_MARKER).touch()  # emptied on purpose: no re-import from Chroma
+
+
+# --- SHARED STORE ---
+# One store per process, for config.ARCHIVE_LOG_BACKEND = "mmap". On first
+# open, logs already in Chroma's conversation_logs collection are copied in once.
+_store = None
+_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _lock:
+        if _store is None:
+            store = MmapLogStore(config.ARCHIVE_MMAP_DIR, config.ARCHIVE_MMAP_DTYPE,
+                                 config.HNSW_PARAMS["conversation_logs"]["space"])
+            _import_chroma_logs(store)
+            _store = store
+        return _store
+
+
+def _import_chroma_logs(store, page_size=1000):
+    from backend.managers import chroma_store
+    marker = store.path / IMPORT_MARKER
+    if marker.exists():
+        return
+    client = chroma_store.get_client()
+    if "conversation_logs" in [getattr(c, "name", c) for c in client.list_collections()]:
+        collection = client.get_collection("conversation_logs")
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            store.add(ids=page["ids"], documents=page["documents"], embeddings=page["embeddings"], metadatas=page["metadatas"])
+            offset += page_size
+        if store.count():
+            print(f"[SYSTEM] Imported {store.count()} conversation logs from Chroma into {store.path}")
+    marker.touch()
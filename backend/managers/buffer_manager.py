@@ -1,13 +1,87 @@
+import threading
+from collections import deque
+from backend.managers.prompt_builder import count_tokens
+
+
 class BufferManager:
-    def __init__(self, max_turns=10):
+    """Short-term conversation window.
+
+    By default it keeps the last `max_turns` messages; with `max_tokens` set it
+    keeps as many recent messages as fit that many (estimated) tokens instead.
+    Messages that leave the window are folded into a rolling `summary` by
+    `summarize(summary, messages) -> str`, run on `executor` so no turn waits
+    for it. A fold starts once `fold_tokens` worth of messages are waiting, and
+    one fold per buffer runs at a time; messages evicted meanwhile go into the
+    next one.
+    """
+
+    def __init__(self, max_turns=10, max_tokens=None, summarize=None, executor=None,
+                 fold_tokens=0, max_pending=200):
         self.max_turns = max_turns
-        self.history = []
+        self.max_tokens = max_tokens
+        self.history = deque()
+        self.tokens = 0
+        self.summary = ""
+        self._summarize = summarize if executor is not None else None
+        self._executor = executor
+        self._fold_tokens = fold_tokens
+        self._max_pending = max_pending
+        self._evicted = []
+        self._evicted_tokens = 0
+        self._folding = False
+        self._lock = threading.Lock()
 
     def add_turn(self, role, content):
-        self.history.append({"role": role, "content": content})
-        # Keep only the last N messages to prevent context overflow
-        if len(self.history) > self.max_turns:
-            self.history.pop(0)
+        with self._lock:
+            self.history.append({"role": role, "content": content})
+            self.tokens += count_tokens(content)
+            # The newest message always stays, even if it alone is over budget
+            while len(self.history) > 1 and self._over_limit():
+                old = self.history.popleft()
+                self.tokens -= count_tokens(old["content"])
+                if self._summarize:
+                    self._evicted.append(old)
+                    self._evicted_tokens += count_tokens(old["content"])
+            self._schedule_fold()
+
+    def _over_limit(self):
+        if self.max_tokens:
+            return self.tokens > self.max_tokens
+        return len(self.history) > self.max_turns
 
     def get_messages(self):
-        return self.history
\ No newline at end of file
+        with self._lock:
+            return list(self.history)
+
+    # --- ROLLING SUMMARY ---
+    def _schedule_fold(self):
+        # Called with the lock held
+        if not self._evicted or self._folding or self._evicted_tokens < self._fold_tokens:
+            return
+        # If summaries keep failing, the oldest unsummarised messages are dropped
+        del self._evicted[:-self._max_pending]
+        batch, self._evicted, self._evicted_tokens = self._evicted, [], 0
+        try:
+            self._executor.submit(self._fold, self.summary, batch)
+            self._folding = True
+        except RuntimeError:
+            # Executor shut down (process exiting): keep the messages, nothing will fold them
+            self._requeue(batch)
+
+    def _requeue(self, batch):
+        self._evicted[:0] = batch
+        self._evicted_tokens += sum(count_tokens(m["content"]) for m in batch)
+
+    def _fold(self, summary, batch):
+        try:
+            new_summary = self._summarize(summary, batch)
+        except Exception as e:
+            print(f"[SYSTEM] Conversation summary failed, retrying with the next eviction: {e}")
+            with self._lock:
+                self._requeue(batch)
+                self._folding = False
+            return
+        with self._lock:
+            self.summary = new_summary or summary
+            self._folding = False
+            self._schedule_fold()
@@ -0,0 +1,233 @@
+import argparse
+import threading
+
+import chromadb
+
+import config
+
+# Every collection MemoryOS uses; HNSW settings come from config.HNSW_PARAMS
+COLLECTIONS = ("semantic_memory", "conversation_logs", "timeline_events", "entity_facts")
+
+_client = None
+_collections = {}
+_spaces = {}
+_lock = threading.Lock()
+
+
+def hnsw_metadata(params):
+    """Chroma creation metadata for an HNSW_PARAMS entry."""
+    return {"hnsw:space": params["space"], "hnsw:M": params["M"],
+            "hnsw:construction_ef": params["construction_ef"], "hnsw:search_ef": params["search_ef"]}
+
+
+def get_client():
+    """The one PersistentClient for config.CHROMA_DB_DIR in this process."""
+    global _client
+    with _lock:
+        if _client is None:
+            print(f"[SYSTEM] Connecting to ChromaDB at: {config.CHROMA_DB_DIR}")
+            _client = chromadb.PersistentClient(path=str(config.CHROMA_DB_DIR))
+        return _client
+
+
+def get_collection(name):
+    """Open (on first use) and return the shared handle for a registered collection."""
+    if name not in COLLECTIONS:
+        raise KeyError(f"Unknown collection: {name}")
+    if name == "conversation_logs" and config.ARCHIVE_LOG_BACKEND == "mmap":
+        from backend.managers import archive_store
+        return archive_store.get_store()
+    client = get_client()
+    with _lock:
+        if name not in _collections:
+            params = config.HNSW_PARAMS[name]
+            collection = client.get_or_create_collection(name=name, metadata=hnsw_metadata(params))
+            _spaces[name] = _apply_hnsw_params(name, collection, params)
+            _tag_legacy_records(name, collection)
+            if name == "timeline_events":
+                _add_event_periods(collection)
+            _collections[name] = collection
+        return _collections[name]
+
+
+def _apply_hnsw_params(name, collection, params):
+    """Bring an existing collection's search_ef in line with the config; returns its space.
+    space, M and construction_ef are fixed at creation, so a mismatch is only reported."""
+    hnsw = (collection.configuration_json or {}).get("hnsw") or {}
+    if hnsw.get("ef_search") not in (None, params["search_ef"]):
+        collection.modify(configuration={"hnsw": {"ef_search": params["search_ef"]}})
+    built = {"space": hnsw.get("space"), "M": hnsw.get("max_neighbors"), "construction_ef": hnsw.get("ef_construction")}
+    stale = [key for key, value in built.items() if value is not None and value != params[key]]
+    if stale:
+        print(f"[SYSTEM] {name} was built with {', '.join(f'{k}={built[k]}' for k in stale)}; "
+              f"HNSW_PARAMS applies after a rebuild")
+    return built["space"] or params["space"]
+
+
+def space(name):
+    """The distance space collection `name` was built with."""
+    return _spaces.get(name, config.HNSW_PARAMS[name]["space"])
+
+
+def similarity(name, distance):
+    """Cosine similarity for a distance returned by collection `name`, whatever its space.
+    Vectors are unit length, so squared L2 = 2 - 2 cos and Chroma's ip distance = 1 - cos."""
+    if space(name) == "l2":
+        return 1 - distance / 2
+    return 1 - distance
+
+
+# --- SESSION SCOPING ---
+# Sessions share the four collections; every record carries a `session_id`
+# metadata key and every query filters on it. The default session keeps the
+# original un-prefixed ids so existing data and scripts keep working.
+def session_scope(session_id=None):
+    """(where filter, id prefix) confining a session to its own records."""
+    session_id = session_id or config.DEFAULT_SESSION_ID
+    prefix = "" if session_id == config.DEFAULT_SESSION_ID else f"{session_id}:"
+    return {"session_id": session_id}, prefix
+
+
+def _tag_legacy_records(name, collection, page_size=1000):
+    # Records written before sessions existed belong to the default session.
+    # Runs once per collection; a marker file records that it is done.
+    marker = config.CHROMA_DB_DIR / f".{name}.sessions"
+    if marker.exists():
+        return
+    offset, tagged = 0, 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids, metas = [], []
+        for mem_id, meta in zip(page["ids"], page["metadatas"]):
+            if not meta or "session_id" not in meta:
+                ids.append(mem_id)
+                metas.append({**(meta or {}), "session_id": config.DEFAULT_SESSION_ID})
+        if ids:
+            collection.update(ids=ids, metadatas=metas)
+            tagged += len(ids)
+        offset += page_size
+    if tagged:
+        print(f"[SYSTEM] Tagged {tagged} legacy records in {name} with session '{config.DEFAULT_SESSION_ID}'")
+    marker.touch()
+
+
+# --- EVENT PERIODS ---
+# Events carry numeric year/month next to their "YYYY-MM-DD" date, so date
+# constraints can go into the `where` filter and narrow the ANN search.
+def event_metadata(turn, date, session_id):
+    year, month = (int(part) for part in date.split("-")[:2])
+    return {"turn": turn, "date": date, "year": year, "month": month, "session_id": session_id}
+
+
+def period_filter(where, year, month=None):
+    """`where` narrowed to one year (or one month of it)."""
+    clauses = [where, {"year": int(year)}]
+    if month:
+        clauses.append({"month": int(month)})
+    return {"$and": clauses}
+
+
+def _add_event_periods(collection, page_size=1000):
+    # Events written before year/month existed get them from their date, once
+    marker = config.CHROMA_DB_DIR / ".timeline_events.periods"
+    if marker.exists():
+        return
+    offset, updated = 0, 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids, metas = [], []
+        for event_id, meta in zip(page["ids"], page["metadatas"]):
+            if meta and "year" not in meta and meta.get("date"):
+                try:
+                    period = event_metadata(meta.get("turn", 0), meta["date"],
+                                            meta.get("session_id", config.DEFAULT_SESSION_ID))
+                except ValueError:
+                    continue  # not a YYYY-MM-DD date
+                ids.append(event_id)
+                metas.append({**meta, **period})
+        if ids:
+            collection.update(ids=ids, metadatas=metas)
+            updated += len(ids)
+        offset += page_size
+    if updated:
+        print(f"[SYSTEM] Added year/month to {updated} legacy timeline events")
+    marker.touch()
+
+
+def reset_collection(name):
+    """Drop a collection and recreate it empty (used by migrations)."""
+    from backend.managers import archive_store, exact_search, lexical_index, memory_tiers
+    if name == "conversation_logs" and config.ARCHIVE_LOG_BACKEND == "mmap":
+        store = archive_store.get_store()
+        store.reset()
+        lexical_index.drop_index(name)
+        return store
+    client = get_client()
+    with _lock:
+        _collections.pop(name, None)
+        _spaces.pop(name, None)
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+    lexical_index.drop_index(name)
+    exact_search.drop_index(name)
+    memory_tiers.drop_index(name)
+    return get_collection(name)
+
+
+def rebuild_collection(name, page_size=1000):
+    """Recreate a collection with the current HNSW_PARAMS (space, M and construction_ef
+    only apply at creation) and re-add every session's records, vectors included.
+
+    Records are staged in a scratch collection first; a marker file records that the
+    copy is complete, so a rebuild interrupted after the reset resumes from it.
+    Run it while the server is stopped.
+    """
+    if name == "conversation_logs" and config.ARCHIVE_LOG_BACKEND == "mmap":
+        raise ValueError("conversation_logs is in the mmap store (ARCHIVE_LOG_BACKEND), which has no HNSW index")
+    client = get_client()
+    staging_name = f"{name}.rebuild"
+    marker = config.CHROMA_DB_DIR / f".{name}.rebuild"
+    if not marker.exists():
+        try:
+            client.delete_collection(staging_name)  # left over from a copy that did not finish
+        except Exception:
+            pass
+        staging = client.create_collection(staging_name)
+        copied = _copy_records(get_collection(name), staging, page_size)
+        marker.touch()
+        print(f"[SYSTEM] Staged {copied} {name} records for the rebuild")
+    staging = client.get_collection(staging_name)
+    collection = reset_collection(name)
+    restored = _copy_records(staging, collection, page_size)
+    client.delete_collection(staging_name)
+    marker.unlink()
+    print(f"[SYSTEM] Rebuilt {name} ({restored} records) with {config.HNSW_PARAMS[name]}")
+    return collection
+
+
+def _copy_records(source, target, page_size):
+    # Paged: a session's whole history can be large
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            return offset
+        target.upsert(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+        offset += len(page["ids"])
+
+
+if __name__ == "__main__":
+    # python -m backend.managers.chroma_store rebuild semantic_memory entity_facts
+    parser = argparse.ArgumentParser(description="Rebuild Chroma collections with the current HNSW_PARAMS")
+    parser.add_argument("action", choices=["rebuild"])
+    parser.add_argument("names", nargs="+", choices=COLLECTIONS)
+    args = parser.parse_args()
+    for collection_name in args.names:
+        rebuild_collection(collection_name)
+    print("✅ Rebuild complete")
@@ -1,190 +1,347 @@
 import json
+import uuid
 import config
-import chromadb
-from groq import Groq
 from datetime import datetime
 import re
+from backend.managers import chroma_store, exact_search
+from backend.managers.state_store import open_state_store
+from backend.managers.prompt_builder import PromptBuilder
+from backend.managers import lexical_index
+from backend.managers.entity_index import EntityAliasIndex, POSSESSIVES, name_tokens
+from backend.managers.embeddings import embed_query, embed_documents
+
+
+def entity_description(entity):
+    # "Ravikant is my boss. Attributes: {...}" (the entity's vector document)
+    return f"{entity['name']} is {entity.get('relationship')}. Attributes: {json.dumps(entity.get('attributes'))}"
+
+
+def relationships_conflict(a, b):
+    # "boss" vs "my boss" agree; "boss" vs "sister" do not (and a missing one never conflicts)
+    a, b = ([t for t in name_tokens(r) if t not in POSSESSIVES] for r in (a, b))
+    return bool(a and b and a != b)
+
 
 class CoreMemoryManager:
-    def __init__(self):
-        self.filepath = config.USER_STATE_FILE
-        self.client = Groq(api_key=config.GROQ_API_KEY)
-        self.chroma_client = chromadb.PersistentClient(path=str(config.CHROMA_DB_DIR))
-        
-        # Connect to our new Vector Indices
-        self.event_collection = self.chroma_client.get_or_create_collection("timeline_events")
-        self.entity_collection = self.chroma_client.get_or_create_collection("entity_facts")
+    def __init__(self, session_id=None):
+        # Each session gets its own state shard; the default session keeps user_state.json
+        self.session_id = session_id or config.DEFAULT_SESSION_ID
+        if self.session_id == config.DEFAULT_SESSION_ID:
+            self.filepath = config.USER_STATE_FILE
+        else:
+            self.filepath = config.SESSIONS_DIR / f"{self.session_id}.json"
+        self.where, self.id_prefix = chroma_store.session_scope(self.session_id)
+        self.chroma_client = chroma_store.get_client()
         
         self.schema_map = {"city": "primary_location", "job": "occupation", "work": "occupation"}
-        self._initialize_db()
+        # Resident state: reads hit memory, writes go through store.apply() records
+        self.store = open_state_store(self.filepath)
+        # Token-budgeted [MEMORY CONTEXT] assembly; caches the rendered profile block
+        self.prompt_builder = PromptBuilder()
+        # Saved knowledge lives only in core state, so its lexical index is per session
+        self.knowledge_index = lexical_index.LexicalIndex()
+        # Known names -> entity keys: resolves mentions and merges name variants without a vector query
+        self.entity_aliases = EntityAliasIndex()
+        state = self.store.export()
+        self._index_knowledge(state["knowledge_base"])
+        self._index_entities(state["entities"])
+
+    # Vector indices: shared handles from the store registry (same client as the archive)
+    @property
+    def event_collection(self):
+        return chroma_store.get_collection("timeline_events")
 
-    def _initialize_db(self):
-        if not self.filepath.exists():
-            self.save_state({"user_profile": {"name": None, "preferences": []}, "entities": {}, "knowledge_base": {}, "events": [], "system_stats": {"total_turns": 0}})
+    @property
+    def entity_collection(self):
+        return chroma_store.get_collection("entity_facts")
 
     def load_state(self):
-        try:
-            with open(self.filepath, 'r') as f: return json.load(f)
-        except: return {}
+        return self.store.export()
 
     def save_state(self, data):
-        with open(self.filepath, 'w') as f: json.dump(data, f, indent=4)
+        self.store.replace(data)
+        self.prompt_builder.invalidate_profile()
+        self.knowledge_index = lexical_index.LexicalIndex()
+        self._index_knowledge(data.get("knowledge_base", {}))
+        self.entity_aliases.clear()
+        self._index_entities(data.get("entities", {}))
+
+    def _index_entities(self, entities):
+        for key, entity in entities.items():
+            self.entity_aliases.add(key, entity["name"])
+
+    def _index_knowledge(self, knowledge):
+        for topic, content in knowledge.items():
+            self.knowledge_index.add(f"knowledge:{topic}", str(content), {"topic": topic, "session_id": self.session_id})
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
 
     def increment_turn(self):
-        data = self.load_state()
-        data["system_stats"]["total_turns"] = data.get("system_stats", {}).get("total_turns", 0) + 1
-        self.save_state(data)
-        return data["system_stats"]["total_turns"]
+        with self.store.lock:
+            turn = self.store.turn() + 1
+            self.store.apply({"op": "turn", "value": turn})
+            return turn
 
     # --- OPTIMIZED VECTOR SEARCH LOGIC ---
-    def get_core_prompt(self, recent_history_text="", archival_context=[]):
-        data = self.load_state()
-        
+    def get_core_prompt(self, recent_history_text="", archival_context=[], query_embedding=None):
+        # One vector serves both collections (and is usually precomputed for the turn)
+        query_vector = embed_query(recent_history_text, query_embedding)
+        relevant_entities = self.search_entities(recent_history_text, query_vector)
+        relevant_events = self.search_events(recent_history_text, query_vector)
+        return self.render_core_prompt(relevant_entities, relevant_events, archival_context)[0]
+
+    # The two searches below are independent of each other and of the archive
+    # search, so callers may run them concurrently before render_core_prompt().
+    # Both return [{"text", "score"}]. Vector-only, the score is cosine similarity
+    # (chroma_store.similarity, whatever the collection's space); hybrid, it is the
+    # fused reciprocal-rank score (1.0 = first in both lists).
+    def search_entities(self, query_text, query_vector):
+        # 2a. DIRECT LOOKUP: entities mentioned by name come straight from core state,
+        # so the vector search is only needed for fuzzy references ("my boss")
+        relevant_entities = {}
+        keys, unresolved = self.entity_aliases.scan(query_text)
+        for key in keys[:5]:
+            entity = self.store.entity(key)
+            if entity is not None:
+                relevant_entities[f"{self.id_prefix}entity_{key}"] = {"text": f"- {entity_description(entity)}", "score": 1.0}
+
+        # 2b. SEMANTIC SEARCH (Entities), unless every reference was resolved by name
+        entity_results = {'documents': None}
+        if not relevant_entities or unresolved:
+            entity_results = exact_search.query(
+                "entity_facts", self.session_id,
+                query_embeddings=[query_vector],
+                where=self.where,
+                n_results=5,
+                include=["documents", "distances", "metadatas"]
+            )
+        if entity_results['documents']:
+            for i, doc in enumerate(entity_results['documents'][0]):
+                score = chroma_store.similarity("entity_facts", entity_results['distances'][0][i])
+                if score > 0.4:
+                    relevant_entities.setdefault(entity_results['ids'][0][i], {"text": f"- {doc}", "score": score})
+        if not config.HYBRID_RETRIEVAL:
+            return list(relevant_entities.values())
+
+        # 2c. LEXICAL SEARCH (Entities + saved knowledge), fused by rank
+        index = lexical_index.get_index("entity_facts", self.session_id)
+        lexical = [doc_id for doc_id, _ in index.search(query_text, n_results=5)]
+        knowledge = [doc_id for doc_id, _ in self.knowledge_index.search(query_text, n_results=3)]
+        fused = []
+        for doc_id, score in lexical_index.rrf(list(relevant_entities), lexical, knowledge)[:5]:
+            if doc_id in relevant_entities:
+                text = relevant_entities[doc_id]["text"]
+            elif doc_id in knowledge:
+                content, meta = self.knowledge_index.get(doc_id)
+                text = f"- [Knowledge] {meta['topic']}: {content}"
+            else:
+                text = f"- {index.get(doc_id)[0]}"
+            fused.append({"text": text, "score": score})
+        return fused
+
+    def search_events(self, recent_history_text, query_vector, period_text=None):
+        # The period comes from `period_text` (the current message) when given: a year
+        # mentioned a few messages back in the search text is not what is being asked about.
         # --- FIX: GET SIMULATION TIME, NOT REAL TIME ---
         try:
             # Use the date of the last event in memory as "Today"
-            last_event_date = data["events"][-1]["date"]
-            current_year = int(last_event_date.split("-")[0])
-        except (IndexError, KeyError, ValueError):
+            last_event_date = self.store.last_event()["date"]
+            current_year, current_month = (int(part) for part in last_event_date.split("-")[:2])
+        except (TypeError, KeyError, ValueError):
             # Fallback if no events exist
-            current_year = datetime.now().year
-            
-        # 1. USER PROFILE
-        profile_str = "USER PROFILE:\n" + "\n".join([f"- {k}: {v}" for k, v in data.get("user_profile", {}).items() if v])
-        
-        # 2. SEMANTIC SEARCH (Entities)
-        entity_results = self.entity_collection.query(
-            query_texts=[recent_history_text],
-            n_results=5,
-            include=["documents", "distances", "metadatas"]
-        )
-        
-        relevant_entities = []
-        if entity_results['documents']:
-            for i, doc in enumerate(entity_results['documents'][0]):
-                dist = entity_results['distances'][0][i]
-                if dist < 1.2:
-                    relevant_entities.append(f"- {doc}")
+            current_year, current_month = datetime.now().year, datetime.now().month
+
+        # CALCULATE RELATIVE DATES (first, so they can narrow the search)
+        target_year, target_month = None, None
+        period_text = recent_history_text if period_text is None else period_text
+        lowered = period_text.lower()
+
+        # Check for explicit years ("2025")
+        explicit_match = re.search(r'\b(20\d{2})\b', period_text)
+        if explicit_match:
+            target_year = explicit_match.group(1)
+        # Check for relative phrases using SIMULATION time
+        elif "last year" in lowered:
+            target_year = str(current_year - 1)
+        elif "this year" in lowered:
+            target_year = str(current_year)
+        elif "last month" in lowered:
+            target_year, target_month = (str(current_year), current_month - 1) if current_month > 1 else (str(current_year - 1), 12)
+        elif "this month" in lowered:
+            target_year, target_month = str(current_year), current_month
+
+        relevant_events = self._search_events(recent_history_text, query_vector, target_year, target_month)
+        if not relevant_events and target_year:
+            # Nothing logged in that period (or it was misread): fall back to the unfiltered search
+            relevant_events = self._search_events(recent_history_text, query_vector, None, None)
+        return relevant_events
+
+    def _search_events(self, recent_history_text, query_vector, target_year, target_month):
+        # "2025" or "2025-03": the prefix of matching event dates
+        period = f"{target_year}-{target_month:02d}" if target_month else target_year
+
+        def event_item(doc, meta, score):
+            event = {"text": f"- [Turn {meta['turn']} | {meta['date']}] {doc}", "score": score}
+            # CHECK MATCH: the calculated period's events go first (also when the budget is tight)
+            if period and meta['date'].startswith(period):
+                event["score"] += 1
+            return event
 
         # 3. SEMANTIC SEARCH (Timeline Events)
-        event_results = self.event_collection.query(
-            query_texts=[recent_history_text],
+        # A resolved period goes into the `where` filter, so the ANN search only sees that
+        # period's events (however many other events would outrank them)
+        where = chroma_store.period_filter(self.where, target_year, target_month) if period else self.where
+        event_results = exact_search.query(
+            "timeline_events", self.session_id,
+            query_embeddings=[query_vector],
+            where=where,
             n_results=5,
             include=["documents", "distances", "metadatas"]
         )
         
-        relevant_events = []
+        relevant_events = {}
         if event_results['documents']:
-            # CALCULATE RELATIVE DATES
-            target_year = None
-            
-            # Check for explicit years ("2025")
-            explicit_match = re.search(r'\b(20\d{2})\b', recent_history_text)
-            if explicit_match:
-                target_year = explicit_match.group(1)
-            # Check for relative phrases using SIMULATION time
-            elif "last year" in recent_history_text.lower():
-                target_year = str(current_year - 1)
-            elif "this year" in recent_history_text.lower():
-                target_year = str(current_year)
-
             for i, doc in enumerate(event_results['documents'][0]):
                 meta = event_results['metadatas'][0][i]
-                dist = event_results['distances'][0][i]
-                
-                # CHECK MATCH
-                is_year_match = target_year and (target_year in meta['date'])
+                score = chroma_store.similarity("timeline_events", event_results['distances'][0][i])
                 
-                # DYNAMIC THRESHOLDING
-                # Boost if the calculated year matches
-                threshold = 1.4 if is_year_match else 1.1
+                # DYNAMIC THRESHOLDING (cosine similarity)
+                # Looser when the calculated period matches
+                threshold = 0.3 if period else 0.45
                 
-                if dist < threshold:
-                    event_str = f"- [Turn {meta['turn']} | {meta['date']}] {doc}"
-                    if is_year_match:
-                        relevant_events.insert(0, event_str) # Prioritize
-                    else:
-                        relevant_events.append(event_str)
-
-        # 4. ARCHIVAL CONTEXT
-        archival_str = "PAST CONVERSATIONS:\n"
-        if archival_context:
-            for mem in archival_context:
-                archival_str += f"- [Turn {mem.get('origin_turn')}]: {mem.get('content')}\n"
-
-        # Combine
-        entities_block = "RELEVANT ENTITIES:\n" + "\n".join(relevant_entities) if relevant_entities else "ENTITIES: [None]"
-        events_block = "RELEVANT TIMELINE:\n" + "\n".join(relevant_events) if relevant_events else "TIMELINE: [No relevant past events]"
-        
-        return f"{profile_str}\n\n{entities_block}\n\n{events_block}\n\n{archival_str}"
+                if score > threshold:
+                    relevant_events[event_results['ids'][0][i]] = (doc, meta, score)
+
+        if config.HYBRID_RETRIEVAL:
+            # 3b. LEXICAL SEARCH: dates are indexed, so the resolved year matches as a plain term
+            index = lexical_index.get_index("timeline_events", self.session_id)
+            lexical_query = f"{recent_history_text} {target_year}" if target_year else recent_history_text
+            # Lexical hits are confined to the resolved period too
+            accept = (lambda meta: str(meta.get("date", "")).startswith(period)) if period else None
+            lexical = [doc_id for doc_id, _ in index.search(lexical_query, n_results=5, accept=accept)]
+            fused = {}
+            for doc_id, score in lexical_index.rrf(list(relevant_events), lexical)[:5]:
+                doc, meta = relevant_events[doc_id][:2] if doc_id in relevant_events else index.get(doc_id)
+                fused[doc_id] = (doc, meta, score)
+            relevant_events = fused
+
+        return sorted((event_item(*hit) for hit in relevant_events.values()), key=lambda event: -event["score"])
+
+    def render_core_prompt(self, relevant_entities, relevant_events, archival_context=[]):
+        """Returns (prompt text, estimated tokens per section)."""
+        # 4. ARCHIVAL CONTEXT (search_memory scores; else cosine similarity = 1 - cosine distance)
+        archival_lines = [
+            {"text": f"- [Turn {mem.get('origin_turn')}]: {mem.get('content')}",
+             "score": mem.get("score", 1 - mem.get("distance", 1.0))}
+            for mem in archival_context or []
+        ]
+        # 1. USER PROFILE comes from the builder's cache; the rest is fitted to the budget
+        return self.prompt_builder.build(self.store.profile, {
+            "entities": relevant_entities,
+            "events": relevant_events,
+            "archive": archival_lines
+        })
 
     # --- TOOLS ---
     def update_entity(self, name, relationship, attributes):
-        res = self._update_entity_json(name, relationship, attributes)
-        clean_name = re.sub(r'\s*\(.*?\)', '', name).strip()
-        desc = f"{clean_name} is {relationship}. Attributes: {json.dumps(attributes)}"
+        key, previous, entity = self._update_entity_json(name, relationship, attributes)
+        desc = entity_description(entity)
+        # Nothing new (a repeated mention): the stored vector is still current
+        if previous is not None and entity_description(previous) == desc:
+            return f"Entity Synced: {entity['name']}"
+        entity_id = f"{self.id_prefix}entity_{key}"
+        meta = {"name": entity["name"], "type": "entity", "session_id": self.session_id}
+        embeddings = embed_documents([desc])
         self.entity_collection.upsert(
-            ids=[f"entity_{clean_name.lower()}"],
+            ids=[entity_id],
             documents=[desc],
-            metadatas={"name": clean_name, "type": "entity"}
+            embeddings=embeddings,
+            metadatas=meta
         )
-        return res
+        exact_search.index_vectors("entity_facts", [entity_id], embeddings, [desc], [meta])
+        lexical_index.index_documents("entity_facts", [entity_id], [desc], [meta])
+        return f"Entity Synced: {entity['name']}"
 
     def log_event(self, description):
         res = self._log_event_json(description)
-        data = self.load_state()
-        last_event = data["events"][-1]
+        last_event = self.store.last_event()
+        # Suffix keeps ids unique when one turn logs several events
+        event_id = f"{self.id_prefix}event_{last_event['turn']}_{uuid.uuid4().hex[:6]}"
+        meta = chroma_store.event_metadata(last_event['turn'], last_event['date'], self.session_id)
+        embeddings = embed_documents([last_event['description']])
         self.event_collection.add(
-            ids=[f"event_{last_event['turn']}"],
+            ids=[event_id],
             documents=[last_event['description']],
-            metadatas={"turn": last_event['turn'], "date": last_event['date']}
+            embeddings=embeddings,
+            metadatas=meta
         )
+        exact_search.index_vectors("timeline_events", [event_id], embeddings, [last_event['description']], [meta])
+        lexical_index.index_documents("timeline_events", [event_id], [last_event['description']], [meta])
         return res
 
     def _update_entity_json(self, name, relationship, attributes):
-        data = self.load_state()
-        entities = data.get("entities", {})
+        """Returns (key, entity before, entity after)."""
         clean_name = re.sub(r'\s*\(.*?\)', '', name).strip()
-        key = clean_name.lower()
-        if key not in entities:
-            entities[key] = {"name": clean_name, "relationship": relationship, "attributes": {}}
-        if relationship: entities[key]["relationship"] = relationship
-        if attributes: entities[key]["attributes"].update(attributes)
-        data["entities"] = entities
-        self.save_state(data)
-        return f"Entity Synced: {clean_name}"
+        with self.store.lock:
+            key = clean_name.lower()
+            # "Tajinder Bagga" updates a known "Tajinder" (and vice versa) under its existing key,
+            # unless they are plainly different people ("Sarah" the sister, "Sarah Johnson" the boss)
+            alias_key = self.entity_aliases.resolve(clean_name)
+            if alias_key and alias_key != key:
+                stored = self.store.entity(alias_key)
+                if not relationships_conflict(relationship, (stored or {}).get("relationship")):
+                    key = alias_key
+            merged = key != clean_name.lower()
+            previous = self.store.entity(key)
+            if previous is None:
+                entity = {"name": clean_name, "relationship": relationship, "attributes": {}}
+            else:
+                entity = {**previous, "attributes": dict(previous["attributes"])}
+                # The fuller name wins ("Tajinder" -> "Tajinder Bagga"), capitalised like the stored one
+                if len(clean_name) > len(entity["name"]):
+                    entity["name"] = clean_name.title() if clean_name.islower() and not entity["name"].islower() else clean_name
+            # A mention under another name fills in a missing relationship but never replaces one
+            if relationship and not (merged and entity.get("relationship")): entity["relationship"] = relationship
+            if attributes: entity["attributes"].update(attributes)
+            self.store.apply({"op": "entity", "key": key, "value": entity})
+            self.entity_aliases.add(key, entity["name"], clean_name)
+        return key, previous, entity
 
     def _log_event_json(self, description):
-        data = self.load_state()
-        turn = data["system_stats"]["total_turns"]
-        data["events"].append({"turn": turn, "description": description, "date": datetime.now().strftime("%Y-%m-%d")})
-        self.save_state(data)
+        with self.store.lock:
+            turn = self.store.turn()
+            event = {"turn": turn, "description": description, "date": datetime.now().strftime("%Y-%m-%d")}
+            self.store.apply({"op": "event", "value": event})
         return "Event Logged."
 
     def update_profile(self, key, value):
-        data = self.load_state()
-        profile = data.get("user_profile", {})
         norm_key = self.schema_map.get(key.lower(), key.lower().replace(" ", "_"))
-        if norm_key in ["preferences", "goals"] or isinstance(profile.get(norm_key), list):
-            current = profile.get(norm_key, [])
-            if value not in current: current.append(value)
-            profile[norm_key] = current
-        else:
-            profile[norm_key] = value
-        data["user_profile"] = profile
-        self.save_state(data)
+        with self.store.lock:
+            profile = self.store.profile()
+            if norm_key in ["preferences", "goals"] or isinstance(profile.get(norm_key), list):
+                current = list(profile.get(norm_key, []))
+                if value not in current: current.append(value)
+                value = current
+            self.store.apply({"op": "profile", "key": norm_key, "value": value})
+            self.prompt_builder.invalidate_profile()
         return f"Updated Profile: {norm_key}"
 
     def remove_from_profile(self, key, value_to_remove):
-        data = self.load_state()
-        if key in data["user_profile"] and isinstance(data["user_profile"][key], list):
-            data["user_profile"][key] = [x for x in data["user_profile"][key] if value_to_remove.lower() not in x.lower()]
-            self.save_state(data)
-            return f"Removed {value_to_remove}."
+        with self.store.lock:
+            profile = self.store.profile()
+            if key in profile and isinstance(profile[key], list):
+                kept = [x for x in profile[key] if value_to_remove.lower() not in x.lower()]
+                self.store.apply({"op": "profile", "key": key, "value": kept})
+                self.prompt_builder.invalidate_profile()
+                return f"Removed {value_to_remove}."
         return "Not found."
 
     def add_general_knowledge(self, topic, content):
-        data = self.load_state()
-        data.setdefault("knowledge_base", {})[topic.lower()] = content
-        self.save_state(data)
+        with self.store.lock:
+            self.store.apply({"op": "knowledge", "key": topic.lower(), "value": content})
+            self._index_knowledge({topic.lower(): content})
         return "Knowledge Saved."
\ No newline at end of file
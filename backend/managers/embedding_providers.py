@@ -0,0 +1,101 @@
+import os
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+from chromadb.utils import embedding_functions
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+import config
+
+
+class BatchedOnnxEncoder(ONNXMiniLM_L6_V2):
+    """Chroma's default model (all-MiniLM-L6-v2 on onnxruntime) run with our own settings.
+
+    Chroma pads every text to 256 tokens. Here texts are sorted by length and
+    each batch is padded only to its longest member, which is most of the CPU
+    for short queries and facts. The attention mask keeps padding out of the
+    pooled vector, so the output matches the default function's.
+
+    `threads` caps onnxruntime's intra-op pool (0 = its default, every core).
+    With `quantize`, an int8 copy of the model (dynamic quantisation of the
+    weights) is built once next to the original and used instead.
+    """
+
+    def __init__(self, batch_size=32, threads=0, quantize=False):
+        super().__init__(preferred_providers=["CPUExecutionProvider"])
+        self.batch_size = batch_size
+        self.threads = threads
+        self.quantize = quantize
+
+    def name(self):
+        # Key of the persisted embedding cache: float vectors are the default function's,
+        # int8 ones are not interchangeable with them
+        return "default_int8" if self.quantize else embedding_functions.DefaultEmbeddingFunction.name()
+
+    @cached_property
+    def tokenizer(self):
+        tokenizer = self.Tokenizer.from_file(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "tokenizer.json")
+        )
+        tokenizer.enable_truncation(max_length=self.max_tokens())
+        # No fixed length: a batch is padded to its longest text
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    @cached_property
+    def model(self):
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            so.intra_op_num_threads = self.threads
+            so.inter_op_num_threads = 1
+        return self.ort.InferenceSession(str(self.model_path()), providers=["CPUExecutionProvider"], sess_options=so)
+
+    def model_path(self):
+        path = Path(self.DOWNLOAD_PATH) / self.EXTRACTED_FOLDER_NAME / "model.onnx"
+        if not self.quantize:
+            return path
+        quantized = path.with_name("model_int8.onnx")
+        if not quantized.exists():
+            # Needs the `onnx` package, only for this one-off conversion
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp_path = quantized.with_name(".model_int8.tmp.onnx")
+            quantize_dynamic(str(path), str(tmp_path), weight_type=QuantType.QInt8)
+            tmp_path.replace(quantized)
+            print(f"[SYSTEM] Built int8 embedding model: {quantized}")
+        return quantized
+
+    def _forward(self, documents, batch_size=None):
+        batch_size = batch_size or self.batch_size
+        # Similar lengths share a batch, so little of each batch is padding
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i]))
+        embeddings = np.zeros((len(documents), 384), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            encoded = self.tokenizer.encode_batch([documents[i] for i in batch])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            last_hidden_state = self.model.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids)
+            })[0]
+            # Mean pooling over the real tokens
+            mask = attention_mask[..., np.newaxis].astype(np.float32)
+            pooled = (last_hidden_state * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
+            embeddings[batch] = self._normalize(pooled)
+        return embeddings
+
+
+def build_embedding_function(provider=None):
+    """The encoder selected by config.EMBEDDING_PROVIDER."""
+    provider = provider or config.EMBEDDING_PROVIDER
+    if provider == "default":
+        return embedding_functions.DefaultEmbeddingFunction()
+    if provider == "onnx":
+        return BatchedOnnxEncoder(config.EMBEDDING_BATCH_SIZE, config.EMBEDDING_THREADS)
+    if provider == "onnx-int8":
+        return BatchedOnnxEncoder(config.EMBEDDING_BATCH_SIZE, config.EMBEDDING_THREADS, quantize=True)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
@@ -0,0 +1,219 @@
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import config
+from backend.managers.embedding_providers import build_embedding_function
+
+
+def text_key(text):
+    """Cache key: SHA-1 of the text with whitespace runs collapsed."""
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """LRU map of text hash -> float32 vector, bounded by entry count and bytes."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._items[key] = vector
+            self.nbytes += vector.nbytes
+            while self._items and (len(self._items) > self.max_entries or self.nbytes > self.max_bytes):
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._items),
+                "bytes": self.nbytes
+            }
+
+    def save(self, path, model_name):
+        with self._lock:
+            keys = list(self._items.keys())
+            vectors = list(self._items.values())
+        if not keys:
+            return
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(tmp_path, keys=np.array(keys), vectors=np.stack(vectors), model=np.array(model_name))
+        tmp_path.replace(path)
+
+    def load(self, path, model_name):
+        try:
+            with np.load(path) as data:
+                if str(data["model"]) != model_name:
+                    return 0
+                keys, vectors = data["keys"], data["vectors"]
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return 0
+        for key, vector in zip(keys, vectors):
+            self.put(str(key), vector)
+        return len(keys)
+
+
+class CountingEmbedder:
+    """The embedding function behind every collection read and write, with a
+    shared LRU cache in front and call counters. The encoder comes from
+    config.EMBEDDING_PROVIDER; the float ones run the model Chroma would run
+    implicitly, so vectors computed here are interchangeable with the ones
+    already stored.
+
+    `calls` / `texts` count requests made to the embedder; `model_calls` /
+    `model_texts` count what actually reached the model after cache hits.
+    """
+
+    def __init__(self, embedding_function=None, cache=None):
+        self.embedding_function = embedding_function or build_embedding_function()
+        self.cache = cache
+        self.calls = 0
+        self.texts = 0
+        self.model_calls = 0
+        self.model_texts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self):
+        name = getattr(self.embedding_function, "name", None)
+        return name() if callable(name) else type(self.embedding_function).__name__
+
+    def embed(self, texts):
+        texts = list(texts)
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        if self.cache is None:
+            return self._run_model(texts)
+
+        keys = [text_key(t) for t in texts]
+        vectors = [self.cache.get(k) for k in keys]
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+        if missing:
+            fresh = dict(zip(missing, self._run_model(list(missing.values()))))
+            for key, vector in fresh.items():
+                self.cache.put(key, vector)
+            vectors = [v if v is not None else fresh[k] for k, v in zip(keys, vectors)]
+        return vectors
+
+    def _run_model(self, texts):
+        with self._lock:
+            self.model_calls += 1
+            self.model_texts += len(texts)
+        return [np.asarray(v, dtype=np.float32) for v in self.embedding_function(texts)]
+
+    def warmup(self):
+        """Load the model and run one batch (outside the cache and the counters)."""
+        self.embedding_function(["warm up"])
+
+    def stats(self):
+        with self._lock:
+            stats = {"calls": self.calls, "texts": self.texts,
+                     "model_calls": self.model_calls, "model_texts": self.model_texts}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    def save_cache(self):
+        if self.cache is not None and config.EMBEDDING_CACHE_PERSIST:
+            self.cache.save(config.EMBEDDING_CACHE_FILE, self.model_name)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            cache = None
+            if config.EMBEDDING_CACHE_ENTRIES > 0:
+                cache = EmbeddingCache(config.EMBEDDING_CACHE_ENTRIES, config.EMBEDDING_CACHE_MAX_BYTES)
+            _embedder = CountingEmbedder(cache=cache)
+            if cache is not None and config.EMBEDDING_CACHE_PERSIST:
+                loaded = cache.load(config.EMBEDDING_CACHE_FILE, _embedder.model_name)
+                if loaded:
+                    print(f"[SYSTEM] Warm-loaded {loaded} cached embeddings")
+                atexit.register(_embedder.save_cache)
+        return _embedder
+
+
+class QueryEmbeddings:
+    """Per-turn query-embedding context.
+
+    Every query text known up front is embedded in one batch; managers then pass
+    `query_embeddings=[ctx.get(text)]` to Chroma instead of `query_texts`, so a
+    turn costs one embedder call no matter how many collections it searches.
+    Texts that show up later (e.g. a model-issued archival search) are embedded
+    on demand and counted too.
+    """
+
+    def __init__(self, texts=(), embedder=None):
+        self.embedder = embedder or get_embedder()
+        self.calls = 0
+        self.texts = 0
+        self._vectors = {}
+        self._embed([t for t in dict.fromkeys(texts)])
+
+    def _embed(self, texts):
+        texts = [t for t in texts if t not in self._vectors]
+        if not texts:
+            return
+        vectors = self.embedder.embed(texts)
+        self.calls += 1
+        self.texts += len(texts)
+        self._vectors.update(zip(texts, vectors))
+
+    def get(self, text):
+        if text not in self._vectors:
+            self._embed([text])
+        return self._vectors[text]
+
+    def stats(self):
+        return {"embedder_calls": self.calls, "embedded_texts": self.texts}
+
+
+def embed_query(text, query_embedding=None):
+    """The vector to search with: the caller's precomputed one, or a fresh (counted) embedding."""
+    if query_embedding is not None:
+        return query_embedding
+    return get_embedder().embed([text])[0]
+
+
+def embed_documents(texts):
+    """Vectors for documents about to be written, so Chroma never embeds on its own."""
+    return get_embedder().embed(texts)
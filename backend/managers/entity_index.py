@@ -0,0 +1,168 @@
+import re
+import threading
+from backend.managers.lexical_index import STOPWORDS
+
+NAME_TOKEN = re.compile(r"[A-Za-z0-9]+")
+# "my boss", "her brother": references the alias index cannot resolve by itself
+POSSESSIVES = frozenset("my our his her their your".split())
+
+
+def name_tokens(name):
+    return [t.lower() for t in NAME_TOKEN.findall(name or "")]
+
+
+# Words that describe a person rather than name them: never the rest of a name
+RELATION_WORDS = frozenset("""
+friend boss manager colleague coworker neighbor neighbour partner wife husband girlfriend boyfriend
+mom mum dad mother father brother sister son daughter aunt uncle cousin grandma grandpa teacher doctor
+""".split())
+
+
+def _nameish(token):
+    return len(token) > 1 and token not in STOPWORDS and not token.isdigit()
+
+
+def _capitalised_name(word):
+    return word[0].isupper() and _nameish(word.lower())
+
+
+def _partial_match(alias, tokens):
+    # "tajinder" ~ "tajinder bagga", "bagga" ~ "tajinder bagga" (whole tokens only, any case:
+    # tool arguments are often lowercase). The tokens one side adds must look like
+    # the rest of a name, so "mom's friend linda" is not "mom".
+    short, long = (alias, tokens) if len(alias) <= len(tokens) else (tokens, alias)
+    if long[:len(short)] == short:
+        extra = long[len(short):]
+    elif long[-len(short):] == short:
+        extra = long[:len(long) - len(short)]
+    else:
+        return False
+    return all(_nameish(token) and token not in RELATION_WORDS for token in extra)
+
+
+class EntityAliasIndex:
+    """In-memory name -> entity key resolver.
+
+    Every alias of an entity (its display name, its key, names it was merged
+    from) goes into a token trie, so full-name mentions are found in one pass
+    over a message. First and last name tokens are mapped too, so "Tajinder"
+    finds "Tajinder Bagga" as long as exactly one entity carries that name.
+    One-word names only match when capitalised ("Will", not "I will").
+    """
+
+    def __init__(self):
+        self.trie = {}       # token -> child node; a node's None entry holds entity keys
+        self.first = {}      # first-name token -> {entity keys}
+        self.last = {}       # last-name token -> {entity keys}
+        self.aliases = {}    # entity key -> [alias token tuples]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def add(self, key, *names):
+        """Register `names` (additively) as aliases of entity `key`."""
+        with self.lock:
+            known = self.aliases.setdefault(key, [])
+            for name in (key,) + names:
+                tokens = tuple(name_tokens(name))
+                if not tokens or tokens in known:
+                    continue
+                known.append(tokens)
+                node = self.trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node.setdefault(None, set()).add(key)
+                if _nameish(tokens[0]):
+                    self.first.setdefault(tokens[0], set()).add(key)
+                if len(tokens) > 1 and _nameish(tokens[-1]):
+                    self.last.setdefault(tokens[-1], set()).add(key)
+
+    def clear(self):
+        with self.lock:
+            self.trie, self.first, self.last, self.aliases = {}, {}, {}, {}
+
+    def _lookup(self, tokens):
+        node = self.trie
+        for token in tokens:
+            node = node.get(token)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+    def resolve(self, name):
+        """Key of the one known entity `name` refers to, or None (unknown or ambiguous)."""
+        tokens = tuple(name_tokens(name))
+        if not tokens:
+            return None
+        with self.lock:
+            exact = self._lookup(tokens)
+            if exact:
+                return next(iter(exact)) if len(exact) == 1 else None
+            candidates = self.first.get(tokens[0], set()) | self.last.get(tokens[-1], set())
+            matches = {key for key in candidates
+                       if any(_partial_match(alias, tokens) for alias in self.aliases[key])}
+        return next(iter(matches)) if len(matches) == 1 else None
+
+    def mentions(self, text):
+        """Keys of the known entities mentioned in `text`, in order of first mention."""
+        return self.scan(text)[0]
+
+    def scan(self, text):
+        """(keys, unresolved) for `text`: the known entities it mentions, in order of
+        first mention, and the references left over for a fuzzier search.
+
+        Multi-word aliases match anywhere (longest first); a one-word alias, or a
+        lone first or last name, only counts when it is capitalised (and, for the
+        latter, unambiguous, and not next to another capitalised name: "Sarah
+        Connor" is not "Sarah Johnson"). Left over are capitalised names that
+        resolved to no single entity (outside sentence starts) and possessive
+        phrases ("my boss") not followed by a known alias.
+        """
+        matches = list(NAME_TOKEN.finditer(text or ""))
+        words = [m.group() for m in matches]
+        tokens = [w.lower() for w in words]
+        starts = [i == 0 or re.search(r"[.!?]\s*$", text[matches[i - 1].end():m.start()]) is not None
+                  for i, m in enumerate(matches)]
+        found, unresolved = {}, []
+        matched_until = 0   # tokens before this index belong to an accepted match
+        with self.lock:
+            i = 0
+            while i < len(tokens):
+                node, end, keys = self.trie, i, None
+                for j in range(i, len(tokens)):
+                    node = node.get(tokens[j])
+                    if node is None:
+                        break
+                    if None in node:
+                        end, keys = j + 1, node[None]
+                possessive = i > 0 and tokens[i - 1] in POSSESSIVES
+                if keys and len(keys) == 1 and (end - i > 1 or words[i][0].isupper()):
+                    found.setdefault(next(iter(keys)), None)
+                    i = matched_until = end
+                    continue
+                keys = set()
+                if _capitalised_name(words[i]):
+                    keys = self.first.get(tokens[i], set()) | self.last.get(tokens[i], set())
+                    after = i + 1 < len(words) and not starts[i + 1] and _capitalised_name(words[i + 1])
+                    before = matched_until < i and not starts[i] and _capitalised_name(words[i - 1])
+                    neighbours = [k for k, near in ((i + 1, after), (i - 1, before)) if near]
+                    if len(keys) == 1 and neighbours:
+                        # Another capitalised name alongside: only the same person if it is in their name too
+                        aliases = self.aliases[next(iter(keys))]
+                        if not all(any(tokens[k] in alias for alias in aliases) for k in neighbours):
+                            lo, hi = min([i] + neighbours), max([i] + neighbours)
+                            if before and unresolved and unresolved[-1] == words[i - 1]:
+                                unresolved.pop()  # "Mike" was left over on its own; "Mike Johnson" replaces it
+                            unresolved.append(" ".join(words[lo:hi + 1]))
+                            i = hi + 1
+                            continue
+                    if len(keys) == 1:
+                        found.setdefault(next(iter(keys)), None)
+                        matched_until = i + 1
+                    elif not starts[i]:
+                        unresolved.append(words[i])
+                if possessive and len(keys) != 1:
+                    unresolved.append(f"{words[i - 1]} {words[i]}")
+                i += 1
+        return list(found), unresolved
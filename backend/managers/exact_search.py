@@ -0,0 +1,256 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import config
+from backend.managers import chroma_store
+
+
+class ExactIndex:
+    """Memory-resident vectors of one session's records in one collection.
+
+    Vectors live in a contiguous float32 matrix (grown by doubling) next to
+    their ids, documents and metadata, so a query is one matrix product and
+    an argpartition, with results shaped like Chroma's. `add` replaces, so
+    replaying a write is harmless; `update` merges metadata like Chroma does.
+    """
+
+    def __init__(self, space):
+        self.space = space
+        self.ids = []
+        self.rows = {}          # id -> row
+        self.documents = []
+        self.metadatas = []
+        self.matrix = None      # float32 (capacity, dim); rows past len(ids) are unused
+        self.sq_norms = None    # squared row norms, for l2 and cosine
+        self._masks = {}        # filter -> boolean row mask, cleared on any write
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return 0 if self.matrix is None else self.matrix.nbytes + self.sq_norms.nbytes
+
+    def add(self, ids, embeddings, documents, metadatas):
+        if not len(ids):
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self.lock:
+            if self.matrix is None:
+                self.matrix = np.zeros((max(64, len(ids)), vectors.shape[1]), dtype=np.float32)
+                self.sq_norms = np.zeros(len(self.matrix), dtype=np.float32)
+            for doc_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = self.rows.get(doc_id)
+                if row is None:
+                    row = self.rows[doc_id] = len(self.ids)
+                    self.ids.append(doc_id)
+                    self.documents.append(document)
+                    self.metadatas.append(dict(metadata or {}))
+                    if row == len(self.matrix):
+                        self._grow()
+                else:
+                    self.documents[row] = document
+                    self.metadatas[row] = dict(metadata or {})
+                self.matrix[row] = vector
+                self.sq_norms[row] = vector @ vector
+            self._masks.clear()
+
+    def _grow(self):
+        matrix = np.zeros((2 * len(self.matrix), self.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(self.matrix)] = self.matrix
+        sq_norms = np.zeros(len(matrix), dtype=np.float32)
+        sq_norms[:len(self.sq_norms)] = self.sq_norms
+        self.matrix, self.sq_norms = matrix, sq_norms
+
+    def update(self, ids, metadatas):
+        with self.lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self.rows.get(doc_id)
+                if row is not None:
+                    self.metadatas[row].update(metadata)
+            self._masks.clear()
+
+    @staticmethod
+    def can_filter(where):
+        """True for the filters _mask evaluates: equality clauses, alone or under $and.
+        Anything else ($or, $in, $gte, ...) has to go to Chroma."""
+        clauses = where.get("$and", [where]) if where else []
+        return all(not key.startswith("$") and not isinstance(value, (dict, list))
+                   for clause in clauses for key, value in clause.items())
+
+    def _mask(self, where):
+        # Equality clauses and $and (see can_filter); the session clause is implied by the index
+        clauses = where.get("$and", [where]) if where else []
+        terms = tuple(sorted((k, v) for clause in clauses for k, v in clause.items() if k != "session_id"))
+        if not terms:
+            return None
+        mask = self._masks.get(terms)
+        if mask is None:
+            mask = self._masks[terms] = np.array([all(meta.get(k) == v for k, v in terms) for meta in self.metadatas], dtype=bool)
+        return mask
+
+    def query(self, query_embeddings, n_results, where=None):
+        """collection.query() over this index: exact distances in the collection's space."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self.lock:
+            n = len(self.ids)
+            mask = self._mask(where) if n else None
+            candidates = np.flatnonzero(mask) if mask is not None else None
+            size = n if candidates is None else len(candidates)
+            k = min(n_results, size)
+            if k == 0:
+                for _ in queries:
+                    for key in result:
+                        result[key].append([])
+                return result
+            matrix = self.matrix[:n] if candidates is None else self.matrix[candidates]
+            dots = queries @ matrix.T
+            if self.space == "l2":
+                sq_norms = self.sq_norms[:n] if candidates is None else self.sq_norms[candidates]
+                distances = (queries * queries).sum(axis=1)[:, np.newaxis] + sq_norms[np.newaxis, :] - 2 * dots
+            elif self.space == "cosine":
+                sq_norms = self.sq_norms[:n] if candidates is None else self.sq_norms[candidates]
+                norms = np.linalg.norm(queries, axis=1)[:, np.newaxis] * np.sqrt(sq_norms)[np.newaxis, :]
+                distances = 1 - dots / np.maximum(norms, 1e-12)
+            else:
+                distances = 1 - dots
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < size else np.tile(np.arange(size), (len(queries), 1))
+            for q, picks in enumerate(top):
+                picks = picks[np.argsort(distances[q, picks])]
+                rows = picks if candidates is None else candidates[picks]
+                result["ids"].append([self.ids[r] for r in rows])
+                result["documents"].append([self.documents[r] for r in rows])
+                result["metadatas"].append([dict(self.metadatas[r]) for r in rows])
+                result["distances"].append([float(d) for d in distances[q, picks]])
+        return result
+
+
+# --- SESSION INDEXES ---
+# One index per (collection, session), built from Chroma on first query and
+# kept current by the write paths via index_vectors() / update_metadatas().
+# A session with more than EXACT_SEARCH_MAX_VECTORS records in a collection
+# is searched through Chroma's HNSW index instead, for the rest of the process.
+# Together the indexes stay under EXACT_SEARCH_MAX_BYTES: beyond it the least
+# recently searched ones are dropped (and rebuilt if searched again).
+_LARGE = "large"
+_indexes = OrderedDict()    # least recently searched first
+_lock = threading.Lock()
+
+
+def get_index(name, session_id, page_size=1000):
+    """The session's exact index for `name`, or None when it is over the size limit."""
+    limit = config.EXACT_SEARCH_MAX_VECTORS
+    if limit <= 0:
+        return None
+    key = (name, session_id)
+    collection = chroma_store.get_collection(name)
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return None if index is _LARGE else index
+        index = _indexes[key] = ExactIndex(chroma_store.space(name))
+        # Writers block on the index lock until the build is done; adds are idempotent
+        index.lock.acquire()
+    try:
+        offset = 0
+        while len(index) <= limit:
+            page = collection.get(where={"session_id": session_id}, include=["embeddings", "documents", "metadatas"],
+                                  limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+            offset += page_size
+        if len(index) > limit:
+            with _lock:
+                _indexes[key] = _LARGE
+            return None
+    except Exception:
+        with _lock:
+            _indexes.pop(key, None)
+        raise
+    finally:
+        index.lock.release()
+    _enforce_budget(key)
+    return index
+
+
+def is_exact(name, session_id):
+    """True while the session's `name` records are searched through a built exact index."""
+    with _lock:
+        index = _indexes.get((name, session_id))
+    return index is not None and index is not _LARGE
+
+
+def _enforce_budget(keep):
+    """Drop least recently searched indexes (never `keep`) until all fit EXACT_SEARCH_MAX_BYTES."""
+    with _lock:
+        total = sum(index.nbytes for index in _indexes.values() if index is not _LARGE)
+        for key in list(_indexes):
+            if total <= config.EXACT_SEARCH_MAX_BYTES:
+                break
+            index = _indexes[key]
+            if key == keep or index is _LARGE:
+                continue
+            del _indexes[key]
+            total -= index.nbytes
+
+
+def query(name, session_id, query_embeddings, where, n_results, include=("documents", "metadatas", "distances")):
+    """collection.query() for one session: exact NumPy search while the session is
+    small enough (results carry every field), Chroma's HNSW index beyond that or
+    for a filter the exact index cannot evaluate."""
+    index = get_index(name, session_id) if ExactIndex.can_filter(where) else None
+    if index is None:
+        return chroma_store.get_collection(name).query(query_embeddings=query_embeddings, where=where,
+                                                       n_results=n_results, include=list(include))
+    return index.query(query_embeddings, n_results, where)
+
+
+def _session_groups(ids, metadatas):
+    groups = {}
+    for i, metadata in enumerate(metadatas):
+        session_id = (metadata or {}).get("session_id", config.DEFAULT_SESSION_ID)
+        groups.setdefault(session_id, []).append(i)
+    return groups
+
+
+def index_vectors(name, ids, embeddings, documents, metadatas):
+    """Mirror a Chroma add/upsert (call it after the write) into the built session indexes."""
+    for session_id, rows in _session_groups(ids, metadatas).items():
+        key = (name, session_id)
+        with _lock:
+            index = _indexes.get(key)
+        if index is None or index is _LARGE:
+            continue
+        before = index.nbytes
+        index.add([ids[i] for i in rows], [embeddings[i] for i in rows],
+                  [documents[i] for i in rows], [metadatas[i] for i in rows])
+        if len(index) > config.EXACT_SEARCH_MAX_VECTORS:
+            with _lock:
+                _indexes[key] = _LARGE
+        elif index.nbytes > before:
+            _enforce_budget(key)
+
+
+def update_metadatas(name, ids, metadatas):
+    """Mirror a Chroma metadata update (merged per key) into every built index of `name`."""
+    with _lock:
+        indexes = [index for (index_name, _), index in _indexes.items() if index_name == name and index is not _LARGE]
+    for index in indexes:
+        index.update(ids, metadatas)
+
+
+def drop_index(name):
+    with _lock:
+        for key in [key for key in _indexes if key[0] == name]:
+            del _indexes[key]
+
+
+def drop_session(session_id):
+    """Free a closed session's indexes (rebuilt from Chroma if it comes back)."""
+    with _lock:
+        for key in [key for key in _indexes if key[1] == session_id]:
+            del _indexes[key]
@@ -0,0 +1,203 @@
+import math
+import re
+import threading
+from collections import Counter
+import config
+from backend.managers import chroma_store
+
+# Words and codes; hyphen/underscore-joined codes ("x7-42", "room_12") stay one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a about am an and any are as at be been but by can could did do does for from had has have he her him his how
+i if in into is it its just me my of on or our she so than that the their them then there they this to too
+us was we were what when where which who why will with would you your s t m d ll re ve
+""".split())
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def contains_phrase(text, tokens):
+    """True when `tokens` occur in `text` as one contiguous run (stopwords aside)."""
+    words, n = tokenize(text), len(tokens)
+    return any(words[i:i + n] == tokens for i in range(len(words) - n + 1))
+
+
+def index_text(document, metadata=None):
+    # Event dates and knowledge topics are indexed too, so "2025" finds that year's events
+    metadata = metadata or {}
+    return " ".join([document] + [str(metadata[key]) for key in ("date", "topic") if metadata.get(key)])
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over a set of documents.
+
+    Every document keeps its session id (searches stay inside one session),
+    its text and its metadata, so a lexical-only hit can be rendered without
+    a round trip to Chroma. `add` replaces, so replaying a write is harmless.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = {}     # token -> {doc_id: term frequency}
+        self.docs = {}         # doc_id -> (session_id, document, metadata, token count)
+        self.total_len = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, document, metadata=None):
+        metadata = metadata or {}
+        tokens = tokenize(index_text(document, metadata))
+        with self.lock:
+            self.remove(doc_id)
+            for token, tf in Counter(tokens).items():
+                self.postings.setdefault(token, {})[doc_id] = tf
+            session_id = metadata.get("session_id", config.DEFAULT_SESSION_ID)
+            self.docs[doc_id] = (session_id, document, metadata, len(tokens))
+            self.total_len += len(tokens)
+
+    def remove(self, doc_id):
+        with self.lock:
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                return
+            for token in set(tokenize(index_text(doc[1], doc[2]))):
+                posting = self.postings.get(token)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[token]
+            self.total_len -= doc[3]
+
+    def doc_freq(self, token):
+        """Number of indexed documents containing `token`."""
+        with self.lock:
+            return len(self.postings.get(token, ()))
+
+    def get(self, doc_id):
+        """(document, metadata) of an indexed doc, or None."""
+        with self.lock:
+            doc = self.docs.get(doc_id)
+            return (doc[1], doc[2]) if doc else None
+
+    def search(self, query, session_id=None, n_results=5, require_all=False, accept=None):
+        """[(doc_id, bm25 score)], best first. With `require_all`, only documents
+        containing every query token qualify (an exact match); `accept(metadata)`
+        can narrow the candidates further."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        with self.lock:
+            n_docs = len(self.docs)
+            if not n_docs or not tokens:
+                return []
+            avg_len = self.total_len / n_docs or 1
+            scores, matched = {}, Counter()
+            for token in tokens:
+                posting = self.postings.get(token)
+                if not posting:
+                    if require_all:
+                        return []
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    doc_session, _, metadata, length = self.docs[doc_id]
+                    if session_id and doc_session != session_id:
+                        continue
+                    if accept is not None and not accept(metadata):
+                        continue
+                    norm = tf + self.K1 * (1 - self.B + self.B * length / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+                    matched[doc_id] += 1
+        if require_all:
+            scores = {doc_id: s for doc_id, s in scores.items() if matched[doc_id] == len(tokens)}
+        return sorted(scores.items(), key=lambda item: -item[1])[:n_results]
+
+
+def rrf(*rankings, k=None):
+    """Reciprocal rank fusion of ranked id lists -> [(id, score)], best first.
+    Scores are scaled so an id ranked first by two lists scores 1.0."""
+    k = config.RRF_K if k is None else k
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + (k + 1) / (2 * (k + rank + 1))
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+# --- SESSION INDEXES ---
+# One index per (collection, session), built from that session's records on
+# first use (as exact_search does), kept current by every write path via
+# index_documents() and dropped when the session closes, so resident postings
+# cover the live sessions only.
+_indexes = {}
+_lock = threading.Lock()
+
+
+def indexed(name):
+    """Conversation logs in the mmap store are not indexed: that store exists to
+    keep them out of RAM."""
+    return not (name == "conversation_logs" and config.ARCHIVE_LOG_BACKEND == "mmap")
+
+
+def get_index(name, session_id, page_size=1000):
+    if not indexed(name):
+        return LexicalIndex()  # always empty; index_documents() skips it too
+    key = (name, session_id)
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+        index = _indexes[key] = LexicalIndex()
+        # Writers block on the index lock until the build is done; adds are idempotent
+        index.lock.acquire()
+    try:
+        collection = chroma_store.get_collection(name)
+        offset = 0
+        while True:
+            page = collection.get(where={"session_id": session_id}, include=["documents", "metadatas"],
+                                  limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            for doc_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                index.add(doc_id, document or "", metadata)
+            offset += page_size
+    except Exception:
+        with _lock:
+            _indexes.pop(key, None)
+        raise
+    finally:
+        index.lock.release()
+    return index
+
+
+def index_documents(name, ids, documents, metadatas):
+    """Mirror a Chroma add/upsert (call it after the write) into the sessions' indexes.
+    An index not built yet is left alone: its first get_index() reads the write from Chroma."""
+    groups = {}
+    for doc_id, document, metadata in zip(ids, documents, metadatas):
+        session_id = (metadata or {}).get("session_id", config.DEFAULT_SESSION_ID)
+        groups.setdefault(session_id, []).append((doc_id, document, metadata))
+    for session_id, docs in groups.items():
+        with _lock:
+            index = _indexes.get((name, session_id))
+        if index is None:
+            continue
+        for doc_id, document, metadata in docs:
+            index.add(doc_id, document, metadata)
+
+
+def drop_index(name):
+    with _lock:
+        for key in [key for key in _indexes if key[0] == name]:
+            del _indexes[key]
+
+
+def drop_session(session_id):
+    """Free a closed session's indexes (rebuilt from Chroma if it comes back)."""
+    with _lock:
+        for key in [key for key in _indexes if key[1] == session_id]:
+            del _indexes[key]
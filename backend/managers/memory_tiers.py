@@ -0,0 +1,173 @@
+import threading
+import time
+
+import config
+from backend.managers import chroma_store, exact_search
+
+# Tiering applies to the fact archive; origin_turn / last_used_turn / count live there
+COLLECTION = "semantic_memory"
+
+# --- HOT TIERS ---
+# Per session, an ExactIndex holding the HOT_TIER_SIZE memories most recently
+# used (within HOT_TIER_RECENT_TURNS) or most reinforced (count >= HOT_TIER_MIN_COUNT).
+# Everything stays in the cold tier (Chroma), which is searched unless the hot
+# tier alone has enough good matches. A session whose facts are searched through
+# an exact in-RAM index (exact_search) gets no tier: that index already is one.
+_tiers = {}
+_live = set()           # sessions the background refresher may (re)install a tier for
+_stats = {"hot_queries": 0, "cold_queries": 0, "promoted": 0, "demoted": 0}
+_lock = threading.Lock()
+
+
+def query(session_id, query_embedding, where, n_results):
+    """Semantic-memory search for one session. The hot tier answers alone when it
+    fills `n_results` with matches at or above HOT_TIER_MIN_SIMILARITY; otherwise
+    the cold tier is searched too and both result lists are merged."""
+    with _lock:
+        tier = _tiers.get(session_id) if config.HOT_TIER_SIZE > 0 else None
+    if exact_search.is_exact(COLLECTION, session_id):
+        tier = None         # the cold tier is already an in-RAM index
+    hot = None
+    if tier is not None and len(tier) and exact_search.ExactIndex.can_filter(where):
+        hot = tier.query([query_embedding], n_results, where)
+        distances = hot["distances"][0]
+        if len(distances) == n_results and all(
+                chroma_store.similarity(COLLECTION, distance) >= config.HOT_TIER_MIN_SIMILARITY for distance in distances):
+            with _lock:
+                _stats["hot_queries"] += 1
+            return hot
+    with _lock:
+        _stats["cold_queries"] += 1
+    cold = exact_search.query(COLLECTION, session_id, query_embeddings=[query_embedding], where=where, n_results=n_results)
+    return cold if hot is None else _merge(hot, cold, n_results)
+
+
+def _merge(hot, cold, n_results):
+    # The cold tier holds every memory, so its copy (and current metadata) wins a tie
+    found = {}
+    for results in (hot, cold):
+        for doc_id, document, metadata, distance in zip(results["ids"][0], results["documents"][0],
+                                                         results["metadatas"][0], results["distances"][0]):
+            found[doc_id] = (distance, document, metadata)
+    ranked = sorted(found.items(), key=lambda item: item[1][0])[:n_results]
+    return {
+        "ids": [[doc_id for doc_id, _ in ranked]],
+        "documents": [[document for _, (_, document, _) in ranked]],
+        "metadatas": [[metadata for _, (_, _, metadata) in ranked]],
+        "distances": [[distance for _, (distance, _, _) in ranked]]
+    }
+
+
+def hot_filter(session_id, turn):
+    """Chroma `where` for the memories that qualify for the hot tier at `turn`."""
+    return {"$and": [
+        {"session_id": session_id},
+        {"$or": [{"last_used_turn": {"$gte": turn - config.HOT_TIER_RECENT_TURNS}},
+                 {"count": {"$gte": config.HOT_TIER_MIN_COUNT}}]}
+    ]}
+
+
+def refresh(session_id, turn, only_live=False):
+    """Rebuild a session's hot tier: promote newly qualifying memories, demote the rest.
+    Vectors of memories that stay hot are copied over; only promotions are read from Chroma.
+    With `only_live`, the new tier is not installed once the session has been dropped.
+    A session searched exactly loses its tier instead (returns None)."""
+    if exact_search.is_exact(COLLECTION, session_id):
+        with _lock:
+            old = _tiers.pop(session_id, None)
+            _stats["demoted"] += len(old) if old is not None else 0
+        return None
+    collection = chroma_store.get_collection(COLLECTION)
+    found = collection.get(where=hot_filter(session_id, turn), include=["metadatas"])
+    # Most recently used first, then most reinforced
+    ranked = sorted(zip(found["ids"], found["metadatas"]),
+                    key=lambda item: (item[1].get("last_used_turn", 0), item[1].get("count", 1)), reverse=True)
+    hot = dict(ranked[:config.HOT_TIER_SIZE])
+
+    with _lock:
+        old = _tiers.get(session_id)
+    tier = exact_search.ExactIndex(chroma_store.space(COLLECTION))
+    kept = [doc_id for doc_id in hot if old is not None and doc_id in old.rows]
+    if kept:
+        with old.lock:
+            rows = [old.rows[doc_id] for doc_id in kept]
+            tier.add(kept, old.matrix[rows], [old.documents[row] for row in rows], [hot[doc_id] for doc_id in kept])
+    promoted = [doc_id for doc_id in hot if old is None or doc_id not in old.rows]
+    if promoted:
+        page = collection.get(ids=promoted, include=["embeddings", "documents", "metadatas"])
+        tier.add(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+
+    with _lock:
+        if only_live and session_id not in _live:
+            return tier
+        _tiers[session_id] = tier
+        _stats["promoted"] += len(promoted)
+        _stats["demoted"] += (len(old) if old is not None else 0) - len(kept)
+    return tier
+
+
+def stats():
+    with _lock:
+        return {**_stats, "sessions": len(_tiers), "hot_memories": sum(len(tier) for tier in _tiers.values())}
+
+
+def drop_index(name):
+    if name == COLLECTION:
+        with _lock:
+            _tiers.clear()
+
+
+def drop_session(session_id):
+    """Forget a closed session's hot tier (and any refresh still pending for it)."""
+    with _lock:
+        _tiers.pop(session_id, None)
+        _live.discard(session_id)
+    _refresher.forget(session_id)
+
+
+class _TierRefresher:
+    """One daemon thread re-tiering every session that saw a turn, at most once
+    per TIER_REFRESH_INTERVAL_MS (turns in that window share one refresh)."""
+
+    def __init__(self):
+        self._turns = {}        # session -> latest turn not refreshed for yet
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def note_turn(self, session_id, turn):
+        with self._lock:
+            self._turns[session_id] = max(turn, self._turns.get(session_id, turn))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tier-refresher", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def forget(self, session_id):
+        with self._lock:
+            self._turns.pop(session_id, None)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(config.TIER_REFRESH_INTERVAL_MS / 1000)
+            # Clear before refreshing: a turn noted after this point re-arms the event
+            self._wakeup.clear()
+            with self._lock:
+                pending, self._turns = self._turns, {}
+            for session_id, turn in pending.items():
+                try:
+                    refresh(session_id, turn, only_live=True)
+                except Exception as e:
+                    print(f"[SYSTEM] Tier refresh failed for session '{session_id}': {e}")
+
+
+_refresher = _TierRefresher()
+
+
+def note_turn(session_id, turn):
+    """Schedule a background re-tiering of the session as of `turn`."""
+    if config.HOT_TIER_SIZE > 0 and not exact_search.is_exact(COLLECTION, session_id):
+        with _lock:
+            _live.add(session_id)
+        _refresher.note_turn(session_id, turn)
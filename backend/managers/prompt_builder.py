@@ -0,0 +1,107 @@
+import math
+import threading
+import config
+
+
+def count_tokens(text):
+    """Estimated token count of `text` (see config.PROMPT_CHARS_PER_TOKEN)."""
+    return math.ceil(len(text) / config.PROMPT_CHARS_PER_TOKEN) if text else 0
+
+
+class PromptBuilder:
+    """Assembles the [MEMORY CONTEXT] block within a token budget.
+
+    The profile block is rendered once and reused until `invalidate_profile()`
+    (called on every profile write). Retrieved lines from all sections compete
+    for the remaining budget by score, so the least relevant are dropped first;
+    kept lines are rendered in their original order. When everything fits the
+    output is identical to the unbudgeted prompt.
+    """
+
+    # name -> (header when the section has lines, header when it is empty)
+    SECTIONS = {
+        "entities": ("RELEVANT ENTITIES:", "ENTITIES: [None]"),
+        "events": ("RELEVANT TIMELINE:", "TIMELINE: [No relevant past events]"),
+        "archive": ("PAST CONVERSATIONS:", "PAST CONVERSATIONS:")
+    }
+
+    def __init__(self, budget=None, profile_max_tokens=None):
+        self.budget = budget or config.PROMPT_CONTEXT_TOKENS
+        self.profile_max_tokens = profile_max_tokens or config.PROMPT_PROFILE_MAX_TOKENS
+        self._profile_block = None
+        self._profile_version = 0
+        self._lock = threading.Lock()
+
+    # --- PROFILE BLOCK (cached) ---
+    def invalidate_profile(self):
+        with self._lock:
+            self._profile_version += 1
+            self._profile_block = None
+
+    def profile_block(self, load_profile):
+        """The rendered USER PROFILE block; `load_profile()` is only called on a cache miss."""
+        with self._lock:
+            if self._profile_block is not None:
+                return self._profile_block
+            version = self._profile_version
+        # Rendered outside the lock (writers invalidate while holding the state lock);
+        # a render that raced with a write is used once but not cached
+        text = self._render_profile(load_profile())
+        with self._lock:
+            if version == self._profile_version:
+                self._profile_block = text
+        return text
+
+    def _render_profile(self, profile):
+        profile = {k: list(v) if isinstance(v, list) else v for k, v in profile.items() if v}
+
+        def render():
+            return "USER PROFILE:\n" + "\n".join([f"- {k}: {v}" for k, v in profile.items() if v])
+
+        text = render()
+        # Over its cap: drop the oldest entry of the longest list until it fits
+        while count_tokens(text) > self.profile_max_tokens:
+            lists = [k for k, v in profile.items() if isinstance(v, list) and len(v) > 1]
+            if not lists:
+                break
+            profile[max(lists, key=lambda k: len(profile[k]))].pop(0)
+            text = render()
+        return text
+
+    # --- ASSEMBLY ---
+    def build(self, load_profile, sections):
+        """`sections` maps entities/events/archive to [{"text", "score"}].
+        Returns (prompt text, {section: tokens, "total": tokens, "dropped": lines})."""
+        profile_str = self.profile_block(load_profile)
+        remaining = self.budget - count_tokens(profile_str)
+
+        # Headers are always rendered, so they are paid for up front
+        candidates = []
+        for name, (header, empty_header) in self.SECTIONS.items():
+            items = sections.get(name) or []
+            remaining -= count_tokens(header if items else empty_header)
+            candidates.extend((item["score"], name, i, item["text"]) for i, item in enumerate(items))
+
+        kept = {name: set() for name in self.SECTIONS}
+        dropped = 0
+        for score, name, i, line in sorted(candidates, key=lambda c: -c[0]):
+            cost = count_tokens(line)
+            if cost <= remaining:
+                kept[name].add(i)
+                remaining -= cost
+            else:
+                dropped += 1
+
+        blocks = {"profile": profile_str}
+        for name, (header, empty_header) in self.SECTIONS.items():
+            lines = [item["text"] for i, item in enumerate(sections.get(name) or []) if i in kept[name]]
+            if name == "archive":
+                blocks[name] = header + "\n" + "".join(line + "\n" for line in lines)
+            else:
+                blocks[name] = header + "\n" + "\n".join(lines) if lines else empty_header
+
+        text = "\n\n".join(blocks.values())
+        counts = {name: count_tokens(block) for name, block in blocks.items()}
+        counts["total"] = count_tokens(text)
+        counts["dropped"] = dropped
+        return text, counts
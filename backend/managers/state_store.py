@@ -0,0 +1,560 @@
+import argparse
+import atexit
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import config
+
+DEFAULT_STATE = {
+    "user_profile": {"name": None, "preferences": []},
+    "entities": {},
+    "knowledge_base": {},
+    "events": [],
+    "system_stats": {"total_turns": 0}
+}
+
+
+def apply_record(data, record):
+    """Apply one mutation record to a state dict.
+    Every write to core memory is expressed as one of these, so the JSON store and
+    the journal store (which replays them at startup) stay byte-for-byte equivalent."""
+    op = record["op"]
+    if op == "turn":
+        data["system_stats"]["total_turns"] = record["value"]
+    elif op == "profile":
+        data["user_profile"][record["key"]] = record["value"]
+    elif op == "entity":
+        data["entities"][record["key"]] = record["value"]
+    elif op == "event":
+        data["events"].append(record["value"])
+    elif op == "knowledge":
+        data["knowledge_base"][record["key"]] = record["value"]
+    else:
+        raise ValueError(f"Unknown state record op: {op}")
+
+
+def atomic_write_text(path, text):
+    """Write to a temp file in the same folder, fsync, then rename over the target.
+    A crash mid-write leaves either the old file or the new one, never half of each."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class _WriteBehindFlusher:
+    """One daemon thread shared by every store in the process.
+    A store that becomes dirty wakes it up; it then waits STATE_FLUSH_INTERVAL_MS so
+    every mutation made in that window lands in a single write."""
+
+    def __init__(self):
+        self._stores = weakref.WeakSet()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush_all)
+
+    def register(self, store):
+        with self._lock:
+            self._stores.add(store)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="state-flusher", daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def flush_all(self):
+        with self._lock:
+            stores = list(self._stores)
+        for store in stores:
+            try:
+                store.flush()
+            except Exception as e:
+                print(f"[SYSTEM] State flush failed for {store.filepath}: {e}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(config.STATE_FLUSH_INTERVAL_MS / 1000)
+            # Clear before flushing: anything dirtied after this point re-arms the event.
+            self._wakeup.clear()
+            self.flush_all()
+
+
+_flusher = _WriteBehindFlusher()
+
+
+class JsonStateStore:
+    """Resident copy of user_state.json.
+
+    Reads go through the accessors (or `data`, holding `lock`); writes go through `apply()`.
+    The shared flusher writes the file at most once per flush interval, and
+    `flush()` / interpreter exit force any pending write out.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        self.lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self.data = self._read()
+        _flusher.register(self)
+        if not self.filepath.exists():
+            self.mark_dirty()
+            self.flush()
+
+    def _read(self):
+        try:
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        for key, value in DEFAULT_STATE.items():
+            data.setdefault(key, copy.deepcopy(value))
+        return data
+
+    def mark_dirty(self):
+        with self.lock:
+            self._dirty = True
+        _flusher.notify()
+
+    # --- READ ACCESSORS (shared with SqliteStateStore) ---
+    def turn(self):
+        with self.lock:
+            return self.data["system_stats"].get("total_turns", 0)
+
+    def profile(self):
+        with self.lock:
+            return dict(self.data["user_profile"])
+
+    def entity(self, key):
+        with self.lock:
+            return self.data["entities"].get(key)
+
+    def last_event(self):
+        with self.lock:
+            return self.data["events"][-1] if self.data["events"] else None
+
+    def export(self):
+        with self.lock:
+            return copy.deepcopy(self.data)
+
+    def apply(self, record):
+        with self.lock:
+            apply_record(self.data, record)
+            self.mark_dirty()
+
+    def replace(self, data):
+        with self.lock:
+            self.data = data
+            self.mark_dirty()
+
+    def flush(self):
+        # Serialise under the state lock so the snapshot is consistent,
+        # but do the disk write outside it so readers are never blocked on I/O.
+        with self._write_lock:
+            with self.lock:
+                if not self._dirty:
+                    return False
+                text = self._serialize()
+                self._dirty = False
+                snapshot_token = self._begin_snapshot()
+            try:
+                atomic_write_text(self.filepath, text)
+            except Exception:
+                self.mark_dirty()
+                raise
+            self._finish_snapshot(snapshot_token)
+        return True
+
+    def _serialize(self):
+        return json.dumps(self.data)
+
+    def _begin_snapshot(self):
+        return None
+
+    def _finish_snapshot(self, token):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class JournalStateStore(JsonStateStore):
+    """Append-only variant: every `apply()` appends one JSONL record to
+    `<state>.journal.jsonl`, so a write costs the size of the change rather than
+    the size of the history. Every JOURNAL_SNAPSHOT_EVERY records the flusher
+    compacts the state into user_state.json (the snapshot) and starts a fresh journal.
+
+    Startup loads the snapshot and replays any journal records newer than the
+    `journal_seq` it was written at. A torn last line from a crash is ignored.
+    """
+
+    def __init__(self, filepath):
+        filepath = Path(filepath)
+        self.journal_path = journal_path(filepath)
+        self._seq = 0
+        self._pending = 0
+        super().__init__(filepath)
+        self._journal = open(self.journal_path, "a")
+        if self._dirty:
+            # Fold whatever was replayed into a fresh snapshot before appending again,
+            # so new records never land behind a torn line.
+            self.flush()
+
+    def _read(self):
+        data = super()._read()
+        self._seq, replayed, torn = _replay_journals(data, self.journal_path)
+        self._pending = replayed
+        if replayed:
+            print(f"[SYSTEM] Replayed {replayed} journal records onto {self.filepath.name}")
+        if replayed or torn:
+            self._dirty = True
+        return data
+
+    def _rotated_journals(self):
+        return _rotated_journals(self.journal_path)
+
+    def apply(self, record):
+        with self.lock:
+            self._seq += 1
+            record = {"seq": self._seq, **record}
+            apply_record(self.data, record)
+            self._journal.write(json.dumps(record) + "\n")
+            self._journal.flush()
+            if config.JOURNAL_FSYNC:
+                os.fsync(self._journal.fileno())
+            self._pending += 1
+            if self._pending >= config.JOURNAL_SNAPSHOT_EVERY:
+                self.mark_dirty()
+
+    def replace(self, data):
+        # A wholesale replacement can't be expressed as a record: snapshot it right away.
+        with self.lock:
+            self.data = data
+            self.data.setdefault("system_stats", {})
+            self._dirty = True
+        self.flush()
+
+    def _serialize(self):
+        self.data["system_stats"]["journal_seq"] = self._seq
+        return json.dumps(self.data)
+
+    def _begin_snapshot(self):
+        # Called under the state lock, right after serialising: every record up to
+        # _seq is in the snapshot, so park the current journal and start a new one.
+        if not hasattr(self, "_journal"):
+            return None
+        self._journal.close()
+        rotated = None
+        if self.journal_path.exists():
+            rotated = self.journal_path.with_name(f"{self.journal_path.name}.{self._seq:012d}.old")
+            os.replace(self.journal_path, rotated)
+        self._journal = open(self.journal_path, "a")
+        self._pending = 0
+        return rotated
+
+    def _finish_snapshot(self, rotated):
+        # The snapshot is durable now, so every parked journal is redundant.
+        for path in self._rotated_journals():
+            path.unlink()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self._journal.close()
+
+
+def _rotated_journals(journal_path):
+    return sorted(journal_path.parent.glob(f"{journal_path.name}.*.old"))
+
+
+def journal_path(filepath):
+    return Path(filepath).with_name(f"{Path(filepath).stem}.journal.jsonl")
+
+
+def remove_journals(filepath):
+    """Delete the journal (live and parked) of a state file, e.g. before resetting it:
+    otherwise records newer than the new snapshot's journal_seq would be replayed onto it."""
+    path = journal_path(filepath)
+    for journal in _rotated_journals(path) + [path]:
+        journal.unlink(missing_ok=True)
+
+
+def _replay_journals(data, journal_path):
+    """Apply every journal record newer than the snapshot's `journal_seq` onto `data`.
+    Returns (last_seq, records_replayed, saw_torn_tail)."""
+    seq = data["system_stats"].get("journal_seq", 0)
+    replayed = 0
+    torn = False
+    for path in _rotated_journals(journal_path) + [journal_path]:
+        if not path.exists():
+            continue
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    torn = True  # torn tail from an interrupted append
+                    break
+                if record.get("seq", 0) <= seq:
+                    continue
+                apply_record(data, record)
+                seq = record["seq"]
+                replayed += 1
+    return seq, replayed, torn
+
+
+class SqliteStateStore:
+    """Core memory in SQLite (WAL mode) instead of one JSON blob.
+
+    Entities are keyed by normalised name, events are indexed by turn and date and
+    knowledge is keyed by topic, so every read and write touches only the rows it
+    needs. On first open an existing user_state.json is imported; `export()` /
+    `export_json()` produce the same document shape the JSON stores write.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS profile (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS entities (
+            key TEXT PRIMARY KEY, name TEXT, relationship TEXT, attributes TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, turn INTEGER NOT NULL,
+            date TEXT NOT NULL, description TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_turn ON events (turn);
+        CREATE INDEX IF NOT EXISTS idx_events_date ON events (date);
+        CREATE TABLE IF NOT EXISTS knowledge (topic TEXT PRIMARY KEY, content TEXT);
+    """
+
+    def __init__(self, db_path, json_path=None):
+        self.filepath = Path(db_path)
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        is_new = not self.filepath.exists()
+        self.conn = sqlite3.connect(str(self.filepath), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        if is_new:
+            if json_path and Path(json_path).exists():
+                self.import_json(json_path)
+                print(f"[SYSTEM] Imported {Path(json_path).name} into {self.filepath.name}")
+            else:
+                self.replace(copy.deepcopy(DEFAULT_STATE))
+
+    # --- READ ACCESSORS ---
+    def turn(self):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM stats WHERE key = 'total_turns'").fetchone()
+        return row[0] if row else 0
+
+    def profile(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM profile ORDER BY rowid").fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def entity(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT name, relationship, attributes FROM entities WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "relationship": row[1], "attributes": json.loads(row[2])}
+
+    def last_event(self):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT turn, description, date FROM events ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return {"turn": row[0], "description": row[1], "date": row[2]} if row else None
+
+    def events_between(self, start_date, end_date):
+        """Events whose ISO date falls in [start_date, end_date] (served by idx_events_date)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT turn, description, date FROM events WHERE date BETWEEN ? AND ? ORDER BY id",
+                (start_date, end_date)
+            ).fetchall()
+        return [{"turn": t, "description": d, "date": dt} for t, d, dt in rows]
+
+    def export(self):
+        with self.lock:
+            entities = self.conn.execute(
+                "SELECT key, name, relationship, attributes FROM entities ORDER BY rowid"
+            ).fetchall()
+            events = self.conn.execute("SELECT turn, description, date FROM events ORDER BY id").fetchall()
+            knowledge = self.conn.execute("SELECT topic, content FROM knowledge ORDER BY rowid").fetchall()
+            return {
+                "user_profile": self.profile(),
+                "entities": {k: {"name": n, "relationship": r, "attributes": json.loads(a)} for k, n, r, a in entities},
+                "knowledge_base": dict(knowledge),
+                "events": [{"turn": t, "description": d, "date": dt} for t, d, dt in events],
+                "system_stats": {"total_turns": self.turn()}
+            }
+
+    # --- WRITES ---
+    def _apply(self, record):
+        op = record["op"]
+        if op == "turn":
+            self.conn.execute(
+                "INSERT INTO stats (key, value) VALUES ('total_turns', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (record["value"],)
+            )
+        elif op == "profile":
+            self.conn.execute(
+                "INSERT INTO profile (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (record["key"], json.dumps(record["value"]))
+            )
+        elif op == "entity":
+            value = record["value"]
+            self.conn.execute(
+                "INSERT INTO entities (key, name, relationship, attributes) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET name = excluded.name, "
+                "relationship = excluded.relationship, attributes = excluded.attributes",
+                (record["key"], value["name"], value.get("relationship"), json.dumps(value.get("attributes") or {}))
+            )
+        elif op == "event":
+            value = record["value"]
+            self.conn.execute(
+                "INSERT INTO events (turn, date, description) VALUES (?, ?, ?)",
+                (value["turn"], value["date"], value["description"])
+            )
+        elif op == "knowledge":
+            self.conn.execute(
+                "INSERT INTO knowledge (topic, content) VALUES (?, ?) "
+                "ON CONFLICT(topic) DO UPDATE SET content = excluded.content",
+                (record["key"], record["value"])
+            )
+        else:
+            raise ValueError(f"Unknown state record op: {op}")
+
+    def apply(self, record):
+        with self.lock, self.conn:
+            self._apply(record)
+
+    def replace(self, data):
+        with self.lock, self.conn:
+            for table in ("stats", "profile", "entities", "events", "knowledge"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self._apply({"op": "turn", "value": data.get("system_stats", {}).get("total_turns", 0)})
+            for key, value in data.get("user_profile", {}).items():
+                self._apply({"op": "profile", "key": key, "value": value})
+            for key, value in data.get("entities", {}).items():
+                self._apply({"op": "entity", "key": key, "value": value})
+            for event in data.get("events", []):
+                self._apply({"op": "event", "value": event})
+            for topic, content in data.get("knowledge_base", {}).items():
+                self._apply({"op": "knowledge", "key": topic, "value": content})
+
+    def import_json(self, json_path):
+        with open(json_path, 'r') as f:
+            self.replace(json.load(f))
+
+    def export_json(self, json_path):
+        atomic_write_text(json_path, json.dumps(self.export(), indent=4))
+
+    def flush(self):
+        # Every apply() already commits; just fold the WAL back into the main file.
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return True
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_state_store(filepath):
+    """Build the core-memory store selected by config.CORE_STORAGE_BACKEND."""
+    backend = config.CORE_STORAGE_BACKEND
+    if backend == "json":
+        return JsonStateStore(filepath)
+    if backend == "journal":
+        return JournalStateStore(filepath)
+    if backend == "sqlite":
+        return SqliteStateStore(Path(filepath).with_suffix(".db"), json_path=filepath)
+    raise ValueError(f"Unknown CORE_STORAGE_BACKEND: {backend}")
+
+
+def read_state_snapshot(filepath=None):
+    """Side-effect-free read of the current state for dashboards and scripts.
+    Unlike opening a store, this never writes, rotates or imports anything."""
+    filepath = Path(filepath or config.USER_STATE_FILE)
+    backend = config.CORE_STORAGE_BACKEND
+    if backend == "sqlite":
+        db_path = filepath.with_suffix(".db")
+        if not db_path.exists():
+            return {}
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            reader = SqliteStateStore.__new__(SqliteStateStore)
+            reader.conn, reader.lock = conn, threading.RLock()
+            return reader.export()
+        finally:
+            conn.close()
+    try:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if backend == "journal":
+        data.setdefault("system_stats", {})
+        _replay_journals(data, journal_path(filepath))
+    return data
+
+
+def state_signature(filepath=None):
+    """Cheap change detector (mtime/size of every backing file) for read-side caches."""
+    filepath = Path(filepath or config.USER_STATE_FILE)
+    candidates = [filepath, filepath.with_suffix(".db"), filepath.with_suffix(".db-wal"),
+                  journal_path(filepath)]
+    signature = []
+    for path in candidates:
+        try:
+            st = path.stat()
+            signature.append((path.name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            pass
+    return tuple(signature)
+
+
+if __name__ == "__main__":
+    # python -m backend.managers.state_store export backup.json
+    # python -m backend.managers.state_store import backup.json
+    parser = argparse.ArgumentParser(description="Import/export core memory for the configured storage backend")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path", help="JSON file in the user_state.json format")
+    args = parser.parse_args()
+
+    store = open_state_store(config.USER_STATE_FILE)
+    if args.action == "export":
+        atomic_write_text(args.path, json.dumps(store.export(), indent=4))
+        print(f"✅ Exported core memory to {args.path}")
+    else:
+        with open(args.path, 'r') as f:
+            store.replace(json.load(f))
+        store.flush()
+        print(f"✅ Imported core memory from {args.path}")
+    store.close()
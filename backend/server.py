@@ -1,29 +1,80 @@
-from fastapi import FastAPI
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 import uvicorn
+from backend.logic import metrics
 from backend.logic.orchestrator import Orchestrator
 
-# Initialize App and Orchestrator
-app = FastAPI()
+# Initialize Orchestrator
 orchestrator = Orchestrator()
 
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Drain background saves and persist core memory before the process exits
+    orchestrator.shutdown()
+
+# Initialize App
+app = FastAPI(lifespan=lifespan)
+
 # Define Request Model
 class ChatRequest(BaseModel):
     message: str
+    # Each session has its own core memory, archive scope and history
+    session_id: str = "default"
+    # Adds the turn's per-stage timing breakdown and counters to the response
+    debug: bool = False
+
+def check_session(request):
+    try:
+        return orchestrator.sessions.validate(request.session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Define API Endpoint
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
-    # Unpack the 3 values from orchestrator
-    response_text, active_memories, debug_prompt = orchestrator.process_message(request.message)
-    
-    return {
-        "response": response_text,
-        "active_memories": active_memories,
-        "debug_prompt": debug_prompt  # <--- Send this to frontend
+    session_id = check_session(request)
+    # Awaited: the event loop stays free for other clients
+    done = await orchestrator.arun_turn(request.message, session_id=session_id)
+
+    payload = {
+        "session_id": session_id,
+        "response": done["response"],
+        "active_memories": done["active_memories"],
+        "debug_prompt": done["debug_prompt"]  # <--- Send this to frontend
     }
+    if request.debug:
+        payload["timings"] = done.get("stats", {})
+    return payload
+
+# Streaming variant: Server-Sent Events, one frame per orchestrator event
+# (retrieval, token, tool_call, tool_result, reset) ending with a `done` frame
+# that carries the same payload as /chat.
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    session_id = check_session(request)
+
+    async def event_source():
+        async for event in orchestrator.astream_message(request.message, session_id=session_id):
+            if event["type"] == "done" and not request.debug:
+                event.pop("stats", None)
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Prometheus scrape target: stage latency histograms, tool/retry/token counters
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Entry Point for 'python -m backend.server'
 if __name__ == "__main__":
     print("🚀 Starting MemoryOS Server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
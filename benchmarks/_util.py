@@ -0,0 +1,6 @@
+"""Helpers shared by the benchmark scripts."""
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,111 @@
+"""
+Fact ingestion benchmark
+Compares the per-item path (add_fact in a loop) with the bulk add_facts()
+at several batch sizes, on a scratch Chroma database. About 10% of the
+synthetic facts are repeats, so both dedup paths do real work.
+
+Usage: python -m benchmarks.bench_add_facts --facts 1000 10000 --out facts.json
+"""
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import config
+
+SUBJECTS = ["Alex", "Sarah", "the team", "my sister", "the landlord", "our CTO", "the dentist", "my neighbour"]
+VERBS = ["prefers", "dislikes", "recommended", "asked about", "is allergic to", "bought", "is learning", "mentioned"]
+OBJECTS = ["green tea", "Rust", "hiking boots", "the Q3 roadmap", "peanuts", "a used Honda", "Spanish", "jazz records",
+           "sourdough", "the Berlin offsite", "standing desks", "chess openings"]
+
+
+def make_facts(n, duplicate_ratio=0.1, seed=0):
+    rng = random.Random(seed)
+    facts = []
+    for i in range(n):
+        if facts and rng.random() < duplicate_ratio:
+            facts.append(rng.choice(facts))
+        else:
+            facts.append(f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} (note {i})")
+    return facts
+
+
+def fresh_archive():
+    from backend.managers import chroma_store
+    from backend.managers.archival_manager import ArchivalMemoryManager
+    from backend.managers.embeddings import EmbeddingCache, get_embedder
+
+    chroma_store.reset_collection("semantic_memory")
+    # Cold cache for every run, so both paths pay for their own embeddings
+    get_embedder().cache = EmbeddingCache(config.EMBEDDING_CACHE_ENTRIES, config.EMBEDDING_CACHE_MAX_BYTES)
+    return ArchivalMemoryManager()
+
+
+def run_single(facts):
+    archive = fresh_archive()
+    t0 = time.perf_counter()
+    for fact in facts:
+        archive.add_fact(fact, 1)
+    wall = time.perf_counter() - t0
+    return wall, archive.semantic.count()
+
+
+def run_bulk(facts, batch_size):
+    archive = fresh_archive()
+    t0 = time.perf_counter()
+    for start in range(0, len(facts), batch_size):
+        archive.add_facts(facts[start:start + batch_size], 1)
+    wall = time.perf_counter() - t0
+    return wall, archive.semantic.count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="add_fact vs add_facts throughput")
+    parser.add_argument("--facts", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--skip-single-above", type=int, default=None,
+                        help="Skip the per-item path for sizes larger than this (it is slow)")
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="memoryos_facts_"))
+    config.CHROMA_DB_DIR = workdir / "chroma_db"
+    results = []
+    try:
+        # Load the embedding model before timing anything
+        from backend.managers.embeddings import get_embedder
+        get_embedder().embed(["warm up"])
+
+        for n in args.facts:
+            facts = make_facts(n)
+            row = {"facts": n, "unique": len(set(facts))}
+            if args.skip_single_above is None or n <= args.skip_single_above:
+                wall, stored = run_single(facts)
+                row["single"] = {"wall_s": round(wall, 3), "facts_per_s": round(n / wall, 1), "stored": stored}
+            for batch_size in args.batch_sizes:
+                wall, stored = run_bulk(facts, batch_size)
+                row[f"bulk_{batch_size}"] = {"wall_s": round(wall, 3), "facts_per_s": round(n / wall, 1), "stored": stored}
+            results.append(row)
+
+            print(f"📦 {n} facts ({row['unique']} unique)")
+            for path, stats in row.items():
+                if isinstance(stats, dict):
+                    speedup = ""
+                    if "single" in row and path != "single":
+                        speedup = f"  x{row['single']['wall_s'] / stats['wall_s']:.1f}"
+                    print(f"  {path:>10}: {stats['facts_per_s']:>9} facts/s   stored {stats['stored']}{speedup}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
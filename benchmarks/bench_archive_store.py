@@ -0,0 +1,175 @@
+"""
+Conversation-log storage benchmark
+Writes N synthetic logs (clustered 384-d vectors, spread over --sessions
+sessions) into each archive backend and then queries it from a fresh process
+with session-filtered top-k searches:
+
+  chroma        a Chroma collection (HNSW graph + SQLite), as with ARCHIVE_LOG_BACKEND = "chroma"
+  mmap-float16  backend/managers/archive_store.py, 2 bytes per dimension
+  mmap-int8     the same, 1 byte per dimension + a scale per row
+
+Reports append throughput, disk size, resident memory of the querying
+process (RSS growth from open through the queries; for mmap this includes
+the touched file pages, which the OS can drop), query p50/p99, and recall@k against exact
+float32 search.
+
+Usage: python -m benchmarks.bench_archive_store --logs 10000 100000 --out archive.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks._util import percentile
+from benchmarks.sweep_hnsw import synthetic_corpus
+
+BACKENDS = ("chroma", "mmap-float16", "mmap-int8")
+
+
+def open_store(backend, path, create=False):
+    if backend == "chroma":
+        import chromadb
+        import config
+        from backend.managers.chroma_store import hnsw_metadata
+        client = chromadb.PersistentClient(path=str(path))
+        if create:
+            return client.create_collection("conversation_logs", metadata=hnsw_metadata(config.HNSW_PARAMS["conversation_logs"]))
+        return client.get_collection("conversation_logs")
+    from backend.managers.archive_store import MmapLogStore
+    return MmapLogStore(path, dtype=backend.split("-")[1])
+
+
+def rss_mb():
+    # Current resident set (anonymous + mapped file pages); ru_maxrss would carry
+    # over the parent's peak, which holds the whole corpus
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def session_of(i, sessions):
+    return f"user{i % sessions}"
+
+
+# --- WORKERS (one process each) ---
+def build_worker(args):
+    corpus = np.load(Path(args.workdir) / "corpus.npy")
+    store = open_store(args.backend, args.db, create=True)
+    t0 = time.perf_counter()
+    # Turn-sized appends, batched like the background write queue
+    for start in range(0, len(corpus), args.batch):
+        rows = range(start, min(start + args.batch, len(corpus)))
+        store.add(ids=[f"mem_{i:08x}" for i in rows], embeddings=corpus[start:start + args.batch],
+                  documents=[f"User: message {i}\nAssistant: reply {i}" for i in rows],
+                  metadatas=[{"role": "user", "turn_number": i, "origin_turn": i, "session_id": session_of(i, args.sessions)} for i in rows])
+    return {"append_per_s": round(len(corpus) / (time.perf_counter() - t0), 1)}
+
+
+def query_worker(args):
+    queries = np.load(Path(args.workdir) / "queries.npy")
+    truth = json.loads((Path(args.workdir) / "truth.json").read_text())
+    # Imported up front so the RSS growth is the store's, not the libraries'
+    import chromadb
+    import backend.managers.archive_store
+    rss_before = rss_mb()
+    store = open_store(args.backend, args.db)
+    times, overlap = [], []
+    for q, (query, expected) in enumerate(zip(queries, truth)):
+        where = {"session_id": session_of(q, args.sessions)}
+        t0 = time.perf_counter()
+        ids = store.query(query_embeddings=[query], n_results=args.k, where=where)["ids"][0]
+        times.append(time.perf_counter() - t0)
+        overlap.append(len(set(ids) & set(expected)) / args.k)
+    return {
+        f"recall@{args.k}": round(statistics.mean(overlap), 4),
+        "p50_ms": round(percentile(times, 50) * 1000, 3),
+        "p99_ms": round(percentile(times, 99) * 1000, 3),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1)
+    }
+
+
+def run_worker(kind, args, backend, db):
+    result_file = Path(args.workdir) / f"{kind}.result.json"
+    cmd = [sys.executable, "-m", "benchmarks.bench_archive_store", "--worker", kind, "--workdir", str(args.workdir),
+           "--backend", backend, "--db", str(db), "--sessions", str(args.sessions), "--k", str(args.k),
+           "--batch", str(args.batch), "--result", str(result_file)]
+    subprocess.run(cmd, check=True, env=dict(os.environ))
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def exact_truth(corpus, queries, sessions, k):
+    truth = []
+    for q, query in enumerate(queries):
+        rows = np.arange(q % sessions, len(corpus), sessions)
+        top = rows[np.argsort(-(corpus[rows] @ query))[:k]]
+        truth.append([f"mem_{i:08x}" for i in top])
+    return truth
+
+
+def dir_bytes(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs memory-mapped conversation-log storage")
+    parser.add_argument("--logs", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions the logs are spread over")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=64, help="Records per add() call")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = (build_worker if args.worker == "build" else query_worker)(args)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    rows = []
+    for n in args.logs:
+        vectors = synthetic_corpus(n + args.queries, seed=args.seed)
+        corpus, queries = vectors[:n], vectors[n:]
+        args.workdir = Path(tempfile.mkdtemp(prefix="memoryos_archive_"))
+        try:
+            np.save(args.workdir / "corpus.npy", corpus)
+            np.save(args.workdir / "queries.npy", queries)
+            (args.workdir / "truth.json").write_text(json.dumps(exact_truth(corpus, queries, args.sessions, args.k)))
+            print(f"🗄️  {n} logs over {args.sessions} sessions")
+            for backend in args.backends:
+                db = args.workdir / backend
+                build = run_worker("build", args, backend, db)
+                result = run_worker("query", args, backend, db)
+                row = {"logs": n, "backend": backend, **build, "disk_mb": round(dir_bytes(db) / 1e6, 2), **result}
+                rows.append(row)
+                print(f"  {backend:<13} append {row['append_per_s']}/s, disk {row['disk_mb']} MB, "
+                      f"query rss +{row['rss_delta_mb']} MB, p50 {row['p50_ms']} ms / p99 {row['p99_ms']} ms, "
+                      f"recall@{args.k} {row[f'recall@{args.k}']}")
+                shutil.rmtree(db, ignore_errors=True)
+        finally:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"sessions": args.sessions, "k": args.k, "runs": rows}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Core memory storage benchmark
+Compares per-operation latency of the json / journal / sqlite state stores
+once the history already holds a large number of events.
+
+Usage: python -m benchmarks.bench_core_storage --events 10000 --ops 500
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import config
+from backend.managers.state_store import open_state_store
+from benchmarks._util import percentile
+
+BACKENDS = ["json", "journal", "sqlite"]
+
+
+def summarize(samples):
+    return {
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p99_us": round(percentile(samples, 99) * 1e6, 1),
+        "mean_us": round(statistics.mean(samples) * 1e6, 1)
+    }
+
+
+def seed(store, n_events):
+    date = datetime.now().strftime("%Y-%m-%d")
+    for i in range(n_events):
+        store.apply({"op": "event", "value": {"turn": i, "description": f"Seed event number {i} about project work", "date": date}})
+        if i % 50 == 0:
+            store.apply({"op": "entity", "key": f"person {i}", "value": {"name": f"Person {i}", "relationship": "colleague", "attributes": {"team": i % 7}}})
+    store.apply({"op": "turn", "value": n_events})
+    store.flush()
+
+
+def run_backend(backend, n_events, n_ops, workdir):
+    config.CORE_STORAGE_BACKEND = backend
+    state_file = workdir / backend / "user_state.json"
+    state_file.parent.mkdir(parents=True)
+
+    store = open_state_store(state_file)
+    seed(store, n_events)
+    store.close()
+
+    t0 = time.perf_counter()
+    store = open_state_store(state_file)
+    open_s = time.perf_counter() - t0
+
+    date = datetime.now().strftime("%Y-%m-%d")
+    ops = {
+        "increment_turn": lambda i: store.apply({"op": "turn", "value": store.turn() + 1}),
+        "log_event": lambda i: store.apply({"op": "event", "value": {"turn": n_events + i, "description": f"Benchmark event {i}", "date": date}}),
+        "update_entity": lambda i: store.apply({"op": "entity", "key": "sarah johnson", "value": {"name": "Sarah Johnson", "relationship": "boss", "attributes": {"rev": i}}}),
+        "update_profile": lambda i: store.apply({"op": "profile", "key": "occupation", "value": f"Engineer {i}"}),
+        "read_prompt_state": lambda i: (store.profile(), store.last_event(), store.entity("sarah johnson"))
+    }
+
+    results = {"open_s": round(open_s, 4)}
+    for name, op in ops.items():
+        # "apply" is the hot-path cost; "durable" adds the flush a crash-safe caller would need
+        apply_samples, durable_samples = [], []
+        for i in range(n_ops):
+            t0 = time.perf_counter()
+            op(i)
+            t1 = time.perf_counter()
+            store.flush()
+            t2 = time.perf_counter()
+            apply_samples.append(t1 - t0)
+            durable_samples.append(t2 - t0)
+        results[name] = {"apply": summarize(apply_samples), "durable": summarize(durable_samples)}
+    store.close()
+
+    results["disk_bytes"] = sum(p.stat().st_size for p in state_file.parent.iterdir() if p.is_file())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryOS core storage benchmark")
+    parser.add_argument("--events", type=int, default=10000, help="Events already in history")
+    parser.add_argument("--ops", type=int, default=500, help="Timed operations per op type")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="memoryos_bench_"))
+    report = {"events": args.events, "ops": args.ops, "backends": {}}
+    try:
+        for backend in args.backends:
+            print(f"⏱️  {backend} ({args.events} events)...")
+            report["backends"][backend] = run_backend(backend, args.events, args.ops, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("-" * 72)
+    print(f"{'op':<28}" + "".join(f"{b + ' p50 / p99 (us)':<24}" for b in args.backends))
+    for op in ["increment_turn", "log_event", "update_entity", "update_profile", "read_prompt_state"]:
+        for mode in ["apply", "durable"]:
+            row = f"{op + ' ' + mode:<28}"
+            for b in args.backends:
+                s = report["backends"][b][op][mode]
+                row += f"{s['p50_us']:>9} / {s['p99_us']:<12}"
+            print(row)
+    for b in args.backends:
+        print(f"{b}: open {report['backends'][b]['open_s']}s, disk {report['backends'][b]['disk_bytes']} bytes")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Embedding provider benchmark
+Runs each encoder (config.EMBEDDING_PROVIDER options) over a synthetic fact
+corpus and a set of short queries, and reports:
+
+  docs_per_s     embedding throughput on the corpus, one call with every document
+  query latency  one call per query (the per-turn path), p50/p99
+  recall@k       overlap of each query's top-k corpus neighbours with the ones
+                 the float model finds (1.0 = same ranking as "default")
+
+"default" cannot be tuned; the ONNX providers run once per --threads value.
+
+Usage: python -m benchmarks.bench_embeddings --docs 2000 --threads 1 2 0 --out embeddings.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks._util import percentile
+from benchmarks.bench_add_facts import make_facts
+from demo_bulk_test import TEST_QUERIES
+
+
+def top_k(query_vectors, doc_vectors, k):
+    scores = query_vectors @ doc_vectors.T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+def run_provider(provider, threads, docs, queries, args):
+    import config
+    from backend.managers.embedding_providers import build_embedding_function
+
+    config.EMBEDDING_THREADS = threads
+    config.EMBEDDING_BATCH_SIZE = args.batch_size
+    encoder = build_embedding_function(provider)
+
+    t0 = time.perf_counter()
+    encoder(["warm up"])
+    warmup_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    doc_vectors = np.array(encoder(docs))
+    docs_s = time.perf_counter() - t0
+
+    query_times, query_vectors = [], []
+    for query in queries:
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            vector = encoder([query])[0]
+            query_times.append(time.perf_counter() - t0)
+        query_vectors.append(vector)
+    return {
+        "provider": provider,
+        "threads": threads if provider != "default" else None,
+        "warmup_s": round(warmup_s, 3),
+        "docs_per_s": round(len(docs) / docs_s, 1),
+        "query_p50_ms": round(percentile(query_times, 50) * 1000, 2),
+        "query_p99_ms": round(percentile(query_times, 99) * 1000, 2),
+        "query_mean_ms": round(statistics.mean(query_times) * 1000, 2)
+    }, doc_vectors, np.array(query_vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding providers: throughput, query latency and recall")
+    parser.add_argument("--providers", nargs="+", default=["default", "onnx", "onnx-int8"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 0], help="Intra-op threads (0 = every core)")
+    parser.add_argument("--docs", type=int, default=2000, help="Synthetic corpus size")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed repetitions per query")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    docs = list(dict.fromkeys(make_facts(args.docs, seed=args.seed)))
+    queries = [q for q, _ in TEST_QUERIES] + ["What does my sister prefer?", "Who recommended the hiking boots?",
+                                             "Is anyone allergic to peanuts?", "What is Alex learning?"]
+    results, reference = [], None
+    for provider in args.providers:
+        for threads in ([0] if provider == "default" else args.threads):
+            print(f"🧮 {provider} (threads {threads or 'all'})")
+            result, doc_vectors, query_vectors = run_provider(provider, threads, docs, queries, args)
+            neighbours = top_k(query_vectors, doc_vectors, args.k)
+            # Float vectors are the same in every float provider; the first run is the reference
+            if reference is None:
+                reference = neighbours
+            result[f"recall@{args.k}"] = round(statistics.mean(
+                len(ours & ref) / args.k for ours, ref in zip(neighbours, reference)), 3)
+            results.append(result)
+            print(f"  {result['docs_per_s']} docs/s, query p50 {result['query_p50_ms']} ms / "
+                  f"p99 {result['query_p99_ms']} ms, recall@{args.k} {result[f'recall@{args.k}']}, "
+                  f"warm-up {result['warmup_s']} s")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"docs": len(docs), "queries": len(queries), "runs": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Entity lookup benchmark
+Seeds core memory with N synthetic people, then resolves messages that mention
+them by name two ways:
+
+  alias    the in-memory alias index (EntityAliasIndex.mentions + core state)
+  vector   embed the message and query the entity_facts collection (the old path)
+
+and reports hit rate (the mentioned person is returned) and latency percentiles.
+
+Usage: python -m benchmarks.bench_entity_lookup --entities 100 1000 --out entities.json
+"""
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import config
+from benchmarks._util import percentile
+
+FIRST = ["Tajinder", "Sarah", "Ravikant", "Alex", "Priya", "Marco", "Yuki", "Amara", "Lena", "Diego", "Omar", "Ingrid"]
+LAST = ["Bagga", "Chen", "Johnson", "Okafor", "Rossi", "Tanaka", "Silva", "Novak", "Haddad", "Lindqvist", "Mehta", "Kowalski"]
+SYLLABLES = ["ka", "ro", "vi", "en", "to", "mu", "sa", "li", "de", "no"]
+ROLES = ["colleague", "friend", "neighbour", "mentor", "cousin", "client"]
+TEMPLATES = ["Can you remind me what {name} does?", "I had lunch with {name} today.", "Tell me about {name}."]
+
+
+def latency(samples):
+    return {
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p99_us": round(percentile(samples, 99) * 1e6, 1),
+        "mean_us": round(statistics.mean(samples) * 1e6, 1)
+    }
+
+
+def run_size(n_entities, args):
+    from backend.managers import chroma_store
+    from backend.managers.core_manager import CoreMemoryManager, entity_description
+    from backend.managers.embeddings import embed_query
+
+    chroma_store.reset_collection("entity_facts")
+    config.USER_STATE_FILE = config.CHROMA_DB_DIR.parent / f"user_state_{n_entities}.json"
+    core = CoreMemoryManager()
+    rng = random.Random(args.seed)
+    names = set()
+    while len(names) < n_entities:
+        surname = rng.choice(LAST) + "".join(rng.choice(SYLLABLES) for _ in range(2))
+        names.add(f"{rng.choice(FIRST)} {surname}")
+    names = sorted(names)
+    for name in names:
+        core.update_entity(name, rng.choice(ROLES), {"team": rng.randint(1, 20)})
+    probes = [(rng.choice(TEMPLATES).format(name=name), name) for name in rng.sample(names, min(args.probes, n_entities))]
+
+    def alias_lookup(query):
+        return [entity_description(core.store.entity(key)) for key in core.entity_aliases.mentions(query)]
+
+    def vector_lookup(query):
+        return core.entity_collection.query(query_embeddings=[embed_query(query)], where=core.where,
+                                            n_results=5, include=["documents"])["documents"][0]
+
+    runs = []
+    for mode, lookup in (("alias", alias_lookup), ("vector", vector_lookup)):
+        lookup("warm up")
+        times, hits = [], 0
+        for query, name in probes:
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                docs = lookup(query)
+                times.append(time.perf_counter() - t0)
+            hits += any(doc.startswith(f"{name} is") for doc in docs)
+        runs.append({"mode": mode, "hit_rate": round(hits / len(probes), 3), **latency(times)})
+    core.close()
+    return {"entities": n_entities, "probes": len(probes), "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity lookup by name: alias index vs vector query")
+    parser.add_argument("--entities", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per probe")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="memoryos_entities_"))
+    config.CHROMA_DB_DIR = workdir / "chroma_db"
+    results = []
+    try:
+        for n in args.entities:
+            print(f"👥 {n} entities")
+            result = run_size(n, args)
+            results.append(result)
+            for run in result["runs"]:
+                print(f"  {run['mode']:>6}: hit rate {run['hit_rate']}, p50 {run['p50_us']} us / p99 {run['p99_us']} us")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
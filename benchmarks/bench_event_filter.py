@@ -0,0 +1,157 @@
+"""
+Event date-filter benchmark
+Seeds the timeline with N synthetic events spread over several years (plus one
+planted "needle" per year among many look-alikes), then asks year-scoped
+questions ("... in 2019?", "... last year?") three ways:
+
+  post-filter  top 5 by vector distance, year checked afterwards (the old search_events)
+  pushdown     search confined to the year/month by the Chroma `where` filter (search_events, vector only)
+  hybrid       pushdown + BM25 fusion (search_events with HYBRID_RETRIEVAL)
+
+and reports recall (the needle is returned), how many returned events are from
+the asked year, and latency percentiles.
+
+Usage: python -m benchmarks.bench_event_filter --events 10000 50000 --out events.json
+"""
+
+import argparse
+import json
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import config
+from benchmarks._util import percentile
+
+ACTIVITIES = ["Went for a run", "Ran a 10k race", "Long training session", "Had dinner", "Visited a museum",
+              "Went hiking", "Met friends for coffee", "Attended a workshop", "Went to a concert", "Moved apartments"]
+PLACES = ["Berlin", "Lisbon", "Chicago", "Osaka", "Nairobi", "Lima", "Oslo", "Austin", "Seoul", "Porto", "Dublin", "Quito"]
+
+
+def seed_events(core, n_events, years, rng):
+    from backend.managers import chroma_store
+    from backend.managers.embeddings import embed_documents
+
+    # One needle per year: the only marathon in that year, in its own city
+    needles = {year: PLACES[i % len(PLACES)] for i, year in enumerate(years)}
+    events = []
+    for turn in range(n_events):
+        year = rng.choice(years)
+        date = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        events.append((f"{rng.choice(ACTIVITIES)} ({rng.choice(PLACES)}, note {turn})", date))
+    for year, city in needles.items():
+        events.insert(rng.randrange(len(events)), (f"Ran the {city} marathon", f"{year}-06-15"))
+
+    step = min(1000, core.chroma_client.get_max_batch_size())
+    for start in range(0, len(events), step):
+        batch = events[start:start + step]
+        docs = [doc for doc, _ in batch]
+        core.event_collection.add(
+            ids=[f"event_{start + i}" for i in range(len(batch))],
+            documents=docs,
+            embeddings=embed_documents(docs),
+            metadatas=[chroma_store.event_metadata(start + i, date, config.DEFAULT_SESSION_ID) for i, (_, date) in enumerate(batch)]
+        )
+    return needles
+
+
+def search_post_filter(core, text, query_vector):
+    """The pre-pushdown search_events: unfiltered top 5, year checked afterwards."""
+    match = re.search(r'\b(20\d{2})\b', text)
+    target_year = match.group(1) if match else (str(datetime.now().year - 1) if "last year" in text.lower() else None)
+    results = core.event_collection.query(query_embeddings=[query_vector], where=core.where, n_results=5,
+                                          include=["documents", "distances", "metadatas"])
+    events = []
+    for doc, meta, dist in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
+        is_year_match = target_year and (target_year in meta['date'])
+        if dist < (1.4 if is_year_match else 1.1):
+            event_str = {"text": f"- [Turn {meta['turn']} | {meta['date']}] {doc}"}
+            if is_year_match:
+                events.insert(0, event_str)
+            else:
+                events.append(event_str)
+    return events
+
+
+def run_mode(core, mode, probes, repeats):
+    from backend.managers.embeddings import embed_query
+
+    config.HYBRID_RETRIEVAL = mode == "hybrid"
+    search = (lambda text, vector: search_post_filter(core, text, vector)) if mode == "post-filter" else core.search_events
+    search("warm up", embed_query("warm up"))
+
+    times, hits, in_year, returned = [], 0, 0, 0
+    for text, year, city in probes:
+        vector = embed_query(text)
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            events = search(text, vector)
+            times.append(time.perf_counter() - t0)
+        hits += any(f"Ran the {city} marathon" in e["text"] and f"| {year}-" in e["text"] for e in events)
+        in_year += sum(f"| {year}-" in e["text"] for e in events)
+        returned += len(events)
+    return {
+        "mode": mode,
+        "recall": round(hits / len(probes), 3),
+        "in_year_share": round(in_year / returned, 3) if returned else 0.0,
+        "p50_ms": round(percentile(times, 50) * 1000, 2),
+        "p99_ms": round(percentile(times, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(times) * 1000, 2)
+    }
+
+
+def run_size(n_events, args):
+    from backend.managers import chroma_store
+    from backend.managers.core_manager import CoreMemoryManager
+
+    chroma_store.reset_collection("timeline_events")
+    core = CoreMemoryManager()
+    this_year = datetime.now().year
+    years = list(range(this_year - args.years + 1, this_year + 1))
+    needles = seed_events(core, n_events, years, random.Random(args.seed))
+
+    probes = [(f"Where did I run the marathon in {year}?", year, city) for year, city in needles.items()]
+    # No events are logged through core memory here, so "last year" is relative to today
+    probes.append(("Where did I run the marathon last year?", this_year - 1, needles[this_year - 1]))
+    runs = [run_mode(core, mode, probes, args.repeats) for mode in ("post-filter", "pushdown", "hybrid")]
+    core.close()
+    return {"events": n_events + len(needles), "years": args.years, "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Year-scoped event search: post-filter vs where-filter pushdown")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000])
+    parser.add_argument("--years", type=int, default=12, help="Years the events are spread over (ending this year)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per probe")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="memoryos_events_"))
+    config.CHROMA_DB_DIR = workdir / "chroma_db"
+    config.USER_STATE_FILE = workdir / "user_state.json"
+    results = []
+    try:
+        for n in args.events:
+            print(f"📅 {n} events over {args.years} years")
+            result = run_size(n, args)
+            results.append(result)
+            for run in result["runs"]:
+                print(f"  {run['mode']:>11}: recall {run['recall']}, in-year {run['in_year_share']}, "
+                      f"p50 {run['p50_ms']} ms / p99 {run['p99_ms']} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
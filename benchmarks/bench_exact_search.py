@@ -0,0 +1,120 @@
+"""
+Exact vs HNSW search crossover benchmark
+For each collection size, fills a scratch Chroma collection and an ExactIndex
+(backend/managers/exact_search.py) with the same synthetic vectors, documents
+and session metadata, then times session-filtered top-k queries both ways:
+
+  exact   NumPy matrix product + argpartition over the memory-resident copy
+  hnsw    collection.query() (HNSW search, SQLite metadata fetch, marshalling)
+
+and reports latency percentiles, HNSW recall against the exact results, and
+the largest size at which exact search is still faster (the crossover, a
+guide for config.EXACT_SEARCH_MAX_VECTORS).
+
+Usage: python -m benchmarks.bench_exact_search --sizes 100 300 1000 3000 10000 30000 --out exact.json
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks._util import percentile
+from benchmarks.sweep_hnsw import synthetic_corpus
+
+
+def latency(samples):
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3)
+    }
+
+
+def run_size(n, args):
+    import chromadb
+    from backend.managers.chroma_store import hnsw_metadata
+    from backend.managers.exact_search import ExactIndex
+
+    vectors = synthetic_corpus(n + args.queries, seed=args.seed)
+    corpus, queries = vectors[:n], vectors[n:]
+    ids = [f"fact_{i}" for i in range(n)]
+    documents = [f"Synthetic memory number {i}" for i in range(n)]
+    metadatas = [{"type": "fact", "origin_turn": i, "last_used_turn": i, "count": 1, "session_id": "default"} for i in range(n)]
+    where = {"session_id": "default"}
+
+    workdir = tempfile.mkdtemp(prefix="memoryos_exact_")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        params = {"space": args.space, "M": 16, "construction_ef": 100, "search_ef": 100}
+        collection = client.create_collection("bench", metadata=hnsw_metadata(params))
+        step = min(5000, client.get_max_batch_size())
+        for start in range(0, n, step):
+            collection.add(ids=ids[start:start + step], embeddings=corpus[start:start + step],
+                           documents=documents[start:start + step], metadatas=metadatas[start:start + step])
+        index = ExactIndex(args.space)
+        t0 = time.perf_counter()
+        index.add(ids, corpus, documents, metadatas)
+        load_s = time.perf_counter() - t0
+
+        runs = {}
+        for mode in ("exact", "hnsw"):
+            if mode == "exact":
+                search = lambda q: index.query([q], args.k, where)
+            else:
+                search = lambda q: collection.query(query_embeddings=[q], where=where, n_results=args.k)
+            search(queries[0])
+            times, found = [], []
+            for _ in range(args.repeats):
+                for query in queries:
+                    t0 = time.perf_counter()
+                    result = search(query)
+                    times.append(time.perf_counter() - t0)
+                    found.append(result["ids"][0])
+            runs[mode] = {"latency": latency(times), "found": found}
+        recall = statistics.mean(len(set(h) & set(e)) / args.k for h, e in zip(runs["hnsw"]["found"], runs["exact"]["found"]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "vectors": n,
+        "exact": runs["exact"]["latency"],
+        "hnsw": runs["hnsw"]["latency"],
+        f"hnsw_recall@{args.k}": round(recall, 4),
+        "exact_load_ms": round(load_s * 1000, 2),
+        "exact_mb": round(corpus.nbytes / 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact NumPy search vs Chroma HNSW by collection size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 3000, 10000, 30000])
+    parser.add_argument("--space", default="cosine", choices=["cosine", "l2", "ip"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        result = run_size(n, args)
+        results.append(result)
+        print(f"📐 {n:>6} vectors: exact p50 {result['exact']['p50_ms']} ms / p99 {result['exact']['p99_ms']} ms, "
+              f"hnsw p50 {result['hnsw']['p50_ms']} ms / p99 {result['hnsw']['p99_ms']} ms, "
+              f"hnsw recall@{args.k} {result[f'hnsw_recall@{args.k}']}")
+    faster = [r["vectors"] for r in results if r["exact"]["p50_ms"] < r["hnsw"]["p50_ms"]]
+    crossover = max(faster) if faster else None
+    print(f"⚖️  Exact search is faster up to {crossover} vectors (of those measured)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"space": args.space, "k": args.k, "crossover": crossover, "runs": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Retrieval benchmark
+Builds a scratch database from a scripted conversation (benchmarks/scripted_llm.py)
+plus a pile of synthetic archive facts with a few planted "needles" (codes), then
+runs the demo_bulk_test probes and exact-term probes with vector-only and hybrid
+(BM25 + vector, RRF) retrieval.
+
+For each mode it reports recall@k (expected keyword among the top-k lines the
+turn would put in [MEMORY CONTEXT]), retrieval latency percentiles, and for the
+archival_memory_search tool path how many queries needed an embedding.
+
+Usage: python -m benchmarks.bench_retrieval --turns 200 2000 --facts 2000 --out retrieval.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._util import percentile
+from demo_bulk_test import TEST_QUERIES
+
+# Planted archive facts: (fact, natural-language probe, exact-term probe, expected keyword)
+NEEDLES = [
+    ("The storage unit gate code is K9-5521", "What's the code for my storage unit?", "K9-5521", "K9-5521"),
+    ("Alex's frequent flyer number is UA-448812", "What is my frequent flyer number?", "UA-448812", "UA-448812"),
+    ("The Wi-Fi password at the Lisbon flat is tangerine42", "What's the Wi-Fi password at the flat?", "tangerine42", "tangerine42")
+]
+
+# Exact names/terms from the scripted conversation
+EXACT_PROBES = [
+    ("Sarah Johnson", "Sarah Johnson"),
+    ("AI Summit", "AI Summit"),
+    ("capital of France", "Paris")
+]
+
+
+def latency(samples):
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2)
+    }
+
+
+def populate(turns, n_facts, seed):
+    import backend.logic.orchestrator as orchestrator_module
+    from benchmarks.bench_add_facts import make_facts
+    from benchmarks.replay_bench import build_script
+    from benchmarks.scripted_llm import FakeGroqClient
+
+    orchestrator_module.client = FakeGroqClient()
+    bot = orchestrator_module.Orchestrator()
+    for message, _ in build_script(turns, seed=seed)[:-len(TEST_QUERIES)]:
+        bot.process_message(message)
+    facts = make_facts(n_facts, seed=seed)
+    # Needles land in the middle of the filler
+    facts[len(facts) // 2:len(facts) // 2] = [fact for fact, _, _, _ in NEEDLES]
+    for start in range(0, len(facts), 500):
+        bot.archive.add_facts(facts[start:start + 500], turns)
+    return bot
+
+
+def context_lines(session, query, k):
+    """The lines a turn's proactive retrieval would offer for `query` (top-k per source)."""
+    from backend.managers.embeddings import QueryEmbeddings
+
+    ctx = QueryEmbeddings([query])
+    vector = ctx.get(query)
+    lines = [e["text"] for e in session.core.search_entities(query, vector)[:k]]
+    lines += [e["text"] for e in session.core.search_events(query, vector)[:k]]
+    lines += [m["content"] for m in session.archive.search_memory(query, n_results=k, query_embedding=vector)]
+    return lines
+
+
+def run_mode(bot, hybrid, k, repeats):
+    import config
+    from backend.managers.embeddings import QueryEmbeddings
+
+    config.HYBRID_RETRIEVAL = hybrid
+    session = bot.sessions.get()
+    probes = [(q, expected, "semantic") for q, expected in TEST_QUERIES]
+    probes += [(q, expected, "semantic") for _, q, _, expected in NEEDLES]
+    probes += [(q, expected, "exact") for _, _, q, expected in NEEDLES]
+    probes += [(q, expected, "exact") for q, expected in EXACT_PROBES]
+
+    # Warm-up (index build, model load) stays out of the timings
+    context_lines(session, "warm up", k)
+
+    context_times, tool_times, rows = [], [], []
+    tool_embeds = 0
+    for query, expected, kind in probes:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            lines = context_lines(session, query, k)
+            context_times.append(time.perf_counter() - t0)
+
+            ctx = QueryEmbeddings([])
+            t0 = time.perf_counter()
+            tool_hits = session.archive.search_memory(query, n_results=k, query_ctx=ctx, include_logs=True)
+            tool_times.append(time.perf_counter() - t0)
+        tool_embeds += ctx.calls
+        rows.append({
+            "query": query, "kind": kind, "expected": expected,
+            "context_hit": any(expected.lower() in line.lower() for line in lines),
+            "tool_hit": any(expected.lower() in m["content"].lower() for m in tool_hits)
+        })
+
+    def recall(field, kind=None):
+        selected = [r for r in rows if kind is None or r["kind"] == kind]
+        return round(sum(r[field] for r in selected) / len(selected), 3)
+
+    return {
+        "mode": "hybrid" if hybrid else "vector",
+        f"context_recall@{k}": recall("context_hit"),
+        f"context_recall@{k}_semantic": recall("context_hit", "semantic"),
+        f"context_recall@{k}_exact": recall("context_hit", "exact"),
+        f"tool_recall@{k}": recall("tool_hit"),
+        "context_latency": latency(context_times),
+        "tool_latency": latency(tool_times),
+        "tool_queries_embedded": f"{tool_embeds}/{len(probes)}",
+        "probes": rows
+    }
+
+
+def worker(args):
+    bot = populate(args.worker, args.facts, args.seed)
+    try:
+        report = {"turns": args.worker, "facts": args.facts + len(NEEDLES),
+                  "runs": [run_mode(bot, hybrid, args.k, args.repeats) for hybrid in (False, True)]}
+    finally:
+        bot.shutdown()
+    with open(args.result, "w") as f:
+        json.dump(report, f)
+
+
+def run_size(turns, args):
+    # Fresh process and database per size (config paths are read at import time)
+    workdir = tempfile.mkdtemp(prefix=f"memoryos_retrieval_{turns}_")
+    result_file = Path(workdir).with_suffix(".result.json")
+    cmd = [sys.executable, "-m", "benchmarks.bench_retrieval", "--worker", str(turns), "--result", str(result_file),
+           "--facts", str(args.facts), "--k", str(args.k), "--repeats", str(args.repeats), "--seed", str(args.seed)]
+    try:
+        subprocess.run(cmd, env=dict(os.environ, MEMORYOS_DATABASE_DIR=workdir), check=True)
+        with open(result_file) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        result_file.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector vs hybrid retrieval: recall@k and latency")
+    parser.add_argument("--turns", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--facts", type=int, default=2000, help="Synthetic archive facts besides the needles")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per probe")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = []
+    for turns in args.turns:
+        print(f"🔎 {turns} turns + {args.facts + len(NEEDLES)} archive facts")
+        report = run_size(turns, args)
+        results.append(report)
+        for run in report["runs"]:
+            ctx, tool = run["context_latency"], run["tool_latency"]
+            print(f"  {run['mode']:>6}: context recall@{args.k} {run[f'context_recall@{args.k}']} "
+                  f"(semantic {run[f'context_recall@{args.k}_semantic']}, exact {run[f'context_recall@{args.k}_exact']}), "
+                  f"p50 {ctx['p50_ms']} ms / p99 {ctx['p99_ms']} ms")
+            print(f"          tool recall@{args.k} {run[f'tool_recall@{args.k}']}, p50 {tool['p50_ms']} ms / "
+                  f"p99 {tool['p99_ms']} ms, embedded {run['tool_queries_embedded']} queries")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
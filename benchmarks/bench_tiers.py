@@ -0,0 +1,149 @@
+"""
+Memory tiering benchmark
+Fills a scratch semantic_memory with N synthetic facts carrying a usage
+history (origin_turn, last_used_turn, count), builds the session's hot tier
+(backend/managers/memory_tiers.py) as the background refresher would, and
+replays a query stream against it:
+
+  recent      queries about facts the hot tier should hold (used lately or often)
+  long-range  queries about any fact, mostly old and cold
+
+Each query is a noisy copy of its target fact's vector. Runs the stream with
+tiering off (the whole archive: exact NumPy or HNSW, per EXACT_SEARCH_MAX_VECTORS)
+and on, and reports latency, the share answered by the hot tier, recall@k and
+top-1 agreement against exact search over the whole archive, and how often the
+target is found. A hot answer ranks only hot facts, so the lower ranks can
+differ from a whole-archive search even when the top hit agrees.
+
+Usage: python -m benchmarks.bench_tiers --facts 2000 20000 --out tiers.json
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks._util import percentile
+from benchmarks.sweep_hnsw import synthetic_corpus
+
+
+def fill(collection, vectors, turns, rng):
+    """Facts stored over `turns` turns; a Zipf-ish minority is reused later and often."""
+    n = len(vectors)
+    origin = np.sort(rng.integers(0, turns, size=n))
+    reuse = rng.random(n) < 0.15
+    last_used = np.where(reuse, rng.integers(origin, turns), origin)
+    count = np.where(reuse, np.minimum(rng.zipf(1.6, size=n), 50), 1)
+    metadatas = [{"type": "fact", "origin_turn": int(o), "last_used_turn": int(u), "count": int(c), "session_id": "default"}
+                 for o, u, c in zip(origin, last_used, count)]
+    ids = [f"fact_{i:06d}" for i in range(n)]
+    step = 5000
+    for start in range(0, n, step):
+        collection.add(ids=ids[start:start + step], embeddings=vectors[start:start + step],
+                       documents=[f"Synthetic fact {i}" for i in range(start, min(n, start + step))],
+                       metadatas=metadatas[start:start + step])
+    return ids
+
+
+def noisy(vector, noise, rng):
+    query = vector + noise * rng.standard_normal(len(vector)).astype(np.float32) / np.sqrt(len(vector))
+    return query / np.linalg.norm(query)
+
+
+def run_size(n, args):
+    from backend.managers import chroma_store, exact_search, memory_tiers
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic_corpus(n, clusters=max(1, n // 10), spread=args.spread, seed=args.seed)
+    collection = chroma_store.reset_collection("semantic_memory")
+    ids = fill(collection, vectors, args.turns, rng)
+    where = {"session_id": "default"}
+
+    t0 = time.perf_counter()
+    tier = memory_tiers.refresh("default", args.turns)
+    refresh_ms = (time.perf_counter() - t0) * 1000
+    row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+    hot_rows = [row_of[doc_id] for doc_id in tier.ids] if tier is not None else []
+
+    stream = []
+    for _ in range(args.queries):
+        kind = "recent" if rng.random() < args.recent_share and hot_rows else "long-range"
+        target = int(rng.choice(hot_rows)) if kind == "recent" else int(rng.integers(n))
+        stream.append((kind, target, noisy(vectors[target], args.noise, rng)))
+    truth = [list(np.array(ids)[np.argsort(-(vectors @ query))[:args.k]]) for _, _, query in stream]
+
+    modes = {
+        "untiered": lambda q: exact_search.query("semantic_memory", "default", query_embeddings=[q], where=where, n_results=args.k),
+        "tiered": lambda q: memory_tiers.query("default", q, where, args.k)
+    }
+    report = {"facts": n, "hot_memories": len(tier) if tier is not None else 0, "refresh_ms": round(refresh_ms, 1)}
+    for mode, search in modes.items():
+        search(stream[0][2])
+        before = memory_tiers.stats()["hot_queries"]
+        times, by_kind = [], {}
+        for (kind, target, query), expected in zip(stream, truth):
+            t0 = time.perf_counter()
+            found = search(query)["ids"][0]
+            times.append(time.perf_counter() - t0)
+            entry = by_kind.setdefault(kind, {"recall": [], "top1": [], "target": []})
+            entry["recall"].append(len(set(found) & set(expected)) / args.k)
+            entry["top1"].append(found[:1] == expected[:1])
+            entry["target"].append(ids[target] in found)
+        report[mode] = {
+            "p50_ms": round(percentile(times, 50) * 1000, 3),
+            "p99_ms": round(percentile(times, 99) * 1000, 3),
+            "mean_ms": round(statistics.mean(times) * 1000, 3),
+            "hot_share": round((memory_tiers.stats()["hot_queries"] - before) / len(stream), 3) if mode == "tiered" else 0.0,
+            **{f"{kind}_recall@{args.k}": round(statistics.mean(v["recall"]), 4) for kind, v in by_kind.items()},
+            **{f"{kind}_top1": round(statistics.mean(v["top1"]), 4) for kind, v in by_kind.items()},
+            **{f"{kind}_target_found": round(statistics.mean(v["target"]), 4) for kind, v in by_kind.items()}
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot/cold memory tiering: latency and recall on a replayed query stream")
+    parser.add_argument("--facts", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--turns", type=int, default=5000, help="Turns the facts were stored over")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--recent-share", type=float, default=0.8, help="Share of queries about hot-tier facts")
+    parser.add_argument("--noise", type=float, default=0.6, help="Query noise (0.6 = cosine ~0.86 to the target)")
+    parser.add_argument("--spread", type=float, default=1.0, help="Within-topic spread of the synthetic facts")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    import config
+    # Scratch database (the Chroma client is per process, so one for every size)
+    workdir = Path(tempfile.mkdtemp(prefix="memoryos_tiers_"))
+    config.DATABASE_DIR = workdir
+    config.CHROMA_DB_DIR = workdir / "chroma_db"
+    print(f"🔥 hot tier: {config.HOT_TIER_SIZE} facts, used within {config.HOT_TIER_RECENT_TURNS} turns "
+          f"or count >= {config.HOT_TIER_MIN_COUNT}, min similarity {config.HOT_TIER_MIN_SIMILARITY}")
+    results = []
+    try:
+        for n in args.facts:
+            report = run_size(n, args)
+            results.append(report)
+            print(f"  {n} facts ({report['hot_memories']} hot, refresh {report['refresh_ms']} ms)")
+            for mode in ("untiered", "tiered"):
+                r = report[mode]
+                print(f"    {mode:<9} p50 {r['p50_ms']} ms / p99 {r['p99_ms']} ms / mean {r['mean_ms']} ms, hot {r['hot_share']:.0%}, "
+                      + ", ".join(f"{key} {value}" for key, value in r.items() if "recall" in key or "top1" in key or "target" in key))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": {key: getattr(config, key) for key in ("HOT_TIER_SIZE", "HOT_TIER_RECENT_TURNS", "HOT_TIER_MIN_COUNT", "HOT_TIER_MIN_SIMILARITY")},
+                       "runs": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+/chat load test
+Fires concurrent clients at the MemoryOS server and reports latency percentiles.
+With --spawn it starts benchmarks/mock_llm.py and the server itself against a
+scratch database, so nothing touches Groq or database/.
+
+Each client talks in its own session unless --shared-session is given.
+
+Usage: python -m benchmarks.load_test_chat --spawn --clients 32 --requests 320
+       python -m benchmarks.load_test_chat --spawn --clients 8 --shared-session
+       python -m benchmarks.load_test_chat --url http://localhost:8000/chat
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks._util import percentile
+from demo_bulk_test import FILLER_MESSAGES
+
+
+async def wait_for_port(url, timeout=120):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def failed_turn(payload):
+    # A turn that fails inside the server still answers 200, with the error as the reply
+    return str(payload.get("response", "")).startswith("System Error")
+
+
+async def run_load(url, clients, total_requests, shared_session=False):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(random.choice(FILLER_MESSAGES))
+
+    async def worker(client, i):
+        nonlocal errors
+        # One session per client, so turns only queue on each other's session lock with --shared-session
+        body = {} if shared_session else {"session_id": f"load-{i}"}
+        while True:
+            try:
+                message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            try:
+                response = await client.post(url, json={"message": message, **body}, timeout=120)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if failed_turn(response.json()):
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=clients)) as client:
+        await asyncio.gather(*(worker(client, i) for i in range(clients)))
+    wall = time.perf_counter() - t0
+
+    return {
+        "clients": clients,
+        "shared_session": shared_session,
+        "requests": total_requests,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None
+    }
+
+
+def spawn(llm_port, server_port, llm_latency_ms, workdir, llm_args=()):
+    env = dict(os.environ,
+               GROQ_BASE_URL=f"http://127.0.0.1:{llm_port}",
+               GROQ_API_KEY=os.environ.get("GROQ_API_KEY") or "mock",  # an empty key is an invalid header
+               MEMORYOS_DATABASE_DIR=workdir)
+    llm = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_llm",
+                            "--port", str(llm_port), "--latency-ms", str(llm_latency_ms), *llm_args], env=env)
+    try:
+        # The server's first turn would otherwise race the mock LLM's startup
+        asyncio.run(wait_for_port(f"http://127.0.0.1:{llm_port}/docs"))
+    except Exception:
+        llm.terminate()
+        raise
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.server:app",
+                               "--port", str(server_port), "--log-level", "warning"], env=env)
+    return [llm, server]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryOS /chat load test")
+    parser.add_argument("--url", default="http://localhost:8000/chat")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=320)
+    parser.add_argument("--spawn", action="store_true", help="Start mock LLM + server on a scratch database")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--shared-session", action="store_true",
+                        help="Send every request to the default session (turns of one session run one at a time)")
+    parser.add_argument("--out", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    procs, workdir = [], None
+    url = args.url
+    try:
+        if args.spawn:
+            workdir = tempfile.mkdtemp(prefix="memoryos_load_")
+            procs = spawn(9000, 8001, args.llm_latency_ms, workdir)
+            url = "http://127.0.0.1:8001/chat"
+            asyncio.run(wait_for_port("http://127.0.0.1:8001/docs"))
+            # Warm-up turn so model loading is not counted
+            warmup = httpx.post(url, json={"message": "hello"}, timeout=300).json()
+            if failed_turn(warmup):
+                raise RuntimeError(f"Warm-up turn failed: {warmup['response']}")
+
+        print(f"🚀 {args.requests} requests, {args.clients} concurrent clients -> {url}")
+        report = asyncio.run(run_load(url, args.clients, args.requests, args.shared_session))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print("-" * 50)
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
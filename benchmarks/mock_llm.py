@@ -0,0 +1,105 @@
+"""
+Mock LLM server
+A local OpenAI/Groq-compatible /chat/completions endpoint with a fixed, configurable
+latency, so the MemoryOS server can be load-tested without calling Groq.
+
+With --scripted it answers from benchmarks/scripted_llm.py instead (canned
+tool calls for known messages), so replays over HTTP match in-process ones.
+
+Usage: python -m benchmarks.mock_llm --port 9000 --latency-ms 300
+       GROQ_BASE_URL=http://127.0.0.1:9000 python -m backend.server
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from benchmarks.scripted_llm import respond
+
+app = FastAPI()
+LATENCY_S = 0.3
+TOKEN_INTERVAL_S = 0.02
+SCRIPTED = False
+
+
+def reply_for(body):
+    user_messages = [m for m in body.get("messages", []) if isinstance(m, dict) and m.get("role") == "user"]
+    last = user_messages[-1]["content"] if user_messages else ""
+    return f"Mock reply to: {last[:80]}"
+
+
+async def stream_chunks(body, content):
+    # OpenAI-style chunked deltas: role first, then one word per chunk, then [DONE]
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get("model", "mock")}
+    first = {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    yield f"data: {json.dumps(first)}\n\n"
+    for i, word in enumerate(content.split(" ")):
+        await asyncio.sleep(TOKEN_INTERVAL_S)
+        piece = word if i == 0 else " " + word
+        chunk = {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    # Groq puts usage on the final chunk under `x_groq`
+    usage = {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())}
+    last = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+    yield f"data: {json.dumps(last)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def scripted_completion(body):
+    reply = respond(body.get("messages", []))
+    message = {"role": "assistant", "content": reply["content"] or None}
+    if reply["tool_calls"]:
+        message["tool_calls"] = reply["tool_calls"]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message,
+                     "finish_reason": "tool_calls" if reply["tool_calls"] else "stop"}],
+        "usage": reply["usage"]
+    }
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(LATENCY_S)
+    # Scripted mode only serves non-streamed requests (what /chat sends)
+    if SCRIPTED and not body.get("stream"):
+        return scripted_completion(body)
+    content = reply_for(body)
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(body, content), media_type="text/event-stream")
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM for MemoryOS load tests")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Delay before the first byte")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between streamed tokens")
+    parser.add_argument("--scripted", action="store_true", help="Answer from benchmarks/scripted_llm.py")
+    args = parser.parse_args()
+    LATENCY_S = args.latency_ms / 1000
+    TOKEN_INTERVAL_S = args.token_ms / 1000
+    SCRIPTED = args.scripted
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
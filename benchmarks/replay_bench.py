@@ -0,0 +1,251 @@
+"""
+Replay benchmark
+Replays a scripted conversation of N turns against a scratch database and
+reports throughput, per-stage latency percentiles, on-disk growth and recall
+on the demo_bulk_test probes. The LLM is benchmarks/scripted_llm.py (canned
+tool calls), so runs are deterministic and need no network.
+
+Each size runs in its own process with a fresh database. By default the
+Orchestrator is driven in-process; --http goes through the FastAPI server
+(spawned with the scripted mock LLM) instead.
+
+Usage: python -m benchmarks.replay_bench --turns 100 1000 10000 --out replay.json
+       python -m benchmarks.replay_bench --turns 1000 --http
+       python -m benchmarks.replay_bench --turns 1000 --baseline replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks._util import percentile
+from demo_bulk_test import FILLER_MESSAGES, INITIAL_MESSAGES, TEST_QUERIES
+
+# The first turn pays for model loading; it is replayed but left out of latency stats
+WARMUP_TURNS = 1
+
+
+def build_script(turns, seed=0):
+    """Planted facts, then filler (seeded, so identical every run), then the recall probes.
+    Returns [(message, expected_keyword or None)]."""
+    rng = random.Random(seed)
+    filler = max(0, turns - len(INITIAL_MESSAGES) - len(TEST_QUERIES))
+    script = [(message, None) for message in INITIAL_MESSAGES]
+    script += [(rng.choice(FILLER_MESSAGES), None) for _ in range(filler)]
+    script += list(TEST_QUERIES)
+    return script
+
+
+def dir_bytes(path):
+    path = Path(path)
+    if not path.exists():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def disk_usage(workdir):
+    workdir = Path(workdir)
+    chroma = dir_bytes(workdir / "chroma_db")
+    cache = dir_bytes(workdir / "embedding_cache.npz")
+    return {"core_state_bytes": dir_bytes(workdir) - chroma - cache, "chroma_bytes": chroma}
+
+
+def summarize_stages(stats_per_turn):
+    stages = {}
+    for stats in stats_per_turn:
+        for stage, ms in stats.get("timings_ms", {}).items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        stage: {
+            "p50_ms": round(percentile(samples, 50), 2),
+            "p90_ms": round(percentile(samples, 90), 2),
+            "p99_ms": round(percentile(samples, 99), 2),
+            "mean_ms": round(statistics.mean(samples), 2),
+            "n": len(samples)
+        }
+        for stage, samples in sorted(stages.items())
+    }
+
+
+def replay(run_turn, script, workdir):
+    """Drive `run_turn(message) -> (response, active_memories, prompt, stats)` through the script."""
+    checkpoint_every = max(1, len(script) // 10)
+    growth = [{"turn": 0, **disk_usage(workdir)}]
+    stats_per_turn, probes = [], []
+    totals = {"llm_calls": 0, "tool_calls": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    t0 = time.perf_counter()
+    for i, (message, expected) in enumerate(script, start=1):
+        response, memories, prompt, stats = run_turn(message)
+        if i > WARMUP_TURNS:
+            stats_per_turn.append(stats)
+        for key in totals:
+            totals[key] += stats.get(key, 0)
+        if expected:
+            # Recall = the fact reached the model's context (prompt or recalled memories)
+            context = (prompt + " " + " ".join(m.get("content", "") for m in memories)).lower()
+            probes.append({"query": message, "expected": expected, "in_context": expected.lower() in context})
+        if i % checkpoint_every == 0:
+            growth.append({"turn": i, **disk_usage(workdir)})
+    wall = time.perf_counter() - t0
+
+    hits = sum(p["in_context"] for p in probes)
+    return {
+        "turns": len(script),
+        "wall_s": round(wall, 3),
+        "throughput_tps": round(len(script) / wall, 2) if wall else 0,
+        "stages": summarize_stages(stats_per_turn),
+        "totals": totals,
+        "recall": round(hits / len(probes), 3) if probes else None,
+        "probes": probes,
+        "disk_growth": growth
+    }
+
+
+def run_in_process(script, workdir):
+    import backend.logic.orchestrator as orchestrator_module
+    from benchmarks.scripted_llm import FakeGroqClient
+
+    orchestrator_module.client = FakeGroqClient()
+    bot = orchestrator_module.Orchestrator()
+
+    def run_turn(message):
+        response, memories, prompt = bot.process_message(message)
+        return response, memories, prompt, bot.last_turn_stats
+
+    try:
+        report = replay(run_turn, script, workdir)
+    finally:
+        # Drain background saves and flush state so the final sizes are complete
+        bot.shutdown()
+    return report
+
+
+def run_over_http(script, workdir, llm_latency_ms):
+    import httpx
+    from benchmarks.load_test_chat import spawn, wait_for_port
+
+    procs = spawn(9000, 8001, llm_latency_ms, str(workdir), llm_args=["--scripted"])
+    url = "http://127.0.0.1:8001/chat"
+    try:
+        asyncio.run(wait_for_port("http://127.0.0.1:8001/docs"))
+        with httpx.Client(timeout=300) as client:
+            def run_turn(message):
+                data = client.post(url, json={"message": message, "debug": True}).json()
+                return data["response"], data["active_memories"], data["debug_prompt"], data.get("timings", {})
+
+            report = replay(run_turn, script, workdir)
+    finally:
+        # SIGTERM lets uvicorn run the lifespan shutdown (flush + drain)
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+    return report
+
+
+def worker(args):
+    workdir = Path(os.environ["MEMORYOS_DATABASE_DIR"])
+    script = build_script(args.worker, seed=args.seed)
+    if args.http:
+        report = run_over_http(script, workdir, args.llm_latency_ms)
+    else:
+        report = run_in_process(script, workdir)
+    report["disk_final"] = disk_usage(workdir)
+    report["bytes_per_turn"] = {
+        key: round(value / report["turns"], 1) for key, value in report["disk_final"].items()
+    }
+    with open(args.result, "w") as f:
+        json.dump(report, f)
+
+
+def run_size(turns, args):
+    workdir = tempfile.mkdtemp(prefix=f"memoryos_replay_{turns}_")
+    result_file = Path(workdir).with_suffix(".result.json")
+    cmd = [sys.executable, "-m", "benchmarks.replay_bench", "--worker", str(turns),
+           "--result", str(result_file), "--seed", str(args.seed),
+           "--llm-latency-ms", str(args.llm_latency_ms)]
+    if args.http:
+        cmd.append("--http")
+    try:
+        subprocess.run(cmd, env=dict(os.environ, MEMORYOS_DATABASE_DIR=workdir), check=True)
+        with open(result_file) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        result_file.unlink(missing_ok=True)
+
+
+def print_report(run):
+    turn = run["stages"].get("turn", {})
+    print(f"  {run['turns']} turns in {run['wall_s']}s -> {run['throughput_tps']} turns/s")
+    print(f"  turn latency p50/p90/p99: {turn.get('p50_ms')} / {turn.get('p90_ms')} / {turn.get('p99_ms')} ms")
+    for stage, s in run["stages"].items():
+        if stage != "turn":
+            print(f"    {stage:>16}: p50 {s['p50_ms']:>8} ms   p99 {s['p99_ms']:>8} ms")
+    print(f"  disk: core state {run['disk_final']['core_state_bytes']:,} B, chroma {run['disk_final']['chroma_bytes']:,} B")
+    print(f"  recall: {run['recall']} ({sum(p['in_context'] for p in run['probes'])}/{len(run['probes'])} probes in context)")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {run["turns"]: run for run in json.load(f)["runs"]}
+    print("-" * 50)
+    print(f"Compared with {baseline_path}:")
+    for run in results["runs"]:
+        base = baseline.get(run["turns"])
+        if not base:
+            continue
+        def delta(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        p50, base_p50 = run["stages"]["turn"]["p50_ms"], base["stages"]["turn"]["p50_ms"]
+        print(f"  {run['turns']:>6} turns: throughput {delta(run['throughput_tps'], base['throughput_tps'])}, "
+              f"turn p50 {delta(p50, base_p50)}, recall {base['recall']} -> {run['recall']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryOS replay benchmark")
+    parser.add_argument("--turns", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--http", action="store_true", help="Replay through the FastAPI server instead of in-process")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Mock LLM latency (--http only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="replay_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "mode": "http" if args.http else "in-process",
+        "seed": args.seed,
+        "runs": []
+    }
+    for turns in args.turns:
+        print(f"🚀 Replaying {turns} turns ({results['mode']})")
+        run = run_size(turns, args)
+        results["runs"].append(run)
+        print_report(run)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
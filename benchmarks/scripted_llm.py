@@ -0,0 +1,97 @@
+"""
+Scripted LLM stand-in
+Maps the latest user message to a canned reply or canned tool calls, so a
+replayed conversation performs exactly the same memory writes on every run.
+Used in-process by replay_bench.py (FakeGroqClient) and over HTTP by
+mock_llm.py --scripted.
+"""
+
+import json
+import types
+
+from demo_bulk_test import INITIAL_MESSAGES
+
+# Tool calls the "model" makes for a given user message
+SCRIPTED_TOOL_CALLS = {
+    INITIAL_MESSAGES[0]: [
+        ("core_memory_update", {"key": "name", "value": "Alex Chen"}),
+        ("core_memory_update", {"key": "occupation", "value": "Software Engineer at TechCorp"})
+    ],
+    INITIAL_MESSAGES[1]: [
+        ("update_entity_memory", {"name": "Sarah Johnson", "relationship": "boss", "attributes": {"title": "VP of Engineering"}})
+    ],
+    INITIAL_MESSAGES[2]: [
+        ("core_memory_update", {"key": "preferences", "value": "Meetings after 11 AM (not a morning person)"})
+    ],
+    INITIAL_MESSAGES[3]: [
+        ("log_event", {"description": "Attended the AI Summit in San Francisco in 2025"})
+    ],
+    INITIAL_MESSAGES[4]: [
+        ("core_memory_update", {"key": "preferences", "value": "Favorite programming language: Python"})
+    ],
+    # A few filler messages write too, so stores grow with conversation length
+    "Recommend a good book": [
+        ("log_event", {"description": "Asked for a book recommendation"})
+    ],
+    "How do I learn Python?": [
+        ("update_entity_memory", {"name": "Python", "relationship": "language the user is learning", "attributes": {"level": "beginner"}})
+    ],
+    "What's a good workout routine?": [
+        ("core_memory_update", {"key": "goals", "value": "Build a workout routine"})
+    ],
+    "What's the capital of France?": [
+        ("save_knowledge", {"topic": "capital of France", "content": "Paris"})
+    ]
+}
+
+
+def _estimate_tokens(text):
+    return max(1, len(text or "") // 4)
+
+
+def respond(messages):
+    """The scripted answer to a chat request: {"content", "tool_calls", "usage"}."""
+    last = messages[-1] if messages else {}
+    prompt_tokens = sum(_estimate_tokens(m.get("content")) for m in messages if isinstance(m, dict))
+    if last.get("role") == "tool":
+        content = "Done, I'll remember that."
+        calls = []
+    else:
+        user_message = last.get("content") or ""
+        calls = [
+            {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+            for i, (name, args) in enumerate(SCRIPTED_TOOL_CALLS.get(user_message, []))
+        ]
+        content = "" if calls else f"Here is a short answer to: {user_message[:80]}"
+    completion_tokens = _estimate_tokens(content) + sum(_estimate_tokens(c["function"]["arguments"]) for c in calls)
+    return {
+        "content": content,
+        "tool_calls": calls,
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+
+class _Completions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        reply = respond(messages)
+        tool_calls = [
+            types.SimpleNamespace(id=c["id"], type="function",
+                                  function=types.SimpleNamespace(**c["function"]))
+            for c in reply["tool_calls"]
+        ]
+        message = types.SimpleNamespace(role="assistant", content=reply["content"] or None,
+                                        tool_calls=tool_calls or None)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)],
+                                     usage=types.SimpleNamespace(**reply["usage"]))
+
+
+class FakeGroqClient:
+    """Drop-in for the sync Groq client (non-streaming chat completions only)."""
+
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=_Completions())
@@ -0,0 +1,215 @@
+"""
+HNSW parameter sweep
+Rebuilds a collection's vectors into scratch Chroma indexes for every M x
+construction_ef combination and queries each at several search_ef values
+with held-out corpus vectors. Reports:
+
+  recall@k      overlap with the exact (brute-force) top-k
+  latency       per-query p50/p99
+  index_mb      size of the HNSW segment files (what a process loads into RAM)
+  build_s       time to insert the corpus
+
+The corpus is recorded from the live database (--collection, read-only) or
+synthetic (--synthetic N clustered unit vectors, for sizes beyond the real
+data). Chroma fixes search_ef once an index is loaded, so every build and
+every search_ef runs in its own process.
+
+Usage: python -m benchmarks.sweep_hnsw --collection semantic_memory --M 8 16 32 --search-ef 10 50 100 200 --out sweep.json --plot sweep.html
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import config
+from benchmarks._util import percentile
+
+
+def recorded_corpus(name, page_size=1000):
+    import chromadb
+    collection = chromadb.PersistentClient(path=str(config.CHROMA_DB_DIR)).get_collection(name)
+    vectors, offset = [], 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        vectors.extend(page["embeddings"])
+        offset += page_size
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_corpus(n, dim=384, clusters=200, spread=0.35, seed=0):
+    # Topic clusters, so neighbourhoods look more like real memories than uniform noise does
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(queries, corpus, space, k):
+    if space == "l2":
+        scores = -(np.sum(corpus ** 2, axis=1)[np.newaxis, :] - 2 * queries @ corpus.T)
+    elif space == "cosine":
+        normed = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        scores = queries @ normed.T
+    else:
+        scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def index_bytes(db_dir):
+    # Everything except the sqlite metadata store is HNSW segment files
+    return sum(f.stat().st_size for d in Path(db_dir).iterdir() if d.is_dir() for f in d.rglob("*") if f.is_file())
+
+
+# --- WORKERS (one process each) ---
+def build_worker(args):
+    import chromadb
+    from backend.managers.chroma_store import hnsw_metadata
+
+    corpus = np.load(Path(args.workdir) / "corpus.npy")
+    client = chromadb.PersistentClient(path=args.db)
+    params = {"space": args.space, "M": args.worker_m, "construction_ef": args.worker_cef, "search_ef": 10}
+    collection = client.create_collection("sweep", metadata=hnsw_metadata(params))
+    step = min(5000, client.get_max_batch_size())
+    t0 = time.perf_counter()
+    for start in range(0, len(corpus), step):
+        collection.add(ids=[str(i) for i in range(start, min(start + step, len(corpus)))], embeddings=corpus[start:start + step])
+    return {"build_s": round(time.perf_counter() - t0, 2)}
+
+
+def query_worker(args):
+    import chromadb
+
+    queries = np.load(Path(args.workdir) / "queries.npy")
+    truth = np.load(Path(args.workdir) / "truth.npy")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    collection = chromadb.PersistentClient(path=args.db).get_collection("sweep")
+    # Before the first query, i.e. before this process loads the index
+    collection.modify(configuration={"hnsw": {"ef_search": args.worker_ef}})
+    collection.query(query_embeddings=[queries[0]], n_results=args.k)
+    times, overlap = [], []
+    for query, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        ids = collection.query(query_embeddings=[query], n_results=args.k, include=[])["ids"][0]
+        times.append(time.perf_counter() - t0)
+        overlap.append(len({int(i) for i in ids} & set(expected.tolist())) / args.k)
+    return {
+        f"recall@{args.k}": round(statistics.mean(overlap), 4),
+        "p50_ms": round(percentile(times, 50) * 1000, 3),
+        "p99_ms": round(percentile(times, 99) * 1000, 3),
+        # ru_maxrss is in KiB on Linux
+        "rss_delta_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1)
+    }
+
+
+def run_worker(kind, args, db, **params):
+    result_file = Path(args.workdir) / f"{kind}.result.json"
+    cmd = [sys.executable, "-m", "benchmarks.sweep_hnsw", "--worker", kind, "--workdir", str(args.workdir),
+           "--db", str(db), "--space", args.space, "--k", str(args.k), "--result", str(result_file)]
+    for key, value in params.items():
+        cmd += [f"--worker-{key}", str(value)]
+    subprocess.run(cmd, check=True, env=dict(os.environ))
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def plot(rows, k, path):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(rows=1, cols=2, subplot_titles=("recall vs query latency", "recall vs index size"))
+    for (m, cef) in dict.fromkeys((r["M"], r["construction_ef"]) for r in rows):
+        series = [r for r in rows if r["M"] == m and r["construction_ef"] == cef]
+        labels = [f"search_ef={r['search_ef']}" for r in series]
+        name = f"M={m}, construction_ef={cef}"
+        fig.add_trace(go.Scatter(x=[r["p50_ms"] for r in series], y=[r[f"recall@{k}"] for r in series],
+                                 mode="lines+markers", name=name, text=labels, legendgroup=name), row=1, col=1)
+        fig.add_trace(go.Scatter(x=[r["index_mb"] for r in series], y=[r[f"recall@{k}"] for r in series],
+                                 mode="markers", name=name, text=labels, legendgroup=name, showlegend=False), row=1, col=2)
+    fig.update_xaxes(title_text="p50 latency (ms)", row=1, col=1)
+    fig.update_xaxes(title_text="index size (MB)", row=1, col=2)
+    fig.update_yaxes(title_text=f"recall@{k}")
+    fig.write_html(path)
+    print(f"📈 Plot written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW M / construction_ef / search_ef sweep: recall@k vs latency and size")
+    parser.add_argument("--collection", default="semantic_memory", help="Record the corpus from this live collection")
+    parser.add_argument("--synthetic", type=int, help="Use N synthetic vectors instead of a recorded corpus")
+    parser.add_argument("--space", help="Distance space (default: the collection's HNSW_PARAMS entry)")
+    parser.add_argument("--M", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--queries", type=int, default=200, help="Held-out corpus vectors used as queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Optional JSON results file")
+    parser.add_argument("--plot", help="Optional HTML plot (needs plotly)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-m", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-cef", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-ef", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = (build_worker if args.worker == "build" else query_worker)(args)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    args.space = args.space or config.HNSW_PARAMS.get(args.collection, {}).get("space", "cosine")
+    corpus = synthetic_corpus(args.synthetic, seed=args.seed) if args.synthetic else recorded_corpus(args.collection)
+    if len(corpus) <= args.queries:
+        sys.exit(f"Corpus has {len(corpus)} vectors; need more than --queries {args.queries}")
+    rng = np.random.default_rng(args.seed)
+    held_out = rng.choice(len(corpus), size=args.queries, replace=False)
+    queries, corpus = corpus[held_out], np.delete(corpus, held_out, axis=0)
+    source = f"{args.synthetic} synthetic" if args.synthetic else f"{args.collection}"
+    print(f"🧭 {len(corpus)} vectors ({source}, {args.space}), {len(queries)} held-out queries")
+
+    args.workdir = Path(tempfile.mkdtemp(prefix="memoryos_hnsw_"))
+    rows = []
+    try:
+        np.save(args.workdir / "corpus.npy", corpus)
+        np.save(args.workdir / "queries.npy", queries)
+        np.save(args.workdir / "truth.npy", exact_top_k(queries, corpus, args.space, args.k))
+        for m in args.M:
+            for cef in args.construction_ef:
+                db = args.workdir / f"db_M{m}_ef{cef}"
+                build = run_worker("build", args, db, m=m, cef=cef)
+                size_mb = round(index_bytes(db) / 1e6, 2)
+                print(f"  M={m} construction_ef={cef}: built in {build['build_s']} s, index {size_mb} MB")
+                for ef in args.search_ef:
+                    result = run_worker("query", args, db, ef=ef)
+                    rows.append({"M": m, "construction_ef": cef, "search_ef": ef, **build, "index_mb": size_mb, **result})
+                    print(f"    search_ef={ef}: recall@{args.k} {result[f'recall@{args.k}']}, "
+                          f"p50 {result['p50_ms']} ms / p99 {result['p99_ms']} ms")
+                shutil.rmtree(db, ignore_errors=True)
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"vectors": len(corpus), "space": args.space, "source": source, "runs": rows}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+    if args.plot:
+        plot(rows, args.k, args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,163 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 
 # 2. DEFINE ABSOLUTE PATHS
-DATABASE_DIR = BASE_DIR / "database"
+# MEMORYOS_DATABASE_DIR lets benchmarks and load tests run against a scratch copy
+DATABASE_DIR = Path(os.getenv("MEMORYOS_DATABASE_DIR", BASE_DIR / "database"))
 CHROMA_DB_DIR = DATABASE_DIR / "chroma_db"
 USER_STATE_FILE = DATABASE_DIR / "user_state.json"
+# Core-memory shards for every session other than the default one
+SESSIONS_DIR = DATABASE_DIR / "sessions"
 
 # 3. API KEYS
-GROQ_API_KEY = "" # <--- PASTE YOUR KEY HERE IF NOT USING ENV VARS
-# or os.getenv("GROQ_API_KEY")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "") # <--- PASTE YOUR KEY HERE IF NOT USING ENV VARS
+# Point at any OpenAI-compatible endpoint (e.g. benchmarks/mock_llm.py); None = Groq cloud
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
 
 # 4. MODEL SETTINGS
-LLM_MODEL = "llama-3.3-70b-versatile"
\ No newline at end of file
+LLM_MODEL = "llama-3.3-70b-versatile"
+
+# 5. CORE MEMORY STORAGE
+# "json":    whole state rewritten (coalesced) on change
+# "journal": each change appended to user_state.journal.jsonl; user_state.json
+#            becomes a periodic snapshot and may lag by up to JOURNAL_SNAPSHOT_EVERY records
+# "sqlite":  tables in user_state.db (WAL mode); user_state.json is imported on first run
+#            and can be exported with `python -m backend.managers.state_store export <file>`
+CORE_STORAGE_BACKEND = "json"
+# The JSON state stays resident in memory; dirty state is written back at most
+# once per interval (and always on shutdown) via temp file + atomic rename.
+STATE_FLUSH_INTERVAL_MS = 250
+JOURNAL_SNAPSHOT_EVERY = 200
+JOURNAL_FSYNC = False
+
+# 6. EMBEDDINGS
+# Shared LRU cache in front of the embedding model, used by every collection
+# read and write. Keys are hashes of whitespace-normalised text.
+EMBEDDING_CACHE_ENTRIES = 20000          # 0 disables the cache
+EMBEDDING_CACHE_MAX_BYTES = 64 * 1024 * 1024
+EMBEDDING_CACHE_PERSIST = False          # save on shutdown, warm-load on start
+EMBEDDING_CACHE_FILE = DATABASE_DIR / "embedding_cache.npz"
+# Encoder behind the cache (all four collections get their vectors from it):
+# "default":   Chroma's built-in all-MiniLM-L6-v2 function (pads every text to 256 tokens)
+# "onnx":      the same model and vectors, batched with padding to the longest text only
+# "onnx-int8": "onnx" with int8-quantised weights (built once; needs the `onnx` package
+#              for that); less CPU per text, vectors drift slightly from the float ones
+EMBEDDING_PROVIDER = "onnx"
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_THREADS = 0                    # onnxruntime intra-op threads; 0 = every core
+EMBEDDING_WARMUP = True                  # load the model at startup, not on the first turn
+
+# 7. SERVER CONCURRENCY
+# Threads for blocking work (Chroma queries, state writes) behind the async /chat
+IO_WORKERS = 8
+# Per-source budget for the proactive retrieval fan-out; a source that overruns is dropped for the turn
+RETRIEVAL_TIMEOUTS_S = {"archive": 2.0, "entities": 1.0, "events": 1.0}
+
+# 8. SESSIONS
+# Requests without a session_id use the default session (user_state.json).
+DEFAULT_SESSION_ID = "default"
+# Resident sessions (buffer + core state); the least recently used idle one is evicted beyond this
+MAX_ACTIVE_SESSIONS = 1000
+
+# 9. BACKGROUND ARCHIVE WRITES
+# Replies are archived off the request path through a bounded queue drained by
+# a fixed pool of writer threads; a full queue blocks the turn (back-pressure).
+ARCHIVE_WRITE_WORKERS = 2
+ARCHIVE_QUEUE_MAX = 1000
+ARCHIVE_BATCH_MAX = 64             # records per Chroma add() call
+ARCHIVE_WRITE_RETRIES = 3
+# Queued writes are spooled here first and replayed on start if the process died
+ARCHIVE_SPOOL_DIR = DATABASE_DIR / "archive_spool"
+ARCHIVE_SPOOL_ROTATE = 1000        # records per spool segment
+ARCHIVE_SPOOL_FSYNC = False
+
+# 10. PROMPT BUDGET
+# Token budget for the [MEMORY CONTEXT] block. The profile is always included
+# (trimmed to PROMPT_PROFILE_MAX_TOKENS, oldest list entries first); retrieved
+# entities, events and past conversations share the rest, most relevant first.
+PROMPT_CONTEXT_TOKENS = 1500
+PROMPT_PROFILE_MAX_TOKENS = 400
+# Token estimate used for budgeting (no tokenizer dependency); ~4 chars/token for English
+PROMPT_CHARS_PER_TOKEN = 4
+
+# 11. SHORT-TERM BUFFER
+# With BUFFER_MAX_TOKENS set, the buffer keeps as many recent messages as fit
+# that budget; None keeps the last BUFFER_MAX_TURNS messages instead.
+BUFFER_MAX_TURNS = 10
+BUFFER_MAX_TOKENS = 1500
+# Messages leaving the buffer are folded into a rolling summary by a background
+# LLM call; the summary is added to [MEMORY CONTEXT].
+BUFFER_SUMMARY = True
+BUFFER_SUMMARY_MAX_TOKENS = 300
+# Evicted messages are folded in batches of at least this many tokens (fewer LLM calls)
+BUFFER_SUMMARY_BATCH_TOKENS = 300
+BUFFER_SUMMARY_WORKERS = 2
+
+# 12. HYBRID RETRIEVAL
+# An in-memory BM25 index over entities, events, knowledge and the archive is
+# fused with the vector results by reciprocal rank fusion, so exact names,
+# codes and years rank well. False = vector search only.
+HYBRID_RETRIEVAL = True
+RRF_K = 60
+# Archive searches of at most this many terms that some document contains in
+# full, as a phrase or with a term found in at most n_results documents, are
+# answered from the index alone (no embedding, no vector query). Searches that
+# arrive already embedded (the proactive one each turn) always run the vector query.
+LEXICAL_EXACT_MAX_TOKENS = 4
+
+# 13. VECTOR INDEXES (HNSW)
+# Per collection. `space` ("cosine", "l2" = squared L2, "ip"), `M` and
+# `construction_ef` are fixed when a collection is created: changes apply to
+# new collections, or to existing ones after (server stopped)
+#   python -m backend.managers.chroma_store rebuild <collection> ...
+# which re-adds every session's records (a mismatch is logged at startup). `search_ef` is
+# also applied to existing collections when they are opened. Relevance
+# thresholds are cosine similarities, so they hold in any space.
+# Trade-offs on your own data: python -m benchmarks.sweep_hnsw
+HNSW_PARAMS = {
+    "semantic_memory": {"space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 100},
+    "conversation_logs": {"space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 100},
+    # Created before spaces were set, so they use Chroma's default (L2)
+    "timeline_events": {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 100},
+    "entity_facts": {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 100}
+}
+
+# 14. EXACT SEARCH FOR SMALL COLLECTIONS
+# A session with at most this many records in a collection is searched exactly,
+# by NumPy over a memory-resident copy of its vectors, instead of through the
+# HNSW index (0 = always HNSW). Exact search stayed faster up to 30k vectors
+# (python -m benchmarks.bench_exact_search); the limit bounds memory instead,
+# ~1.5 KB per 384-d vector, so ~15 MB per session collection at the limit.
+EXACT_SEARCH_MAX_VECTORS = 10000
+# Cap on the vectors of every session's exact indexes together; beyond it the
+# least recently searched indexes are dropped (rebuilt from Chroma when searched again)
+EXACT_SEARCH_MAX_BYTES = 512 * 1024 * 1024
+
+# 15. CONVERSATION LOG STORAGE
+# "chroma": conversation_logs is a Chroma collection like the others
+# "mmap":   append-only files in ARCHIVE_MMAP_DIR: vectors in a memory-mapped
+#           float16 or int8 file (2 or 1 byte per dimension), ids, per-row
+#           metadata columns and a document heap; only the id map stays resident
+#           and queries scan the session's rows exactly. Existing Chroma logs are
+#           copied in on first use. Compare: python -m benchmarks.bench_archive_store
+ARCHIVE_LOG_BACKEND = "chroma"
+ARCHIVE_MMAP_DIR = DATABASE_DIR / "archive_logs"
+ARCHIVE_MMAP_DTYPE = "float16"           # "float16" or "int8"; fixed once the store is created
+# fsync the data files before ids.txt (the commit point) names new rows, so a
+# crash never leaves a committed row pointing at unwritten bytes
+ARCHIVE_MMAP_FSYNC = True
+
+# 16. MEMORY TIERS
+# Per session, the HOT_TIER_SIZE facts used within the last HOT_TIER_RECENT_TURNS
+# turns, or reinforced at least HOT_TIER_MIN_COUNT times, are kept in RAM and
+# searched first; the full archive is skipped only when every one of the hot
+# matches asked for is at least HOT_TIER_MIN_SIMILARITY (cosine), and otherwise
+# searched and merged with them. A background thread re-tiers the
+# sessions that saw turns, at most once per interval. 0 disables tiering.
+# Sessions whose facts fit EXACT_SEARCH_MAX_VECTORS are already searched from
+# RAM (section 14's exact index), so they get no hot tier.
+# Latency and recall on a replayed workload: python -m benchmarks.bench_tiers
+HOT_TIER_SIZE = 512
+HOT_TIER_RECENT_TURNS = 50
+HOT_TIER_MIN_COUNT = 3
+HOT_TIER_MIN_SIMILARITY = 0.6
+TIER_REFRESH_INTERVAL_MS = 1000
@@ -31,6 +31,24 @@ FILLER_MESSAGES = [
     "Recommend a movie"
 ]
 
+# Facts planted at the start of a stress test...
+INITIAL_MESSAGES = [
+    "Hi! My name is Alex Chen. I work at TechCorp as a Software Engineer.",
+    "My boss is Sarah Johnson. She's the VP of Engineering.",
+    "I prefer meetings after 11 AM because I'm not a morning person.",
+    "In 2025, I attended the AI Summit in San Francisco.",
+    "My favorite programming language is Python."
+]
+
+# ...and the probes (question, expected keyword) that check they are recalled
+TEST_QUERIES = [
+    ("What's my boss's name?", "Sarah Johnson"),
+    ("What time do I prefer meetings?", "11 AM"),
+    ("What conferences did I attend in 2025?", "AI Summit"),
+    ("What's my favorite programming language?", "Python"),
+    ("Where do I work?", "TechCorp")
+]
+
 def send_message(message, backend_url="http://localhost:8000/chat"):
     """Send a single message to the backend"""
     try:
@@ -84,15 +102,7 @@ def run_memory_stress_test(backend_url="http://localhost:8000/chat"):
     # Phase 1: Set up initial memories
     print("\n📝 Phase 1: Setting up initial memories...")
     
-    initial_messages = [
-        "Hi! My name is Alex Chen. I work at TechCorp as a Software Engineer.",
-        "My boss is Sarah Johnson. She's the VP of Engineering.",
-        "I prefer meetings after 11 AM because I'm not a morning person.",
-        "In 2025, I attended the AI Summit in San Francisco.",
-        "My favorite programming language is Python."
-    ]
-    
-    for msg in initial_messages:
+    for msg in INITIAL_MESSAGES:
         print(f"  Sending: {msg[:60]}...")
         send_message(msg, backend_url)
         time.sleep(0.5)
@@ -106,18 +116,10 @@ def run_memory_stress_test(backend_url="http://localhost:8000/chat"):
     # Phase 3: Test recall
     print("\n🎯 Phase 3: Testing memory recall...")
     
-    test_queries = [
-        ("What's my boss's name?", "Sarah Johnson"),
-        ("What time do I prefer meetings?", "11 AM"),
-        ("What conferences did I attend in 2025?", "AI Summit"),
-        ("What's my favorite programming language?", "Python"),
-        ("Where do I work?", "TechCorp")
-    ]
-    
     correct = 0
-    total = len(test_queries)
+    total = len(TEST_QUERIES)
     
-    for query, expected_keyword in test_queries:
+    for query, expected_keyword in TEST_QUERIES:
         print(f"\n  Query: {query}")
         result = send_message(query, backend_url)
         
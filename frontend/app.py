@@ -1,13 +1,18 @@
 import streamlit as st
 import requests
 import json
+import sys
+from pathlib import Path
 from datetime import datetime
-import time
 import plotly.graph_objects as go
 import plotly.express as px
 from collections import defaultdict
 import pandas as pd
 
+# Make the project root importable when launched via `streamlit run frontend/app.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from backend.managers.state_store import read_state_snapshot, state_signature
+
 # Page Configuration
 st.set_page_config(
     layout="wide", 
@@ -262,15 +267,38 @@ if "memory_analytics" not in st.session_state:
     }
 
 # Helper Functions
-def typing_animation(text, delay=0.02):
-    """Simulate typing effect like Claude/Gemini"""
+def stream_chat(prompt, url="http://localhost:8000/chat/stream"):
+    """Yield event dicts from the backend's Server-Sent Events endpoint"""
+    with requests.post(url, json={"message": prompt, "debug": True}, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data:"):
+                yield json.loads(line[len("data:"):].strip())
+
+def render_stream(events):
+    """Show tokens as they arrive (plus tool/retrieval activity); return the final `done` payload"""
+    status = st.empty()
     placeholder = st.empty()
     displayed_text = ""
-    for char in text:
-        displayed_text += char
-        placeholder.markdown(displayed_text)
-        time.sleep(delay)
-    return placeholder
+    done = {}
+    for event in events:
+        kind = event.get("type")
+        if kind == "retrieval":
+            status.caption(f"🧠 Recalled {len(event.get('active_memories', []))} memories, "
+                           f"{event.get('entities', 0)} entities, {event.get('events', 0)} events")
+        elif kind == "tool_call":
+            status.caption(f"🔧 {event.get('name')}...")
+        elif kind == "token":
+            displayed_text += event.get("content", "")
+            placeholder.markdown(displayed_text + "▌")
+        elif kind == "reset":
+            displayed_text = ""
+            placeholder.empty()
+        elif kind == "done":
+            done = event
+    status.empty()
+    placeholder.markdown(done.get("response", displayed_text))
+    return done
 
 def get_confidence_color(distance):
     """Convert distance to confidence color"""
@@ -281,12 +309,15 @@ def get_confidence_color(distance):
     else:
         return "confidence-low", "🔴"
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_memory_state_cached(signature):
+    return read_state_snapshot()
+
 def load_memory_state():
-    """Load and parse memory state"""
+    """Load and parse memory state (re-read only when the backing files change)"""
     try:
-        with open("database/user_state.json", "r") as f:
-            return json.load(f)
-    except:
+        return _load_memory_state_cached(state_signature())
+    except Exception:
         return {}
 
 # Header with Turn Counter
@@ -512,6 +543,9 @@ with tab1:
                 if "debug_prompt" in message:
                     with st.expander("🛠️ View Raw Prompt"):
                         st.code(message["debug_prompt"], language="text")
+                if message.get("timings"):
+                    with st.expander("⏱️ Turn Timings"):
+                        st.json(message["timings"])
 
     # Chat Input
     if prompt := st.chat_input("💭 Type your message... (or use demo buttons above)"):
@@ -522,23 +556,16 @@ with tab1:
         with st.chat_message("user", avatar="👤"):
             st.markdown(prompt)
         
-        # Call Backend with loading animation
+        # Call Backend: tokens are rendered as the LLM produces them
         with st.chat_message("assistant", avatar="🤖"):
             with st.spinner("🤔 Thinking..."):
                 try:
-                    response = requests.post(
-                        "http://localhost:8000/chat",
-                        json={"message": prompt},
-                        timeout=30
-                    )
-                    data = response.json()
+                    data = render_stream(stream_chat(prompt))
                     bot_reply = data["response"]
                     memories = data.get("active_memories", [])
                     # --- NEW: Get debug info ---
                     debug_prompt = data.get("debug_prompt", "No debug info")
-                    
-                    # Typing animation
-                    typing_animation(bot_reply, delay=0.01)
+                    timings = data.get("stats", {})
                     
                     # Update analytics
                     st.session_state.memory_analytics["turns"].append(st.session_state.turn_count)
@@ -554,6 +581,7 @@ with tab1:
                         "memories": memories,
                         # --- NEW: Store debug info ---
                         "debug_prompt": debug_prompt,
+                        "timings": timings,
                         "turn": st.session_state.turn_count
                     }
                     st.session_state.messages.append(message_data)
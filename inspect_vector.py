@@ -1,14 +1,12 @@
-import chromadb
-import config  # Import your actual config to get the real path
+from backend.managers import chroma_store
 
-# 1. Connect to the Real Database (using the path from config)
-print(f"Connecting to: {config.CHROMA_DB_DIR}")
-client = chromadb.PersistentClient(path=str(config.CHROMA_DB_DIR))
+# 1. Connect to the Real Database (shared client, path from config)
+client = chroma_store.get_client()
 
 # 2. Inspect Entities
 print("\n=== 🧠 ENTITY VECTORS (Concepts) ===")
 try:
-    collection = client.get_collection("entity_facts")
+    collection = chroma_store.get_collection("entity_facts")
     count = collection.count()
     print(f"Found {count} entities.")
     
@@ -28,7 +26,7 @@ except Exception as e:
 # 3. Inspect Timeline
 print("\n=== 📅 TIMELINE VECTORS (Events) ===")
 try:
-    collection = client.get_collection("timeline_events")
+    collection = chroma_store.get_collection("timeline_events")
     count = collection.count()
     print(f"Found {count} events.")
     
@@ -1,7 +1,8 @@
 import json
-import chromadb
 import config
-from chromadb.utils import embedding_functions
+from backend.managers import chroma_store
+from backend.managers.embeddings import embed_documents
+from backend.managers.state_store import read_state_snapshot
 
 # CONFIG
 STATE_FILE = config.USER_STATE_FILE
@@ -10,33 +11,29 @@ CHROMA_PATH = config.CHROMA_DB_DIR
 def migrate():
     print("🚀 MIGRATING TO VECTOR SPACE...")
     
-    # 1. Load JSON Data
-    try:
-        with open(STATE_FILE, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print("❌ Error: user_state.json not found. Run populate_db.py first.")
+    # 1. Load Core State (from whichever store CORE_STORAGE_BACKEND selects)
+    data = read_state_snapshot(STATE_FILE)
+    if not data:
+        print(f"❌ Error: no core state found for the {config.CORE_STORAGE_BACKEND} store. Run populate_db.py first.")
         return
     
-    # 2. Connect to Chroma
-    client = chromadb.PersistentClient(path=str(CHROMA_PATH))
+    # 2. Connect to Chroma (shared client from the store module)
+    chroma_store.get_client()
+    # user_state.json is the default session's shard; other sessions' vectors are left alone
+    where, _ = chroma_store.session_scope(config.DEFAULT_SESSION_ID)
     
     # --- A. MIGRATE EVENTS ---
     print("   ...Indexing Timeline Events")
-    # Delete existing collection if it exists to start fresh/clean
-    try:
-        client.delete_collection("timeline_events")
-    except:
-        pass
-        
-    event_collection = client.get_or_create_collection(name="timeline_events")
+    # Delete the default session's existing events to start fresh/clean
+    event_collection = chroma_store.get_collection("timeline_events")
+    event_collection.delete(where=where)
     
     events = data.get("events", [])
     if events:
         # FIX: Add unique index 'i' to ID to prevent DuplicateIDError on same turns
         ids = [f"event_{e['turn']}_{i}" for i, e in enumerate(events)]
         docs = [e['description'] for e in events]
-        metas = [{"turn": e['turn'], "date": e['date']} for e in events]
+        metas = [chroma_store.event_metadata(e['turn'], e['date'], config.DEFAULT_SESSION_ID) for e in events]
         
         # Batch insert (Chroma handles batches better)
         batch_size = 100
@@ -44,18 +41,15 @@ def migrate():
             event_collection.add(
                 ids=ids[i:i+batch_size],
                 documents=docs[i:i+batch_size],
+                embeddings=embed_documents(docs[i:i+batch_size]),
                 metadatas=metas[i:i+batch_size]
             )
             print(f"      -> Indexed {min(i+batch_size, len(events))}/{len(events)} events")
 
     # --- B. MIGRATE ENTITIES ---
     print("   ...Indexing Entities")
-    try:
-        client.delete_collection("entity_facts")
-    except:
-        pass
-        
-    entity_collection = client.get_or_create_collection(name="entity_facts")
+    entity_collection = chroma_store.get_collection("entity_facts")
+    entity_collection.delete(where=where)
     
     entities = data.get("entities", {})
     if entities:
@@ -70,9 +64,9 @@ def migrate():
             
             e_ids.append(f"entity_{key}")
             e_docs.append(desc)
-            e_metas.append({"name": info['name'], "type": "entity"})
+            e_metas.append({"name": info['name'], "type": "entity", "session_id": config.DEFAULT_SESSION_ID})
             
-        entity_collection.add(ids=e_ids, documents=e_docs, metadatas=e_metas)
+        entity_collection.add(ids=e_ids, documents=e_docs, embeddings=embed_documents(e_docs), metadatas=e_metas)
 
     print("✅ MIGRATION COMPLETE. Your memory is now Vectorized.")
 
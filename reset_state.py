@@ -1,9 +1,9 @@
-import json
 import shutil
 import os
 import config
+from backend.managers.state_store import open_state_store, read_state_snapshot, remove_journals
 
-# 1. RESET JSON (Structured Memory)
+# 1. RESET CORE STATE (Structured Memory)
 filepath = config.USER_STATE_FILE
 
 # Define a truly empty state (or keep your default profile if preferred)
@@ -21,9 +21,18 @@ blank_state = {
     "system_stats": {"total_turns": 0}
 }
 
-with open(filepath, "w") as f:
-    json.dump(blank_state, f, indent=4)
-print("✅ JSON Memory: Wiped (Reset to blank profile).")
+# Through the configured store (json, journal or sqlite). Journals go first, so
+# none of their records is replayed onto the blank state.
+remove_journals(filepath)
+store = open_state_store(filepath)
+store.replace(blank_state)
+store.close()
+# Read back the way the dashboard does (for sqlite, the .db file rather than the JSON)
+snapshot = read_state_snapshot(filepath)
+if snapshot.get("system_stats", {}).get("total_turns") == 0 and not snapshot.get("entities"):
+    print(f"✅ Core Memory: Wiped (Reset to blank profile, {config.CORE_STORAGE_BACKEND} store).")
+else:
+    print(f"❌ Core Memory: {config.CORE_STORAGE_BACKEND} store still holds old state after the reset.")
 
 # 2. RESET CHROMADB (Vector Memory)
 # We simply delete the folder. Chroma will recreate it automatically on next run.
@@ -38,4 +47,17 @@ if os.path.exists(chroma_dir):
 else:
     print("ℹ️ Vector Memory: Already empty.")
 
+# 3. RESET ARCHIVE FILES
+# The memory-mapped conversation logs (ARCHIVE_LOG_BACKEND = "mmap") and the
+# write-queue spool, which would otherwise replay old writes on the next start.
+for archive_dir, label in ((config.ARCHIVE_MMAP_DIR, "Conversation Logs"), (config.ARCHIVE_SPOOL_DIR, "Write Spool")):
+    if os.path.exists(archive_dir):
+        try:
+            shutil.rmtree(archive_dir)
+            print(f"✅ {label}: Wiped (Deleted {archive_dir}).")
+        except Exception as e:
+            print(f"❌ Error deleting {archive_dir}: {e}")
+    else:
+        print(f"ℹ️ {label}: Already empty.")
+
 print("\n🚀 SYSTEM RESET COMPLETE. Restart your server now.")
\ No newline at end of file
@@ -1,8 +1,8 @@
-import json
 import uuid
 from datetime import datetime
 import config
-import chromadb
+from backend.managers import chroma_store
+from backend.managers.state_store import open_state_store
 
 # 1. SETUP PATHS
 STATE_FILE = config.USER_STATE_FILE
@@ -11,9 +11,9 @@ CHROMA_PATH = config.CHROMA_DB_DIR
 def inject_ancient_memory():
     print("⏳ Tearing the fabric of time...")
     
-    # --- A. MODIFY CORE STATE (JSON) ---
-    with open(STATE_FILE, 'r') as f:
-        data = json.load(f)
+    # --- A. MODIFY CORE STATE (through the configured store) ---
+    store = open_state_store(STATE_FILE)
+    data = store.export()
     
     # 1. Age the System
     data["system_stats"]["total_turns"] = 950
@@ -34,20 +34,19 @@ def inject_ancient_memory():
     }
     print(f"   ↳ Implanted Entity: Bruno (Turn 45)")
 
-    with open(STATE_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    store.replace(data)
+    store.close()
 
     # --- B. MODIFY ARCHIVAL STATE (CHROMA) ---
     # We must inject a vector memory that corresponds to Turn 1
-    client = chromadb.PersistentClient(path=str(CHROMA_PATH))
-    collection = client.get_or_create_collection("conversation_logs")
+    collection = chroma_store.get_collection("conversation_logs")
     
     # Inject an "ancient" conversation log
     ancient_log = "User: I have a severe peanut allergy, never suggest peanut butter.\nAssistant: Noted. I will remember that you are allergic to peanuts."
     
     collection.add(
         documents=[ancient_log],
-        metadatas=[{"role": "user", "turn_number": 1, "origin_turn": 1}],
+        metadatas=[{"role": "user", "turn_number": 1, "origin_turn": 1, "session_id": config.DEFAULT_SESSION_ID}],
         ids=[f"mem_ancient_{uuid.uuid4().hex[:8]}"]
     )
     print(f"   ↳ Injected Archival Log from Turn 1 into ChromaDB.")
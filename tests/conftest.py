@@ -0,0 +1,80 @@
+"""Shared helpers for the tests.
+
+`scratch_db` points every database path at a temp folder, gives the process a
+fresh Chroma client and swaps the embedding model for a bag-of-words stand-in,
+so behaviour tests run offline in well under a second each.
+
+The crash-recovery tests kill a real child process mid-write (os._exit: no
+atexit handlers, no flush, no close) and then reopen its files, so nothing is
+mocked at the storage layer. Every child works in its own scratch
+MEMORYOS_DATABASE_DIR.
+"""
+
+import hashlib
+import os
+import subprocess
+import sys
+import textwrap
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import config  # noqa: E402
+from backend.managers import archive_store, chroma_store, embeddings, exact_search, lexical_index, memory_tiers  # noqa: E402
+
+DIM = 64
+
+
+def fake_vector(text):
+    """Unit bag-of-words vector: texts sharing words are close, others are near-orthogonal."""
+    vector = np.zeros(DIM, dtype=np.float32)
+    for word in lexical_index.tokenize(text):
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % DIM] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else np.full(DIM, DIM ** -0.5, dtype=np.float32)
+
+
+def fake_embedding_function(texts):
+    return [fake_vector(text) for text in texts]
+
+
+@pytest.fixture
+def scratch_db(tmp_path, monkeypatch):
+    """Fresh database folder, Chroma client, shared indexes and stand-in embedder."""
+    database = tmp_path / "database"
+    for name, path in {"DATABASE_DIR": database, "CHROMA_DB_DIR": database / "chroma_db",
+                       "USER_STATE_FILE": database / "user_state.json", "SESSIONS_DIR": database / "sessions",
+                       "ARCHIVE_SPOOL_DIR": database / "archive_spool",
+                       "ARCHIVE_MMAP_DIR": database / "archive_logs"}.items():
+        monkeypatch.setattr(config, name, path)
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_PERSIST", False)
+    monkeypatch.setattr(config, "CORE_STORAGE_BACKEND", "json")
+    monkeypatch.setattr(chroma_store, "_client", None)
+    monkeypatch.setattr(chroma_store, "_collections", {})
+    monkeypatch.setattr(chroma_store, "_spaces", {})
+    monkeypatch.setattr(archive_store, "_store", None)
+    monkeypatch.setattr(exact_search, "_indexes", OrderedDict())
+    monkeypatch.setattr(lexical_index, "_indexes", {})
+    monkeypatch.setattr(memory_tiers, "_tiers", {})
+    monkeypatch.setattr(memory_tiers, "_live", set())
+    monkeypatch.setattr(embeddings, "_embedder", embeddings.CountingEmbedder(fake_embedding_function))
+    return database
+
+
+@pytest.fixture
+def crash_child(tmp_path):
+    """Run `code` in a fresh interpreter against a scratch database under tmp_path.
+    The code is expected to end in os._exit(); returns the completed process."""
+    def run(code, timeout=120):
+        env = dict(os.environ, MEMORYOS_DATABASE_DIR=str(tmp_path / "database"),
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+        proc = subprocess.run([sys.executable, "-c", textwrap.dedent(code)], cwd=ROOT, env=env,
+                              capture_output=True, text=True, timeout=timeout)
+        assert proc.returncode == 0, proc.stderr
+        return proc
+    return run
@@ -0,0 +1,48 @@
+import pytest
+
+from backend.managers.archival_manager import ArchivalMemoryManager
+
+
+@pytest.fixture
+def archive(scratch_db):
+    return ArchivalMemoryManager("frank")
+
+
+def stored(archive):
+    found = archive.semantic.get(where=archive.where, include=["documents", "metadatas"])
+    return {doc_id: (doc, meta) for doc_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"])}
+
+
+def test_duplicates_within_a_batch_are_stored_once(archive):
+    results = archive.add_facts(["Frank owns a grey cat", "Frank likes jazz", "frank owns a GREY cat"], 3)
+    (cat_id, cat_status), (jazz_id, jazz_status), (dup_id, dup_status) = results
+    assert cat_status == jazz_status == "New Memory Stored"
+    assert dup_id == cat_id and dup_status == f"Memory Refreshed (Merged with {cat_id})"
+
+    facts = stored(archive)
+    assert set(facts) == {cat_id, jazz_id}
+    # The first occurrence is kept, counted once per mention
+    assert facts[cat_id][0] == "Frank owns a grey cat"
+    assert facts[cat_id][1]["count"] == 2 and facts[jazz_id][1]["count"] == 1
+
+
+def test_stored_duplicates_are_refreshed_not_added(archive):
+    cat_id, _ = archive.add_fact("Frank owns a grey cat", 1)
+    results = archive.add_facts(["Frank owns a grey cat", "Frank owns a grey cat", "Frank plays chess"], 7)
+    assert [memory_id for memory_id, _ in results][:2] == [cat_id, cat_id]
+    assert results[0][1] == results[1][1] == f"Memory Refreshed (Merged with {cat_id})"
+    assert results[2][1] == "New Memory Stored"
+
+    facts = stored(archive)
+    assert len(facts) == 2
+    assert facts[cat_id][1]["count"] == 3 and facts[cat_id][1]["last_used_turn"] == 7
+    assert facts[cat_id][1]["origin_turn"] == 1
+
+
+def test_add_facts_matches_add_fact(scratch_db):
+    one, bulk = ArchivalMemoryManager("one"), ArchivalMemoryManager("bulk")
+    facts = ["Frank owns a grey cat", "Frank likes jazz", "Frank owns a grey cat", "Frank works in Oslo"]
+    singly = [one.add_fact(fact, 2)[1] for fact in facts]
+    assert [status.split(" (")[0] for _, status in bulk.add_facts(facts, 2)] == [s.split(" (")[0] for s in singly]
+    assert sorted((doc, meta["count"]) for doc, meta in stored(one).values()) == \
+        sorted((doc, meta["count"]) for doc, meta in stored(bulk).values())
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from backend.managers.archive_store import COLUMNS, MmapLogStore
+
+VECTORS = np.random.default_rng(0).normal(size=(9, 16)).astype(np.float32)
+
+CHILD = """
+    import os
+    import numpy as np
+    from backend.managers.archive_store import MmapLogStore
+
+    vectors = np.random.default_rng(0).normal(size=(9, 16)).astype(np.float32)
+
+    def batch(rows):
+        return dict(ids=[f"log_{i}" for i in rows], documents=[f"message {i}" for i in rows],
+                    embeddings=vectors[list(rows)],
+                    metadatas=[{"session_id": "s1", "turn_number": i, "role": "user"} for i in rows])
+
+    store = MmapLogStore(os.path.join(os.environ["MEMORYOS_DATABASE_DIR"], "archive_logs"))
+    store.add(**batch(range(5)))
+
+    crash = "CRASH"
+    names = {fd: name for name, fd in store._fds.items()}
+    pwrite, writes = os.pwrite, {}
+
+    def crashing_pwrite(fd, data, offset):
+        name = names[fd]
+        writes[name] = writes.get(name, 0) + 1
+        if crash == "mid_data" and name == "vectors.bin" and writes[name] == 2:
+            os._exit(0)
+        if crash == "before_ids" and name == "ids.txt":
+            os._exit(0)
+        if crash == "torn_ids" and name == "ids.txt":
+            pwrite(fd, data[:len(data) // 2], offset)   # "log_5\\nlog": log_5 is committed
+            os._exit(0)
+        if crash == "update" and name == "columns.bin":
+            os._exit(0)
+        return pwrite(fd, data, offset)
+
+    os.pwrite = crashing_pwrite
+    if crash == "update":
+        store.update(["log_1", "log_2"], [{"role": "edited"}] * 2)
+    else:
+        store.add(**batch(range(5, 8)))
+    os._exit(1)   # the write above must have crashed
+"""
+
+
+def unit(rows):
+    vectors = VECTORS[rows]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("crash, committed", [("mid_data", 5), ("before_ids", 5), ("torn_ids", 6), ("update", 5)])
+def test_mmap_store_keeps_rows_up_to_ids_txt_after_crash(crash, committed, crash_child, tmp_path):
+    crash_child(CHILD.replace("CRASH", crash))
+    path = tmp_path / "database" / "archive_logs"
+
+    store = MmapLogStore(path)
+    try:
+        rows = list(range(committed))
+        ids = [f"log_{i}" for i in rows]
+        assert store.count() == committed
+        # Bytes of the interrupted write past the commit point are dropped
+        assert (path / "ids.txt").read_text() == "".join(f"{doc_id}\n" for doc_id in ids)
+        assert (path / "vectors.bin").stat().st_size == committed * store.row_bytes
+        assert (path / "columns.bin").stat().st_size == committed * COLUMNS.itemsize
+
+        result = store.get(where={"session_id": "s1"}, include=["documents", "metadatas", "embeddings"])
+        assert result["ids"] == ids
+        assert result["documents"] == [f"message {i}" for i in rows]
+        # An interrupted update leaves the old metadata in place
+        assert [m["role"] for m in result["metadatas"]] == ["user"] * committed
+        np.testing.assert_allclose(result["embeddings"], unit(rows), atol=1e-3)
+        top = store.query(query_embeddings=unit([committed - 1]), n_results=1, where={"session_id": "s1"})
+        assert top["ids"] == [[f"log_{committed - 1}"]]
+
+        # Writes after recovery land in the next row, not behind leftover bytes
+        store.add(ids=["log_8"], documents=["message 8"], embeddings=VECTORS[[8]],
+                  metadatas=[{"session_id": "s1", "turn_number": 8, "role": "user"}])
+    finally:
+        store.close()
+
+    store = MmapLogStore(path)
+    try:
+        assert store.count() == committed + 1
+        result = store.get(ids=["log_8"], include=["documents", "embeddings"])
+        assert result["documents"] == ["message 8"]
+        np.testing.assert_allclose(result["embeddings"], unit([8]), atol=1e-3)
+    finally:
+        store.close()
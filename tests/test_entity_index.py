@@ -0,0 +1,90 @@
+import pytest
+
+from backend.managers.core_manager import CoreMemoryManager
+from backend.managers.entity_index import EntityAliasIndex
+
+
+@pytest.fixture
+def aliases():
+    index = EntityAliasIndex()
+    index.add("sarah johnson", "Sarah Johnson")
+    index.add("tajinder", "Tajinder")
+    index.add("mom", "Mom")
+    return index
+
+
+def test_resolve_is_case_insensitive_for_tool_names(aliases):
+    assert aliases.resolve("tajinder bagga") == "tajinder"
+    assert aliases.resolve("Tajinder Bagga") == "tajinder"
+    assert aliases.resolve("johnson") == "sarah johnson"
+
+
+def test_resolve_rejects_descriptions_as_name_parts(aliases):
+    assert aliases.resolve("Mom's friend Linda") is None
+    assert aliases.resolve("mom friend linda") is None
+    assert aliases.resolve("Priya") is None
+
+
+def test_scan_finds_full_and_lone_names(aliases):
+    assert aliases.scan("I had lunch with Sarah Johnson today") == (["sarah johnson"], [])
+    assert aliases.scan("Then Sarah called about the report.")[0] == ["sarah johnson"]
+    # One-word aliases only count capitalised ("mom" could be anything lowercase)
+    assert aliases.scan("I told Mom")[0] == ["mom"]
+
+
+def test_scan_does_not_take_a_different_surname_for_a_known_person(aliases):
+    keys, unresolved = aliases.scan("Sarah Connor called")
+    assert keys == []
+    assert unresolved == ["Sarah Connor"]
+    keys, unresolved = aliases.scan("I met Mike Johnson yesterday")
+    assert keys == []
+    assert unresolved == ["Mike Johnson"]
+
+
+def test_scan_leaves_unknown_names_and_possessives_over(aliases):
+    keys, unresolved = aliases.scan("Lunch with Priya and my boss")
+    assert keys == []
+    assert unresolved == ["Priya", "my boss"]
+
+
+@pytest.fixture
+def core(scratch_db):
+    manager = CoreMemoryManager()
+    yield manager
+    manager.close()
+
+
+def test_alias_merge_keeps_the_stored_relationship(core):
+    core.update_entity("Tajinder", "manager", {"team": "search"})
+    core.update_entity("tajinder bagga", None, {"city": "Pune"})
+    entities = core.load_state()["entities"]
+    assert list(entities) == ["tajinder"]
+    assert entities["tajinder"] == {"name": "Tajinder Bagga", "relationship": "manager",
+                                    "attributes": {"team": "search", "city": "Pune"}}
+
+
+def test_alias_merge_fills_in_a_missing_relationship(core):
+    core.update_entity("Tajinder", None, {})
+    core.update_entity("Tajinder Bagga", "my manager", {})
+    assert core.load_state()["entities"]["tajinder"]["relationship"] == "my manager"
+
+
+def test_conflicting_relationship_is_a_different_person(core):
+    core.update_entity("Sarah Johnson", "boss", {"company": "Acme"})
+    core.update_entity("Sarah", "sister", {"age": 31})
+    entities = core.load_state()["entities"]
+    assert entities["sarah johnson"] == {"name": "Sarah Johnson", "relationship": "boss",
+                                         "attributes": {"company": "Acme"}}
+    assert entities["sarah"] == {"name": "Sarah", "relationship": "sister", "attributes": {"age": 31}}
+    # From now on "Sarah" is the sister, in mentions and updates alike
+    assert core.entity_aliases.scan("Sarah is visiting")[0] == ["sarah"]
+    assert core.entity_aliases.resolve("Sarah") == "sarah"
+    assert core.entity_aliases.scan("Sarah Johnson is visiting")[0] == ["sarah johnson"]
+
+
+def test_agreeing_relationship_merges(core):
+    core.update_entity("Sarah Johnson", "boss", {})
+    core.update_entity("Sarah", "my boss", {"mood": "happy"})
+    entities = core.load_state()["entities"]
+    assert list(entities) == ["sarah johnson"]
+    assert entities["sarah johnson"]["attributes"] == {"mood": "happy"}
@@ -0,0 +1,54 @@
+import datetime as real_datetime
+
+import pytest
+
+from backend.managers import core_manager
+from backend.managers.core_manager import CoreMemoryManager
+from conftest import fake_vector
+
+EVENTS = [("2024-03-02", "Went for a run by the river"), ("2024-11-20", "Went for a run in the snow"),
+          ("2025-02-14", "Went for a run with Ana"), ("2025-05-01", "Went for a run before work"),
+          ("2025-06-10", "Went for a run in the rain")]
+
+
+@pytest.fixture
+def core(scratch_db, monkeypatch):
+    manager = CoreMemoryManager("hana")
+    for date, description in EVENTS:
+        class Frozen(real_datetime.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls.fromisoformat(date)
+        monkeypatch.setattr(core_manager, "datetime", Frozen)
+        manager.log_event(description)
+    monkeypatch.setattr(core_manager, "datetime", real_datetime.datetime)
+    yield manager
+    manager.close()
+
+
+def dates(events):
+    return sorted(event["text"].split("| ")[1][:10] for event in events)
+
+
+def test_explicit_year_filters_events(core):
+    events = core.search_events("Did I go for a run in 2024?", fake_vector("went for a run"))
+    assert dates(events) == ["2024-03-02", "2024-11-20"]
+
+
+def test_relative_periods_use_the_last_event_as_today(core):
+    query = fake_vector("went for a run")
+    assert dates(core.search_events("runs last year", query)) == ["2024-03-02", "2024-11-20"]
+    assert dates(core.search_events("runs this month", query)) == ["2025-06-10"]
+    assert dates(core.search_events("runs last month", query)) == ["2025-05-01"]
+
+
+def test_period_comes_from_the_current_message(core):
+    # A year mentioned earlier in the search text does not narrow the search
+    events = core.search_events("we talked about 2024 ... any runs this year?", fake_vector("went for a run"),
+                                period_text="any runs this year?")
+    assert dates(events) == ["2025-02-14", "2025-05-01", "2025-06-10"]
+
+
+def test_empty_period_falls_back_to_all_events(core):
+    events = core.search_events("Did I go for a run in 2019?", fake_vector("went for a run"))
+    assert dates(events) == [date for date, _ in EVENTS]
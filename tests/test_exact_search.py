@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import config
+from backend.managers import chroma_store, exact_search
+from conftest import fake_vector
+
+SESSIONS = ("a", "b", "c")
+
+
+@pytest.fixture
+def facts(scratch_db):
+    collection = chroma_store.get_collection("semantic_memory")
+    for session_id in SESSIONS:
+        documents = [f"{session_id} fact {i} about topic{i}" for i in range(20)]
+        collection.add(ids=[f"{session_id}_{i}" for i in range(20)], documents=documents,
+                       embeddings=[fake_vector(d) for d in documents],
+                       metadatas=[{"session_id": session_id, "type": "fact"} for _ in documents])
+    return collection
+
+
+def test_exact_query_matches_chroma(facts):
+    query = [fake_vector("b fact 7 about topic7")]
+    exact = exact_search.query("semantic_memory", "b", query, {"session_id": "b"}, 5)
+    hnsw = facts.query(query_embeddings=query, where={"session_id": "b"}, n_results=5)
+    assert exact["ids"][0][0] == hnsw["ids"][0][0] == "b_7"
+    # Ties among the rest may be ordered either way; the distances agree
+    np.testing.assert_allclose(exact["distances"][0], hnsw["distances"][0], atol=1e-4)
+
+
+def test_operator_filters_go_to_chroma(facts, monkeypatch):
+    monkeypatch.setattr(exact_search, "get_index", lambda *args: pytest.fail("exact index used for $or"))
+    where = {"$and": [{"session_id": "a"}, {"$or": [{"type": "fact"}, {"type": "note"}]}]}
+    result = exact_search.query("semantic_memory", "a", [fake_vector("a fact 3 about topic3")], where, 1)
+    assert result["ids"] == [["a_3"]]
+
+
+def test_indexes_share_a_byte_budget_least_recently_searched_dropped(facts, monkeypatch):
+    size = exact_search.get_index("semantic_memory", "a").nbytes
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_BYTES", 2 * size)
+    exact_search.get_index("semantic_memory", "b")
+    exact_search.get_index("semantic_memory", "a")      # "b" is now the least recently searched
+    exact_search.get_index("semantic_memory", "c")
+    assert list(exact_search._indexes) == [("semantic_memory", "a"), ("semantic_memory", "c")]
+
+    # A dropped index is rebuilt on its next search, evicting the next oldest
+    result = exact_search.query("semantic_memory", "b", [fake_vector("b fact 2 about topic2")], {"session_id": "b"}, 1)
+    assert result["ids"] == [["b_2"]]
+    assert list(exact_search._indexes) == [("semantic_memory", "c"), ("semantic_memory", "b")]
+
+
+def test_no_hot_tier_for_a_session_searched_exactly(facts, monkeypatch):
+    from backend.managers import memory_tiers
+    collection = chroma_store.get_collection("semantic_memory")
+    collection.update(ids=[f"a_{i}" for i in range(20)],
+                      metadatas=[{"session_id": "a", "type": "fact", "last_used_turn": 10} for _ in range(20)])
+    query = fake_vector("a fact 4 about topic4")
+
+    # Below the limit the exact index answers; no tier is built or consulted
+    assert memory_tiers.query("a", query, {"session_id": "a"}, 1)["ids"] == [["a_4"]]
+    assert exact_search.is_exact("semantic_memory", "a")
+    assert memory_tiers.refresh("a", 10) is None
+    assert "a" not in memory_tiers._tiers
+
+    # Searched through Chroma, the session is tiered as before
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_VECTORS", 0)
+    exact_search.drop_index("semantic_memory")
+    assert memory_tiers.query("b", fake_vector("b fact 1 about topic1"), {"session_id": "b"}, 1)["ids"] == [["b_1"]]
+    assert not exact_search.is_exact("semantic_memory", "b")
+    assert not exact_search.is_exact("semantic_memory", "a")
+    assert len(memory_tiers.refresh("a", 10)) == 20
+    assert memory_tiers.query("a", query, {"session_id": "a"}, 1)["ids"] == [["a_4"]]
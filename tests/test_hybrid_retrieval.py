@@ -0,0 +1,108 @@
+import pytest
+
+import config
+from backend.logic.sessions import Session
+from backend.managers import lexical_index
+from backend.managers.archival_manager import ArchivalMemoryManager
+
+
+@pytest.fixture
+def hybrid(scratch_db, monkeypatch):
+    monkeypatch.setattr(config, "HYBRID_RETRIEVAL", True)
+    return scratch_db
+
+
+def contents(memories):
+    return [mem["content"] for mem in memories]
+
+
+def test_lexical_index_is_per_session_and_built_lazily(hybrid):
+    alice, bob = ArchivalMemoryManager("alice"), ArchivalMemoryManager("bob")
+    alice.add_fact("Locker code is X7-42", 1)
+    bob.add_fact("Locker code is Q9-13", 1)
+    assert not lexical_index._indexes          # nothing is built by writes alone
+
+    assert contents(alice.search_memory("locker code X7-42", n_results=1)) == ["Locker code is X7-42"]
+    assert set(lexical_index._indexes) == {("semantic_memory", "alice")}
+    assert len(lexical_index._indexes["semantic_memory", "alice"]) == 1
+
+    # Built indexes follow later writes, and other sessions never see them
+    alice.add_fact("Gym locker is number 118", 2)
+    assert len(lexical_index._indexes["semantic_memory", "alice"]) == 2
+    assert "Q9-13" not in " ".join(contents(alice.search_memory("Q9-13", n_results=3)))
+    assert contents(bob.search_memory("Q9-13", n_results=1)) == ["Locker code is Q9-13"]
+
+
+def test_session_close_drops_its_indexes(hybrid):
+    session = Session("carol")
+    session.archive.add_fact("Carol's passport number is K1234567", 1)
+    session.archive.search_memory("K1234567", n_results=1)
+    assert ("semantic_memory", "carol") in lexical_index._indexes
+    session.close()
+    assert not [key for key in lexical_index._indexes if key[1] == "carol"]
+    # Reopened, the index is rebuilt from Chroma
+    reopened = Session("carol")
+    try:
+        assert contents(reopened.archive.search_memory("K1234567", n_results=1)) == ["Carol's passport number is K1234567"]
+    finally:
+        reopened.close()
+
+
+def test_rrf_rewards_agreement():
+    fused = dict(lexical_index.rrf(["a", "b", "c"], ["b", "a"]))
+    assert fused["a"] == pytest.approx(fused["b"])
+    assert fused["a"] > fused["c"]
+    assert dict(lexical_index.rrf(["x"], ["x"]))["x"] == pytest.approx(1.0)
+
+
+def test_exact_short_circuit_needs_a_selective_match(hybrid):
+    from backend.managers.embeddings import QueryEmbeddings
+    archive = ArchivalMemoryManager("dave")
+    archive.add_facts(["Dave drinks coffee every morning", "Coffee beans come from Kenya",
+                       "The office coffee machine is broken", "Dave prefers coffee over tea",
+                       "Dave parked the car near the red gate", "The red car in the lot belongs to Dave",
+                       "Red paint scratched the car door", "A red sports car drove past the car wash",
+                       "Dave's visa number is ZX-5512"], 1)
+
+    # A rare code: answered from the lexical index, nothing embedded
+    ctx = QueryEmbeddings()
+    assert contents(archive.search_memory("ZX-5512", n_results=3, query_ctx=ctx)) == ["Dave's visa number is ZX-5512"]
+    assert ctx.calls == 0
+
+    # An exact phrase ("red car") among documents that merely contain both words
+    ctx = QueryEmbeddings()
+    assert contents(archive.search_memory("red car", n_results=3, query_ctx=ctx)) == ["The red car in the lot belongs to Dave"]
+    assert ctx.calls == 0
+
+    # A common term is no exact match: the vector search runs and is fused in
+    ctx = QueryEmbeddings()
+    assert len(archive.search_memory("coffee", n_results=3, query_ctx=ctx)) == 3
+    assert ctx.calls == 1
+
+
+def test_no_short_circuit_when_the_query_is_already_embedded(hybrid, monkeypatch):
+    from backend.managers.embeddings import embed_query
+    archive = ArchivalMemoryManager("erin")
+    archive.add_fact("Erin's locker code is B4-77", 1)
+
+    def fail(*args):
+        raise AssertionError("lexical short-circuit used with a query vector")
+    monkeypatch.setattr(ArchivalMemoryManager, "_exact_matches", fail)
+    hits = archive.search_memory("B4-77", n_results=3, query_embedding=embed_query("B4-77"))
+    assert contents(hits)[0] == "Erin's locker code is B4-77"
+
+
+def test_entity_search_fuses_in_lexical_only_knowledge(hybrid):
+    from backend.managers.core_manager import CoreMemoryManager
+    from conftest import fake_vector
+    core = CoreMemoryManager("fay")
+    try:
+        core.update_entity("Marco", "brother", {"city": "Rome"})
+        core.add_general_knowledge("wifi", "The home wifi password is hunter2")
+        # Saved knowledge has no vectors: only the lexical side can find it
+        texts = [item["text"] for item in core.search_entities("what is the wifi password", fake_vector("wifi password"))]
+        assert "- [Knowledge] wifi: The home wifi password is hunter2" in texts
+        texts = [item["text"] for item in core.search_entities("how is Marco", fake_vector("how is Marco"))]
+        assert texts[0].startswith("- Marco is brother")
+    finally:
+        core.close()
@@ -0,0 +1,76 @@
+import pytest
+
+import config
+
+from backend.managers.core_manager import CoreMemoryManager
+from backend.managers.prompt_builder import PromptBuilder, count_tokens
+
+
+def lines(prefix, n, score=0.5, words=12):
+    return [{"text": f"- {prefix} {i} " + "word " * words, "score": score} for i in range(n)]
+
+
+def test_everything_fits_unchanged():
+    builder = PromptBuilder(budget=1000, profile_max_tokens=200)
+    text, counts = builder.build(lambda: {"name": "Gina"}, {"entities": lines("entity", 2), "events": [], "archive": []})
+    assert text == ("USER PROFILE:\n- name: Gina\n\nRELEVANT ENTITIES:\n" + "\n".join(line["text"] for line in lines("entity", 2))
+                    + "\n\nTIMELINE: [No relevant past events]\n\nPAST CONVERSATIONS:\n")
+    assert counts["dropped"] == 0
+
+
+def test_lowest_scored_lines_are_dropped_to_fit():
+    builder = PromptBuilder(budget=120, profile_max_tokens=50)
+    sections = {"entities": lines("entity", 4, score=0.9), "events": lines("event", 4, score=0.2),
+                "archive": lines("memory", 4, score=0.5)}
+    text, counts = builder.build(lambda: {"name": "Gina"}, sections)
+    assert counts["total"] <= 120
+    assert counts["dropped"] > 0
+    # Every entity line (best scores) survives before any event line (worst)
+    assert all(line["text"] in text for line in sections["entities"])
+    assert not any(line["text"] in text for line in sections["events"])
+    assert "TIMELINE: [No relevant past events]" in text
+
+
+def test_profile_is_trimmed_oldest_entries_first():
+    builder = PromptBuilder(budget=1000, profile_max_tokens=20)
+    profile = {"name": "Gina", "preferences": [f"preference number {i}" for i in range(10)]}
+    block = builder.profile_block(lambda: profile)
+    assert count_tokens(block) <= 20
+    assert "preference number 9" in block and "preference number 0" not in block
+    assert len(profile["preferences"]) == 10      # the stored profile is untouched
+
+
+def test_profile_block_is_cached_until_invalidated():
+    builder = PromptBuilder()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return {"name": "Gina"}
+    builder.profile_block(load)
+    builder.profile_block(load)
+    assert len(calls) == 1
+    builder.invalidate_profile()
+    builder.profile_block(load)
+    assert len(calls) == 2
+
+
+@pytest.fixture
+def core(scratch_db):
+    manager = CoreMemoryManager("gina")
+    yield manager
+    manager.close()
+
+
+def test_core_prompt_stays_within_budget(core):
+    for i in range(60):
+        core.update_profile("goals", f"goal {i}: " + "run further " * 5)
+    archival = [{"content": f"memory {i} " + "detail " * 10, "origin_turn": i, "score": i / 100} for i in range(60)]
+    text, counts = core.render_core_prompt(lines("entity", 60), lines("event", 60), archival)
+    assert counts["total"] <= config.PROMPT_CONTEXT_TOKENS
+    assert counts["profile"] <= config.PROMPT_PROFILE_MAX_TOKENS
+    assert counts["dropped"] > 0
+    assert "goal 59" in text and "goal 0:" not in text
+    # Profile writes invalidate the cached block
+    core.update_profile("name", "Gina")
+    assert "- name: Gina" in core.render_core_prompt([], [], [])[0]
@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.logic import sessions
+from backend.logic.sessions import SessionManager
+
+
+class FakeSession:
+    """Stands in for Session: opening `slow` ids blocks until `release` is set."""
+    opened = []
+    closed = []
+    slow = set()
+    release = threading.Event()
+
+    def __init__(self, session_id, summarize=None, executor=None):
+        self.session_id = session_id
+        self.active_turns = 0
+        FakeSession.opened.append(session_id)
+        if session_id in FakeSession.slow:
+            assert FakeSession.release.wait(10)
+
+    def in_use(self):
+        return self.active_turns > 0
+
+    def close(self):
+        FakeSession.closed.append(self.session_id)
+
+
+@pytest.fixture
+def fake_sessions(monkeypatch):
+    monkeypatch.setattr(sessions, "Session", FakeSession)
+    FakeSession.opened, FakeSession.closed, FakeSession.slow = [], [], set()
+    FakeSession.release = threading.Event()
+    return FakeSession
+
+
+def test_slow_open_does_not_block_other_sessions(fake_sessions):
+    manager = SessionManager(max_sessions=10)
+    fake_sessions.slow.add("cold")
+    with ThreadPoolExecutor(4) as pool:
+        cold = pool.submit(manager.get, "cold")
+        while "cold" not in fake_sessions.opened:
+            time.sleep(0.001)
+        # Checked out while "cold" is still being built
+        with manager.checkout("warm") as warm:
+            assert warm.session_id == "warm"
+        again = pool.submit(manager.get, "cold")
+        time.sleep(0.05)
+        assert not cold.done() and not again.done()
+        fake_sessions.release.set()
+        assert cold.result(5) is again.result(5)
+    # The second caller waited for the first open instead of loading the shard twice
+    assert fake_sessions.opened.count("cold") == 1
+
+
+def test_failed_open_is_retried(fake_sessions, monkeypatch):
+    manager = SessionManager(max_sessions=10)
+    calls = []
+
+    class Flaky(FakeSession):
+        def __init__(self, session_id, summarize=None, executor=None):
+            calls.append(session_id)
+            if len(calls) == 1:
+                raise OSError("disk")
+            super().__init__(session_id)
+
+    monkeypatch.setattr(sessions, "Session", Flaky)
+    with pytest.raises(OSError):
+        manager.get("s1")
+    assert manager.get("s1").session_id == "s1"
+    assert len(manager) == 1
+
+
+def test_evicted_session_is_closed_before_it_reopens(fake_sessions):
+    manager = SessionManager(max_sessions=1)
+    first = manager.get("a")
+    manager.get("b")                    # evicts and closes "a"
+    assert fake_sessions.closed == ["a"]
+    assert manager.get("a") is not first
+    # A checked-out session is not evicted
+    with manager.checkout("c"):
+        manager.get("d")
+        assert "c" not in fake_sessions.closed
+
+
+def test_sessions_keep_their_memories_apart(scratch_db):
+    from conftest import fake_vector
+    manager = SessionManager(max_sessions=10)
+    alice, bob = manager.get("alice"), manager.get("bob")
+    try:
+        alice.core.update_profile("name", "Alice")
+        alice.core.update_entity("Marco", "brother", {"city": "Rome"})
+        alice.core.log_event("Alice moved to Lisbon")
+        alice.archive.add_fact("Alice's locker code is 4471", alice.core.increment_turn())
+        alice.buffer.add_turn("user", "hello from alice")
+
+        assert alice.core.filepath != bob.core.filepath
+        state = bob.core.load_state()
+        assert not state["user_profile"].get("name")
+        assert not state["entities"] and not state["events"]
+        assert bob.buffer.get_messages() == []
+        assert bob.archive.search_memory("locker code 4471", n_results=3) == []
+        assert bob.core.search_events("Lisbon", fake_vector("Alice moved to Lisbon")) == []
+
+        # The same searches in Alice's own session find them
+        assert alice.archive.search_memory("locker code 4471", n_results=1)[0]["content"] == "Alice's locker code is 4471"
+        assert alice.core.search_events("Lisbon", fake_vector("Alice moved to Lisbon"))
+    finally:
+        manager.close_all()
@@ -0,0 +1,89 @@
+import hashlib
+import shutil
+
+import numpy as np
+import pytest
+
+import config
+from backend.logic import write_queue
+from backend.logic.write_queue import ArchiveWriteQueue
+from backend.managers import chroma_store
+
+CHILD = """
+    import os
+    import threading
+    from backend.logic.write_queue import ArchiveWriteQueue
+
+    # The writer thread takes the batch and never commits it
+    stuck = threading.Event()
+    ArchiveWriteQueue._commit = staticmethod(lambda records, upsert=False: stuck.wait())
+    queue = ArchiveWriteQueue(workers=1)
+    queue.put_many([
+        {"collection": "conversation_logs", "id": "log_1", "document": "User: I adopted a cat named Miso",
+         "metadata": {"role": "user", "turn_number": 1, "session_id": "default"}},
+        {"collection": "conversation_logs", "id": "log_2", "document": "Bot: Miso is a lovely name",
+         "metadata": {"role": "assistant", "turn_number": 1, "session_id": "default"}},
+    ])
+    queue.put({"op": "update", "collection": "semantic_memory", "id": "fact_1", "metadata": {"last_used_turn": 7}})
+    os._exit(0)
+"""
+
+
+def fake_embeddings(texts):
+    vectors = np.array([np.frombuffer(hashlib.sha256(t.encode()).digest()[:32], dtype=np.uint8) for t in texts],
+                       dtype=np.float32)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+
+@pytest.fixture
+def scratch_chroma(tmp_path, monkeypatch):
+    database = tmp_path / "database"
+    monkeypatch.setattr(config, "CHROMA_DB_DIR", database / "chroma_db")
+    monkeypatch.setattr(config, "ARCHIVE_SPOOL_DIR", database / "archive_spool")
+    monkeypatch.setattr(config, "ARCHIVE_LOG_BACKEND", "chroma")
+    monkeypatch.setattr(chroma_store, "_client", None)
+    monkeypatch.setattr(chroma_store, "_collections", {})
+    monkeypatch.setattr(chroma_store, "_spaces", {})
+    monkeypatch.setattr(write_queue, "embed_documents", fake_embeddings)
+    return database
+
+
+def recover(spool_dir):
+    queue = ArchiveWriteQueue(spool_dir, workers=1)
+    queue.close()
+
+
+def test_spool_is_replayed_with_upsert_after_crash(crash_child, scratch_chroma):
+    crash_child(CHILD)
+    spool_dir = config.ARCHIVE_SPOOL_DIR
+    segments = sorted(spool_dir.glob("*.jsonl"))
+    assert segments
+    # A record cut off mid-append by the crash
+    with open(segments[-1], "a") as f:
+        f.write('{"collection": "conversation_logs", "id": "log_3", "docu')
+
+    # log_1 reached Chroma before the crash (the segment was not released yet), and the
+    # fact the update record refers to exists with metadata of its own
+    logs = chroma_store.get_collection("conversation_logs")
+    logs.add(ids=["log_1"], documents=["User: I adopted a cat named Miso"],
+             embeddings=fake_embeddings(["User: I adopted a cat named Miso"]),
+             metadatas=[{"role": "user", "turn_number": 1, "session_id": "default"}])
+    facts = chroma_store.get_collection("semantic_memory")
+    facts.add(ids=["fact_1"], documents=["User has a cat named Miso"], embeddings=fake_embeddings(["fact"]),
+              metadatas=[{"session_id": "default", "last_used_turn": 1, "count": 2}])
+    backup = scratch_chroma / "spool_backup"
+    shutil.copytree(spool_dir, backup)
+
+    def check():
+        assert sorted(logs.get()["ids"]) == ["log_1", "log_2"]
+        assert facts.get(ids=["fact_1"])["metadatas"] == [{"session_id": "default", "last_used_turn": 7, "count": 2}]
+        assert not list(spool_dir.glob("*.jsonl"))
+
+    recover(spool_dir)
+    check()
+
+    # A crash during recovery replays the same segments again: nothing changes
+    shutil.rmtree(spool_dir)
+    shutil.copytree(backup, spool_dir)
+    recover(spool_dir)
+    check()